@@ -13,6 +13,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.db.session import Base
 from app.models.project import Project
 from app.models.deployment import Deployment
+from app.models.build_cache import BuildCacheEntry
+from app.models.webhook_delivery import WebhookDelivery
+from app.models.build_worker import BuildWorker, BuildJob, BuildJobLogChunk
+from app.models.revoked_token import RevokedToken
 from app.core.config import settings
 
 # this is the Alembic Config object, which provides
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
 from fastapi.responses import RedirectResponse
-import httpx
-from jose import JWTError, jwt
+from jose import jwt
 from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.db.session import get_db
+from app.services.sessions import session_tokens
+from app.services.github import github_client, GitHubError
 
 router = APIRouter()
 
@@ -19,60 +22,52 @@ async def login():
     if not settings.GITHUB_CLIENT_ID:
         return {"error": "GitHub OAuth not configured. Please set GITHUB_CLIENT_ID and GITHUB_CLIENT_SECRET."}
     
-    github_url = f"https://github.com/login/oauth/authorize?client_id={settings.GITHUB_CLIENT_ID}&scope=user"
+    github_url = f"{github_client.web_url}/login/oauth/authorize?client_id={settings.GITHUB_CLIENT_ID}&scope=user"
     return RedirectResponse(url=github_url)
 
 @router.get("/callback")
 async def callback(code: str, response: Response):
-    async with httpx.AsyncClient() as client:
-        # 1. Exchange code for access token
-        token_resp = await client.post(
-            "https://github.com/login/oauth/access_token",
-            params={
-                "client_id": settings.GITHUB_CLIENT_ID,
-                "client_secret": settings.GITHUB_CLIENT_SECRET,
-                "code": code
-            },
-            headers={"Accept": "application/json"}
-        )
-        token_resp_json = token_resp.json()
-        access_token = token_resp_json.get("access_token")
-        
-        if not access_token:
-            raise HTTPException(status_code=400, detail="Failed to get access token from GitHub")
+    # 1. Exchange code for access token
+    try:
+        access_token = await github_client.exchange_code(code)
+    except GitHubError:
+        access_token = None
+    if not access_token:
+        raise HTTPException(status_code=400, detail="Failed to get access token from GitHub")
+
+    # 2. Get user info
+    try:
+        user_data = await github_client.get_user(access_token)
+    except GitHubError:
+        raise HTTPException(status_code=400, detail="Failed to get user info from GitHub")
+    username = user_data.get("login")
 
-        # 2. Get user info
-        user_resp = await client.get(
-            "https://github.com/user",
-            headers={"Authorization": f"token {access_token}"}
-        )
-        user_data = user_resp.json()
-        username = user_data.get("login")
+    # 3. Create our own JWT and set in cookie
+    jwt_token = create_access_token({"sub": username})
 
-        # 3. Create our own JWT and set in cookie
-        jwt_token = create_access_token({"sub": username})
-        
-        redirect = RedirectResponse(url="/dashboard")
-        redirect.set_cookie(key="access_token", value=f"Bearer {jwt_token}", httponly=True)
-        return redirect
+    redirect = RedirectResponse(url="/dashboard")
+    redirect.set_cookie(key="access_token", value=f"Bearer {jwt_token}", httponly=True)
+    return redirect
 
 @router.get("/logout")
-async def logout():
+def logout(request: Request, db: Session = Depends(get_db)):
+    token = _session_token(request)
+    if token:
+        # Deleting the cookie alone would leave a copied token valid until it expires
+        session_tokens.revoke(db, token)
     response = RedirectResponse(url="/dashboard")
     response.delete_cookie("access_token")
     return response
 
-def get_current_user(request: Request):
+def _session_token(request: Request) -> str | None:
     token = request.cookies.get("access_token")
     if not token or not token.startswith("Bearer "):
         return None
-    
-    token = token.split(" ")[1]
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username = payload.get("sub")
-        if username is None or not isinstance(username, str):
-            return None
-        return username
-    except JWTError:
+    return token.split(" ")[1]
+
+def get_current_user(request: Request):
+    token = _session_token(request)
+    if not token:
         return None
+    # Cached after the first verification; None once revoked or expired
+    return session_tokens.verify(token)
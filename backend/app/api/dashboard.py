@@ -1,30 +1,33 @@
 from fastapi import APIRouter, Request, Depends
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
 from app.models.project import Project
 from app.models.deployment import Deployment
 from app.api.auth import get_current_user
-from app.services.docker import docker_service
+from app.core.config import settings
+from app.db.pagination import deployment_history, split_page
+from app.services.image_inventory import image_inventory
 from pathlib import Path
 
 router = APIRouter()
 templates = Jinja2Templates(directory=str(Path(__file__).parent.parent / "templates"))
 
 @router.get("/dashboard")
-async def dashboard(request: Request, db: Session = Depends(get_db), user: str = Depends(get_current_user)):
+async def dashboard(request: Request, db: AsyncSession = Depends(get_async_db), user: str = Depends(get_current_user)):
     if not user:
         return RedirectResponse(url="/auth/login")
     
-    projects = db.query(Project).all()
-    deployments = db.query(Deployment).order_by(Deployment.created_at.desc()).limit(10).all()
-    images = docker_service.list_images()
+    projects = (await db.execute(select(Project))).scalars().all()
+    deployments = (await db.execute(deployment_history(select(Deployment), limit=10))).scalars().all()[:10]
+    images = await image_inventory.list_images()
     
     return templates.TemplateResponse(
+        request,
         "dashboard.html",
         {
-            "request": request, 
             "projects": projects, 
             "deployments": deployments, 
             "images": images,
@@ -33,13 +36,21 @@ async def dashboard(request: Request, db: Session = Depends(get_db), user: str =
     )
 
 @router.get("/project/{project_id}")
-async def project_detail(request: Request, project_id: int, db: Session = Depends(get_db), user: str = Depends(get_current_user)):
+async def project_detail(request: Request, project_id: int, before: str | None = None,
+                         db: AsyncSession = Depends(get_async_db), user: str = Depends(get_current_user)):
     if not user:
         return RedirectResponse(url="/auth/login")
         
-    project = db.query(Project).filter(Project.id == project_id).first()
-    deployments = db.query(Deployment).filter(Deployment.project_id == project_id).order_by(Deployment.created_at.desc()).all()
+    project = await db.get(Project, project_id)
+    limit = settings.DEPLOYMENT_PAGE_SIZE
+    try:
+        query = deployment_history(select(Deployment).filter(Deployment.project_id == project_id), before, limit)
+    except ValueError:
+        return RedirectResponse(url=f"/project/{project_id}")
+    deployments, next_cursor = split_page((await db.execute(query)).scalars().all(), limit)
     return templates.TemplateResponse(
+        request,
         "project_detail.html",
-        {"request": request, "project": project, "deployments": deployments, "user": user}
+        {"project": project, "deployments": deployments, "next_cursor": next_cursor,
+         "older": before is not None, "user": user}
     )
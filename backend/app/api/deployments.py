@@ -0,0 +1,142 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, Header, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import get_db, SessionLocal
+from app.db.pagination import deployment_history, split_page
+from app.models.deployment import Deployment
+from app.schemas.deployment import DeploymentPage
+from app.api.auth import get_current_user
+from app.services.logs import log_store
+from app.services.log_broker import log_broker
+
+router = APIRouter()
+
+@router.get("/", response_model=DeploymentPage)
+def list_deployments(
+    project_id: int | None = None,
+    before: str | None = None,
+    limit: int = Query(settings.DEPLOYMENT_PAGE_SIZE, ge=1, le=100),
+    db: Session = Depends(get_db),
+    user: str = Depends(get_current_user)
+):
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return read_history(db, project_id, before, limit)
+
+def read_history(db: Session, project_id: int | None, before: str | None, limit: int) -> dict:
+    query = db.query(Deployment)
+    if project_id is not None:
+        query = query.filter(Deployment.project_id == project_id)
+    try:
+        rows = deployment_history(query, before, limit).all()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items, next_cursor = split_page(rows, limit)
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/{deployment_id}/logs")
+def read_deployment_logs(deployment_id: int, offset: int = 0, db: Session = Depends(get_db), user: str = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if not db.query(Deployment.id).filter(Deployment.id == deployment_id).first():
+        raise HTTPException(status_code=404, detail="Deployment not found")
+
+    content, next_offset, complete = log_store.read(db, deployment_id, max(offset, 0))
+    return {"content": content, "offset": offset, "next_offset": next_offset, "complete": complete}
+
+@router.get("/{deployment_id}/logs/stream")
+async def stream_deployment_logs(
+    deployment_id: int,
+    request: Request,
+    offset: int = 0,
+    last_event_id: str | None = Header(None),
+    user: str = Depends(get_current_user)
+):
+    """
+    Server-Sent Events feed of a deployment log. Each event id is the byte
+    offset reached so far, so a reconnecting EventSource resumes via Last-Event-ID.
+    """
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+    if not await run_in_threadpool(_deployment_exists, deployment_id):
+        raise HTTPException(status_code=404, detail="Deployment not found")
+
+    return StreamingResponse(
+        _log_events(request, deployment_id, max(offset, 0)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _deployment_exists(deployment_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        return db.query(Deployment.id).filter(Deployment.id == deployment_id).first() is not None
+    finally:
+        db.close()
+
+def _read_logs(deployment_id: int, offset: int):
+    db = SessionLocal()
+    try:
+        return log_store.read(db, deployment_id, offset)
+    finally:
+        db.close()
+
+def _sse_event(next_offset: int, text: str) -> str:
+    return f"id: {next_offset}\ndata: {json.dumps({'offset': next_offset, 'text': text})}\n\n"
+
+async def _log_events(request: Request, deployment_id: int, offset: int):
+    # Subscribe before replaying so nothing published during the replay is lost
+    subscription = log_broker.subscribe(deployment_id)
+    sent = offset
+    catch_up = True
+    try:
+        while True:
+            if catch_up:
+                subscription.lagged = False
+                text, next_offset, complete = await run_in_threadpool(_read_logs, deployment_id, sent)
+                if text:
+                    yield _sse_event(next_offset, text)
+                    sent = next_offset
+                if complete:
+                    yield "event: complete\ndata: {}\n\n"
+                    return
+                catch_up = False
+
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=settings.LOG_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                # Also picks up output from process-mode workers, which cannot publish here
+                catch_up = True
+                continue
+
+            if subscription.lagged:
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                catch_up = True
+                continue
+            if event is None:
+                yield "event: complete\ndata: {}\n\n"
+                return
+
+            start, end, text = event
+            if end <= sent:
+                continue
+            if start > sent:
+                # Output written before we subscribed is still buffered by the writer
+                await asyncio.sleep(settings.LOG_FLUSH_INTERVAL_SECONDS)
+                catch_up = True
+                continue
+            text = text.encode()[sent - start:].decode(errors="ignore")
+            yield _sse_event(end, text)
+            sent = end
+    finally:
+        log_broker.unsubscribe(subscription)
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from app.services.docker import docker_service
+from app.services.image_inventory import image_inventory
+from app.services.image_gc import image_gc
 from app.api.auth import get_current_user
 
 router = APIRouter()
@@ -9,14 +11,34 @@ router = APIRouter()
 async def list_docker_images(user: str = Depends(get_current_user)):
     if not user:
         return RedirectResponse(url="/auth/login")
-    return docker_service.list_images()
+    return await image_inventory.list_images()
 
 @router.post("/images/{image_id}/delete")
 async def delete_docker_image(image_id: str, user: str = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=401, detail="Unauthorized")
     try:
-        docker_service.delete_image(image_id)
+        await docker_service.delete_image_async(image_id)
+        image_inventory.invalidate()
         return {"message": f"Image {image_id} deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/images/gc")
+async def collect_docker_images(dry_run: bool = False, user: str = Depends(get_current_user)):
+    """
+    Runs the image garbage collector now; with dry_run only reports what it would delete.
+    """
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    try:
+        report = await image_gc.collect(dry_run=dry_run)
+        return report.to_dict()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/images/gc")
+async def last_image_collection(user: str = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return image_gc.last_report.to_dict() if image_gc.last_report else None
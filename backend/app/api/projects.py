@@ -1,14 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List
 from app.db.session import get_db
 from app.models.project import Project as ProjectModel
 from app.models.deployment import Deployment as DeploymentModel
 from app.schemas.project import Project, ProjectCreate, ProjectUpdate
+from app.schemas.deployment import DeploymentPage
+from app.api.deployments import read_history
+from app.core.config import settings
+from app.core.repo import normalize_repo_url
+from app.services.project_index import project_index
 from app.services.orchestrator import orchestrator
+from app.services.known_good import known_good
+from app.services.queue import deployment_queue
 
 router = APIRouter()
 
+@router.post("/{project_id}/rollback")
+def rollback_project_to_previous(project_id: int, db: Session = Depends(get_db)):
+    """
+    Rolls back to the newest known-good release before the running one.
+    """
+    db_project = db.query(ProjectModel).filter(ProjectModel.id == project_id).first()
+    if not db_project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    known_good.sync(db, db_project)
+    release = known_good.previous(project_id)
+    if release is None:
+        raise HTTPException(status_code=409, detail="No earlier known-good release to roll back to")
+
+    deployment = orchestrator.rollback_to_release(db, db_project, release)
+    return {"message": "Rollback triggered", "deployment_id": deployment.id}
+
 @router.post("/{project_id}/rollback/{deployment_id}")
 def rollback_project(project_id: int, deployment_id: int, db: Session = Depends(get_db)):
     db_project = db.query(ProjectModel).filter(ProjectModel.id == project_id).first()
@@ -22,24 +46,32 @@ def rollback_project(project_id: int, deployment_id: int, db: Session = Depends(
 
 @router.post("/", response_model=Project, status_code=status.HTTP_201_CREATED)
 def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
-    db_project = db.query(ProjectModel).filter(ProjectModel.github_url == project.github_url).first()
+    normalized_repo = normalize_repo_url(project.github_url)
+    db_project = db.query(ProjectModel).filter(ProjectModel.normalized_repo == normalized_repo).first()
     if db_project:
         raise HTTPException(status_code=400, detail="Project with this GitHub URL already exists")
     
     db_project = ProjectModel(**project.dict())
     db.add(db_project)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Created concurrently since the check above
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Project with this GitHub URL already exists")
     db.refresh(db_project)
+    project_index.invalidate()
     return db_project
 
-@router.post("/{project_id}/deploy")
+@router.post("/{project_id}/deploy", status_code=status.HTTP_202_ACCEPTED)
 def deploy_project(project_id: int, db: Session = Depends(get_db)):
     db_project = db.query(ProjectModel).filter(ProjectModel.id == project_id).first()
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    deployment = orchestrator.trigger_deployment(db, db_project, commit_hash="manual")
-    return {"message": "Deployment triggered", "deployment_id": deployment.id}
+    deployment = orchestrator.create_deployment(db, db_project, commit_hash="manual")
+    deployment_queue.enqueue(deployment.id, db_project.id)
+    return {"message": "Deployment queued", "deployment_id": deployment.id}
 
 @router.get("/", response_model=List[Project])
 def read_projects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
@@ -53,6 +85,33 @@ def read_project(project_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Project not found")
     return db_project
 
+@router.patch("/{project_id}", response_model=Project)
+def update_project(project_id: int, project: ProjectUpdate, db: Session = Depends(get_db)):
+    db_project = db.query(ProjectModel).filter(ProjectModel.id == project_id).first()
+    if db_project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    for field, value in project.dict(exclude_unset=True).items():
+        setattr(db_project, field, value)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Project with this GitHub URL already exists")
+    db.refresh(db_project)
+    project_index.invalidate()
+    return db_project
+
+@router.get("/{project_id}/deployments", response_model=DeploymentPage)
+def read_project_deployments(
+    project_id: int,
+    before: str | None = None,
+    limit: int = Query(settings.DEPLOYMENT_PAGE_SIZE, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    if not db.query(ProjectModel.id).filter(ProjectModel.id == project_id).first():
+        raise HTTPException(status_code=404, detail="Project not found")
+    return read_history(db, project_id, before, limit)
+
 @router.delete("/{project_id}")
 def delete_project(project_id: int, db: Session = Depends(get_db)):
     db_project = db.query(ProjectModel).filter(ProjectModel.id == project_id).first()
@@ -60,4 +119,5 @@ def delete_project(project_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Project not found")
     db.delete(db_project)
     db.commit()
+    project_index.invalidate()
     return {"message": "Project deleted successfully"}
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Request, Header, HTTPException, Depends
-from sqlalchemy.orm import Session
-from app.db.session import get_db
-from app.models.project import Project
+from fastapi import APIRouter, Request, Response, Header, HTTPException, Depends, status
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
+from app.models.webhook_delivery import WebhookDelivery
 from app.services.orchestrator import orchestrator
+from app.services.queue import deployment_queue
+from app.services.project_index import project_index, recent_deliveries
 import hmac
 import hashlib
+import json
 from app.core.config import settings
 
 router = APIRouter()
@@ -12,15 +17,19 @@ router = APIRouter()
 @router.post("/github")
 async def github_webhook(
     request: Request,
-    db: Session = Depends(get_db),
-    x_hub_signature_256: str = Header(None)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    x_hub_signature_256: str = Header(None),
+    x_github_delivery: str = Header(None)
 ):
+    # Read once: the same bytes are verified and parsed
+    body = await request.body()
+
     # Verify signature
     if settings.GITHUB_WEBHOOK_SECRET:
         if not x_hub_signature_256:
             raise HTTPException(status_code=401, detail="X-Hub-Signature-256 header missing")
         
-        body = await request.body()
         signature = hmac.new(
             settings.GITHUB_WEBHOOK_SECRET.encode(),
             body,
@@ -30,19 +39,16 @@ async def github_webhook(
         if not hmac.compare_digest(f"sha256={signature}", x_hub_signature_256):
             raise HTTPException(status_code=401, detail="Invalid signature")
     
-    payload = await request.json()
-    
     event = request.headers.get("X-GitHub-Event")
     if event == "push":
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
         repo_url = payload.get("repository", {}).get("clone_url")
-        # Handle both ssh and https urls if needed, for MVP we focus on exact match or basic transform
-        
-        project = db.query(Project).filter(Project.github_url == repo_url).first()
-        if not project:
-            # Try without .git suffix
-            if repo_url.endswith(".git"):
-                project = db.query(Project).filter(Project.github_url == repo_url[:-4]).first()
-        
+        # https, ssh and .git variants all resolve through the normalized repo URL
+        project = await project_index.lookup(db, repo_url) if repo_url else None
         if not project:
             return {"message": "Project not registered", "url": repo_url}
 
@@ -50,13 +56,33 @@ async def github_webhook(
         if branch != project.branch:
             return {"message": "Push to non-monitored branch", "branch": branch}
 
+        if x_github_delivery and recent_deliveries.seen(x_github_delivery):
+            return {"message": "Duplicate delivery", "delivery_id": x_github_delivery}
+
         commit_hash = payload.get("after")
         
-        print(f"Triggering deployment for {project.name}...")
-        # In a real environment, this should be a background task (celery/arq)
-        # For MVP we'll run it and return
-        deployment = orchestrator.trigger_deployment(db, project, commit_hash)
+        print(f"Queueing deployment for {project.name}...")
+        # The delivery is recorded in the same commit as the deployment, so a
+        # redelivery handled by another process fails on the primary key
+        if x_github_delivery:
+            db.add(WebhookDelivery(delivery_id=x_github_delivery))
+        try:
+            deployment = await orchestrator.create_deployment_async(db, project, commit_hash)
+        except IntegrityError:
+            await db.rollback()
+            # A duplicate only if another request committed this delivery; anything else is a real error
+            if not x_github_delivery or await db.get(WebhookDelivery, x_github_delivery) is None:
+                raise
+            recent_deliveries.remember(x_github_delivery)
+            return {"message": "Duplicate delivery", "delivery_id": x_github_delivery}
+        if x_github_delivery:
+            recent_deliveries.remember(x_github_delivery)
+
+        # The build runs on the deployment worker pool; GitHub only waits for the enqueue.
+        # Coalescing marks replaced deployments superseded with a sync session, so off the loop.
+        await run_in_threadpool(deployment_queue.enqueue, deployment.id, project.id, coalesce=True)
         
-        return {"message": "Deployment triggered", "deployment_id": deployment.id}
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"message": "Deployment queued", "deployment_id": deployment.id}
     
     return {"message": "Webhook received", "action": "none"}
@@ -0,0 +1,66 @@
+import hmac
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Header
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import get_db
+from app.models.build_worker import BuildWorker
+from app.schemas.build_worker import WorkerRegistration, WorkerHeartbeat, JobLogAppend, JobResult, BuildWorkerStatus
+from app.services.build_farm import build_farm
+from app.api.auth import get_current_user
+
+router = APIRouter()
+
+def verify_worker_token(authorization: str = Header(None)):
+    """
+    Worker agents authenticate with BUILD_WORKER_TOKEN as a Bearer token.
+    """
+    if settings.BUILD_WORKER_TOKEN:
+        expected = f"Bearer {settings.BUILD_WORKER_TOKEN}".encode()
+        if not hmac.compare_digest((authorization or "").encode(), expected):
+            raise HTTPException(status_code=401, detail="Invalid worker token")
+
+def _worker(db: Session, worker_id: int) -> BuildWorker:
+    worker = db.get(BuildWorker, worker_id)
+    if worker is None:
+        # The agent registers again on 404
+        raise HTTPException(status_code=404, detail="Worker not registered")
+    return worker
+
+@router.get("/", response_model=List[BuildWorkerStatus])
+def list_workers(db: Session = Depends(get_db), user: str = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return build_farm.list_workers(db)
+
+@router.post("/register", dependencies=[Depends(verify_worker_token)])
+def register_worker(registration: WorkerRegistration, db: Session = Depends(get_db)):
+    worker = build_farm.register(db, registration.name, registration.capacity)
+    return {"id": worker.id, "name": worker.name,
+            "heartbeat_seconds": settings.BUILD_WORKER_HEARTBEAT_SECONDS,
+            "poll_seconds": settings.BUILD_WORKER_POLL_SECONDS}
+
+@router.post("/{worker_id}/heartbeat", dependencies=[Depends(verify_worker_token)])
+def worker_heartbeat(worker_id: int, heartbeat: WorkerHeartbeat, db: Session = Depends(get_db)):
+    worker = _worker(db, worker_id)
+    return {"cancel": build_farm.heartbeat(db, worker, heartbeat.active_jobs)}
+
+@router.post("/{worker_id}/claim", dependencies=[Depends(verify_worker_token)])
+def claim_jobs(worker_id: int, slots: int = 1, db: Session = Depends(get_db)):
+    worker = _worker(db, worker_id)
+    jobs = build_farm.claim(db, worker, min(slots, worker.capacity))
+    return {"jobs": [{"id": job.id, "deployment_id": job.deployment_id, "target": job.target, "spec": job.spec}
+                     for job in jobs]}
+
+@router.post("/{worker_id}/jobs/{job_id}/log", dependencies=[Depends(verify_worker_token)])
+def append_job_log(worker_id: int, job_id: int, chunk: JobLogAppend, db: Session = Depends(get_db)):
+    cancelled = build_farm.append_log(db, _worker(db, worker_id), job_id, chunk.text)
+    if cancelled is None:
+        raise HTTPException(status_code=409, detail="Job is not running on this worker")
+    return {"cancel": cancelled}
+
+@router.post("/{worker_id}/jobs/{job_id}/result", dependencies=[Depends(verify_worker_token)])
+def report_job_result(worker_id: int, job_id: int, outcome: JobResult, db: Session = Depends(get_db)):
+    if not build_farm.complete(db, _worker(db, worker_id), job_id, outcome.status, outcome.result):
+        raise HTTPException(status_code=409, detail="Job is not running on this worker")
+    return {"message": f"Job {job_id} {outcome.status}"}
@@ -0,0 +1,36 @@
+"""
+Archives (compresses, and with LOG_STORAGE=file moves out of the database)
+the plain-text logs of deployments that finished before log archiving was
+enabled, in batches, then applies the log retention policy.
+
+    cd backend && python -m app.commands.backfill_logs --batch-size 500
+"""
+import argparse
+from app.db.session import SessionLocal
+from app.services.log_archive import log_archive
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Compress and archive stored deployment logs.")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per transaction")
+    parser.add_argument("--skip-retention", action="store_true", help="don't expire logs past their retention")
+    args = parser.parse_args(argv)
+
+    if log_archive.codec is None:
+        print("LOG_COMPRESSION is 'none', nothing to backfill.")
+        return
+
+    db = SessionLocal()
+    try:
+        total = log_archive.backfill(
+            db, batch_size=args.batch_size,
+            on_batch=lambda done, last_id: print(f"Archived {done} logs (up to deployment #{last_id})")
+        )
+        print(f"Backfill complete: {total} deployment logs archived with {log_archive.codec}.")
+        if not args.skip_retention:
+            expired = log_archive.apply_retention(db, batch_size=args.batch_size)
+            print(f"Retention removed the logs of {expired} deployments.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
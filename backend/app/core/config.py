@@ -10,7 +10,25 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = "autodeployhub"
     SQLALCHEMY_DATABASE_URI: str | None = None
 
+    # Connection pool, per engine (the sync and async engines each have one)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800  # seconds
+    DB_POOL_TIMEOUT: float = 30.0
+
+    # Deployment history listings
+    DEPLOYMENT_PAGE_SIZE: int = 20
+
     GITHUB_WEBHOOK_SECRET: str | None = "dev_secret_change_me"
+    # Webhook repo -> project map is reloaded at least this often (other processes may edit projects)
+    PROJECT_INDEX_TTL_SECONDS: float = 60.0
+    # Recently handled X-GitHub-Delivery IDs kept in memory for redelivery checks
+    WEBHOOK_DELIVERY_CACHE_SIZE: int = 10000
+    # Recorded delivery IDs are deleted after this long (GitHub redelivers events up to 3 days old)
+    WEBHOOK_DELIVERY_RETENTION_HOURS: float = 72.0
+    # How often expired delivery IDs are deleted
+    WEBHOOK_DELIVERY_PRUNE_INTERVAL_SECONDS: float = 3600.0
 
     # GitHub OAuth
     GITHUB_CLIENT_ID: str | None = None
@@ -18,6 +36,118 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "supersecretkeyforjwt"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    # GitHub API: api.github.com, a GitHub Enterprise URL, or a local mock server in tests
+    GITHUB_API_URL: str = "https://api.github.com"
+    GITHUB_WEB_URL: str = "https://github.com"  # OAuth endpoints
+    GITHUB_HTTP2: bool = True  # needs the h2 package (httpx[http2]), else HTTP/1.1
+    GITHUB_ETAG_CACHE_SIZE: int = 512  # GET responses kept for conditional requests
+    # Longest wait for a rate-limit reset; requests that would wait longer fail instead
+    GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS: float = 60.0
+    # Token with repo:status scope to post deployment state to pushed commits; unset disables it
+    GITHUB_STATUS_TOKEN: str | None = None
+    GITHUB_STATUS_CONTEXT: str = "autodeployhub/deploy"
+    # Public base URL of this server, linked from commit statuses
+    PUBLIC_URL: str | None = None
+
+    # Verified session tokens cached per process (LRU, until their exp)
+    SESSION_CACHE_SIZE: int = 1024
+    # Logouts recorded by other processes are picked up at least this often
+    SESSION_REVOCATION_TTL_SECONDS: float = 30.0
+
+    # Deployment job queue
+    DEPLOY_WORKERS: int = 2
+    DEPLOY_WORKER_MODE: str = "thread"  # thread or process
+    DEPLOY_PER_PROJECT_CONCURRENCY: int = 1
+    # Pushes to the same project within this window collapse into one build of the newest commit
+    DEPLOY_DEBOUNCE_SECONDS: float = 5.0
+    DEPLOY_CANCEL_IN_FLIGHT: bool = False
+    # Running deployments are heartbeated by their server process; at startup only those
+    # silent for DEPLOY_STALE_SECONDS are failed, so a restart leaves other replicas' work alone
+    DEPLOY_HEARTBEAT_SECONDS: float = 15.0
+    DEPLOY_STALE_SECONDS: float = 60.0
+
+    # Git workspace cache
+    GIT_CACHE_DIR: str = "/tmp/autodeployhub"
+    GIT_CACHE_MAX_BYTES: int = 10 * 1024 ** 3  # LRU-evict mirrors beyond 10 GiB
+    GIT_CLONE_DEPTH: int | None = None  # e.g. 1 for shallow fetches
+    GIT_CLONE_FILTER: str | None = None  # e.g. "blob:none" for partial clones
+
+    # Subprocess timeouts
+    DOCKER_COMMAND_TIMEOUT_SECONDS: float = 30.0
+    DOCKER_BUILD_TIMEOUT_SECONDS: float = 3600.0
+    GIT_COMMAND_TIMEOUT_SECONDS: float = 600.0
+
+    # "docker" runs docker build; "buildx" runs docker buildx build on BUILDX_BUILDER
+    # (created with the docker-container driver if missing) with a layer cache per build target
+    DOCKER_BUILDER: str = "docker"
+    BUILDX_BUILDER: str = "autodeployhub"
+    # buildx layer cache: "local" (under BUILDKIT_CACHE_DIR), "registry" (<image>:buildcache in REGISTRY_URL) or "none"
+    BUILDKIT_CACHE: str = "local"
+    BUILDKIT_CACHE_DIR: str = "/tmp/autodeployhub/buildkit-cache"
+
+    # Skip docker build when an identical build context was already built
+    BUILD_CACHE_ENABLED: bool = True
+    # Build targets of one project are built concurrently, up to this many at once
+    BUILD_MAX_PARALLEL: int = 4
+
+    # Build farm: deployments queue their builds for worker agents (python -m app.worker)
+    # instead of running docker on this host
+    BUILD_FARM_ENABLED: bool = False
+    BUILD_WORKER_TOKEN: str | None = "dev_worker_token_change_me"  # shared secret agents send as a Bearer token
+    BUILD_WORKER_HEARTBEAT_SECONDS: float = 10.0
+    BUILD_WORKER_POLL_SECONDS: float = 2.0  # agent idle poll interval
+    # A worker silent for this long is gone; its running jobs go back to the queue
+    BUILD_WORKER_TIMEOUT_SECONDS: float = 30.0
+    # How long a job waits for the worker that last built its project before any worker may take it
+    BUILD_AFFINITY_WAIT_SECONDS: float = 15.0
+
+    # Registry the built images are pushed to, e.g. "localhost:5000" or "ghcr.io/acme".
+    # Deployments then reference images by digest; unset keeps images in the local daemon.
+    REGISTRY_URL: str | None = None
+    REGISTRY_INSECURE: bool = False  # plain HTTP, e.g. a local registry:2
+    # With a username, the server runs docker login once before its first push; without,
+    # the docker daemon must already be logged in to the registry
+    REGISTRY_USERNAME: str | None = None
+    REGISTRY_PASSWORD: str | None = None
+
+    # Deployment log streaming
+    LOG_FLUSH_BYTES: int = 8192
+    LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    LOG_STREAM_KEEPALIVE_SECONDS: float = 15.0
+
+    # Logs of finished deployments: zstd (needs the zstandard package, else gzip), gzip or none
+    LOG_COMPRESSION: str = "zstd"
+    # "database" keeps compressed logs in the row, "file" moves them under LOG_STORAGE_DIR
+    LOG_STORAGE: str = "database"
+    LOG_STORAGE_DIR: str = "/tmp/autodeployhub/logs"
+    # Days to keep logs of finished deployments unless the project sets its own; None keeps them
+    LOG_RETENTION_DAYS: int | None = None
+    LOG_RETENTION_INTERVAL_SECONDS: float = 3600.0
+
+    # Docker image inventory shown on the dashboard and /admin/images
+    IMAGE_INVENTORY_TTL_SECONDS: float = 30.0
+    IMAGE_INVENTORY_WATCH_EVENTS: bool = False
+
+    # Image garbage collection: keep the images of each project's last N successful deployments
+    # (unless the project sets its own), of unfinished ones, and anything younger than MIN_AGE
+    IMAGE_GC_ENABLED: bool = True
+    IMAGE_GC_KEEP_SUCCESSFUL: int = 5
+    IMAGE_GC_MIN_AGE_SECONDS: float = 3600.0
+    IMAGE_GC_INTERVAL_SECONDS: float = 3600.0
+    IMAGE_GC_BATCH_SIZE: int = 50  # images per docker rmi
+
+    # Kubernetes
+    K8S_NAMESPACE: str = "default"
+    # Field manager name used for server-side apply
+    K8S_FIELD_MANAGER: str = "autodeployhub"
+    # Keep-alive connections kept open to the API server by the shared client
+    K8S_CONNECTION_POOL_SIZE: int = 10
+    # How long to wait for applied Deployments to become ready; 0 skips the wait
+    ROLLOUT_TIMEOUT_SECONDS: float = 300.0
+    # Put the previous successful images back when a rollout doesn't become ready
+    ROLLOUT_AUTO_ROLLBACK: bool = False
+    # Successful releases per project kept in memory as rollback targets
+    ROLLBACK_KNOWN_GOOD: int = 5
 
     @property
     def database_url(self) -> str:
@@ -25,6 +155,17 @@ class Settings(BaseSettings):
             return self.SQLALCHEMY_DATABASE_URI
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}/{self.POSTGRES_DB}"
 
+    @property
+    def async_database_url(self) -> str:
+        """
+        database_url with the matching asyncio driver (asyncpg, aiosqlite).
+        """
+        url = self.database_url
+        scheme, _, rest = url.partition("://")
+        driver = {"postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg",
+                  "postgresql+psycopg2": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}.get(scheme)
+        return f"{driver}://{rest}" if driver else url
+
     class Config:
         case_sensitive = True
         env_file = ".env"
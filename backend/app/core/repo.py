@@ -0,0 +1,31 @@
+import re
+
+_SCP_LIKE = re.compile(r"^(?:[\w.-]+@)?(?P<host>[\w.-]+):(?P<path>(?!//).+)$")
+
+def normalize_repo_url(url: str) -> str:
+    """
+    Canonical form of a git remote, so the https, ssh and .git variants of one
+    repository compare equal: "host/owner/repo", lowercased.
+
+        https://github.com/Owner/Repo.git  -> github.com/owner/repo
+        git@github.com:Owner/Repo.git      -> github.com/owner/repo
+        ssh://git@github.com/owner/repo/   -> github.com/owner/repo
+    """
+    url = url.strip()
+    if "://" in url:
+        rest = url.split("://", 1)[1]
+        host, _, path = rest.partition("/")
+        host = host.rsplit("@", 1)[-1]
+    else:
+        match = _SCP_LIKE.match(url)
+        if not match:
+            return url.lower().rstrip("/")
+        host, path = match.group("host"), match.group("path")
+
+    host = host.split(":", 1)[0].lower()
+    if host.startswith("www."):
+        host = host[len("www."):]
+    path = path.split("?", 1)[0].split("#", 1)[0].strip("/")
+    if path.endswith(".git"):
+        path = path[:-len(".git")]
+    return f"{host}/{path}".lower()
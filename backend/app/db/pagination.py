@@ -0,0 +1,42 @@
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+from sqlalchemy.orm import defer
+from app.models.deployment import Deployment
+
+def encode_cursor(deployment: Deployment) -> str:
+    raw = f"{deployment.created_at.isoformat()}|{deployment.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Raises ValueError for a malformed cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, deployment_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(deployment_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def deployment_history(query, before: str | None = None, limit: int = 20):
+    """
+    Newest-first keyset page of deployments, without the logs column.
+
+    Works on a Query or a select(). Fetches limit + 1 rows; pass the result to
+    split_page. Served by the (project_id, created_at, id) and (created_at, id)
+    indexes, so deep pages cost the same as the first one.
+    """
+    query = query.options(defer(Deployment.logs, raiseload=True), defer(Deployment.logs_archive, raiseload=True))
+    if before:
+        created_at, deployment_id = decode_cursor(before)
+        query = query.filter(tuple_(Deployment.created_at, Deployment.id) < tuple_(created_at, deployment_id))
+    return query.order_by(Deployment.created_at.desc(), Deployment.id.desc()).limit(limit + 1)
+
+def split_page(rows: list, limit: int) -> tuple[list, str | None]:
+    """
+    Returns (items, next_cursor) from the limit + 1 rows of deployment_history.
+    """
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
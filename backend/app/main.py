@@ -1,17 +1,98 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from app.api.webhooks import router as webhook_router
 from app.api.projects import router as project_router
 from app.api.dashboard import router as dashboard_router
 from app.api.auth import router as auth_router
 from app.api.images import router as image_router
+from app.api.deployments import router as deployment_router
+from app.api.metrics import router as metrics_router
+from app.api.workers import router as worker_router
+from app.db.session import SessionLocal, async_engine
+from app.services.queue import deployment_queue
+from app.services.log_broker import log_broker
+from app.services.image_inventory import image_inventory
+from app.services.log_archive import log_archive
+from app.services.project_index import recent_deliveries
+from app.services.image_gc import image_gc
+from app.services.known_good import known_good
+from app.services.github import github_client
+from app.services.commit_status import commit_status
+from app.services.metrics import HTTP_REQUEST_SECONDS
+from app.core.config import settings
 
-app = FastAPI(title="AutoDeployHub API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_broker.bind_loop(asyncio.get_running_loop())
+    deployment_queue.start()
+    db = SessionLocal()
+    try:
+        deployment_queue.recover(db)
+    except Exception as e:
+        print(f"Warning: Could not recover queued deployments: {e}")
+    try:
+        known_good.warm(db)
+    except Exception as e:
+        print(f"Warning: Could not load known-good releases: {e}")
+    finally:
+        db.close()
+    if settings.IMAGE_INVENTORY_WATCH_EVENTS:
+        image_inventory.start_watcher()
+    log_archive.start_retention()
+    recent_deliveries.start_pruning()
+    if settings.IMAGE_GC_ENABLED:
+        image_gc.start()
+    yield
+    await image_gc.stop()
+    await log_archive.stop_retention()
+    await recent_deliveries.stop_pruning()
+    await image_inventory.stop_watcher()
+    deployment_queue.shutdown()
+    # After the queue: statuses of deployments it finished are still being sent
+    await asyncio.to_thread(commit_status.stop)
+    await github_client.close()
+    await async_engine.dispose()
+    log_broker.bind_loop(None)
+
+app = FastAPI(title="AutoDeployHub API", lifespan=lifespan)
 
 app.include_router(webhook_router, prefix="/webhooks", tags=["webhooks"])
 app.include_router(project_router, prefix="/projects", tags=["projects"])
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(image_router, prefix="/admin", tags=["images"])
+app.include_router(deployment_router, prefix="/deployments", tags=["deployments"])
+app.include_router(worker_router, prefix="/workers", tags=["build farm"])
 app.include_router(dashboard_router, tags=["dashboard"])
+app.include_router(metrics_router, tags=["metrics"])
+
+def _route_template(request: Request) -> str:
+    route = request.scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return "unmatched"
+    # Routes of an included router only know their own path; the router prefixes
+    # are static, so the leading segments of the URL that the route didn't match are it
+    parts = request.url.path.split("/")
+    prefix = "/".join(parts[:max(0, len(parts) - path_format.count("/"))])
+    return prefix + path_format
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep the series count bounded
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=_route_template(request),
+            status=str(status_code)
+        ).observe(time.perf_counter() - started)
 
 @app.get("/")
 async def root():
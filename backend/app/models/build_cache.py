@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+class BuildCacheEntry(Base):
+    __tablename__ = "build_cache"
+
+    id: int = Column(Integer, primary_key=True, index=True)
+    context_hash: str = Column(String(64), unique=True, index=True)
+    project_id: int = Column(Integer, ForeignKey("projects.id", ondelete="SET NULL"), nullable=True)
+    image_id: str = Column(String)
+    image_name: str = Column(String)
+    hits: int = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,66 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Text, JSON, Boolean, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+class BuildWorker(Base):
+    """
+    A build-farm worker agent (python -m app.worker). Agents pull jobs; one that
+    hasn't sent a heartbeat within BUILD_WORKER_TIMEOUT_SECONDS counts as gone.
+    """
+    __tablename__ = "build_workers"
+
+    id: int = Column(Integer, primary_key=True, index=True)
+    name: str = Column(String, unique=True)
+    capacity: int = Column(Integer, default=1)  # builds it runs at once
+    active_jobs: int = Column(Integer, default=0)
+    registered_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+class BuildJob(Base):
+    """
+    One build target of a deployment, built by a worker agent in build-farm mode.
+    The worker appends its build output as BuildJobLogChunk rows; the
+    orchestrator forwards it to the deployment log.
+    """
+    __tablename__ = "build_jobs"
+
+    id: int = Column(Integer, primary_key=True, index=True)
+    deployment_id: int = Column(Integer, ForeignKey("deployments.id", ondelete="CASCADE"), index=True)
+    project_id: int = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
+    target: str = Column(String)
+    # repo_url, branch, commit_hash, project_name, sparse_paths, context, dockerfile, build_args, target, image_name, tag
+    spec = Column(JSON)
+    status: str = Column(String, default="queued")  # queued, running, succeeded, failed, cancelled
+    # The worker that last built this project, which has its git mirror and layer cache warm
+    preferred_worker_id: int = Column(Integer, ForeignKey("build_workers.id", ondelete="SET NULL"), nullable=True)
+    worker_id: int = Column(Integer, ForeignKey("build_workers.id", ondelete="SET NULL"), nullable=True)
+    cancel_requested: bool = Column(Boolean, default=False)
+    # Bytes of output in build_job_log_chunks; appends update it first, so the row lock orders them
+    log_size: int = Column(BigInteger, default=0, server_default="0")
+    # image_id, image_ref, build_seconds, steps_cached, steps_rebuilt, error
+    result = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_build_jobs_status", status, id),
+        # Last successful build of a project, for worker affinity
+        Index("ix_build_jobs_project_status", project_id, status, id),
+    )
+
+class BuildJobLogChunk(Base):
+    """
+    Append-only segment of a build job's output. Offsets are UTF-8 byte
+    positions in the job's full output, so a reader asks for the chunks past
+    the last offset it has seen.
+    """
+    __tablename__ = "build_job_log_chunks"
+    __table_args__ = (UniqueConstraint("job_id", "start_offset", name="uq_build_job_log_chunks_offset"),)
+
+    id: int = Column(Integer, primary_key=True)
+    job_id: int = Column(Integer, ForeignKey("build_jobs.id", ondelete="CASCADE"))
+    start_offset: int = Column(BigInteger)
+    end_offset: int = Column(BigInteger)
+    content: str = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
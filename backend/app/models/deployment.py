@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Text, UniqueConstraint, JSON, Index, LargeBinary
 from sqlalchemy.sql import func
 from app.db.session import Base
 
@@ -8,7 +8,45 @@ class Deployment(Base):
     id: int = Column(Integer, primary_key=True, index=True)
     project_id: int = Column(Integer, ForeignKey("projects.id"))
     commit_hash: str = Column(String)
-    status: str = Column(String)  # pending, building, deploying, success, failed
+    status: str = Column(String)  # pending, building, deploying, success, failed, superseded, cancelled
     logs: str = Column(Text, nullable=True)
+    # Finished logs are compressed (see LogArchive); logs is then NULL
+    logs_codec: str = Column(String, nullable=True)  # zstd, gzip, or expired after retention
+    logs_archive = Column(LargeBinary, nullable=True)
+    logs_location: str = Column(String, nullable=True)  # file holding the archive instead of logs_archive
+    logs_size: int = Column(BigInteger, nullable=True)  # uncompressed bytes
+    image_name: str = Column(String, nullable=True)
+    image_id: str = Column(String, nullable=True, index=True)
+    # Registry reference of the primary image (repository@sha256:...) when pushed
+    image_digest: str = Column(String, nullable=True)
+    # Per build target: name, status, image_name, image_id, image_ref, cache, build_seconds, steps_cached, steps_rebuilt
+    target_results = Column(JSON, nullable=True)
+    # Seconds per pipeline stage: queue, clone, build, push, apply, ready, total
+    stage_timings = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Renewed by the server process running the deployment; a stale one means that process is gone
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Newest-first history, per project and overall; id breaks created_at ties for keyset paging
+        Index("ix_deployments_project_created", project_id, created_at.desc(), id.desc()),
+        Index("ix_deployments_created", created_at.desc(), id.desc()),
+    )
+
+class DeploymentLogChunk(Base):
+    """
+    Append-only log segment of a running deployment. Offsets are UTF-8 byte
+    positions in the full log; chunks are folded into Deployment.logs when the
+    deployment finishes.
+    """
+    __tablename__ = "deployment_log_chunks"
+    __table_args__ = (UniqueConstraint("deployment_id", "seq", name="uq_deployment_log_chunks_seq"),)
+
+    id: int = Column(Integer, primary_key=True)
+    deployment_id: int = Column(Integer, ForeignKey("deployments.id", ondelete="CASCADE"))
+    seq: int = Column(Integer)
+    start_offset: int = Column(BigInteger)
+    end_offset: int = Column(BigInteger)
+    content: str = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
+from app.core.repo import normalize_repo_url
 from app.db.session import Base
 
 class Project(Base):
@@ -8,6 +10,19 @@ class Project(Base):
     id: int = Column(Integer, primary_key=True, index=True)
     name: str = Column(String, index=True)
     github_url: str = Column(String, unique=True, index=True)
+    # normalize_repo_url(github_url); webhooks look projects up by it
+    normalized_repo: str = Column(String, unique=True, index=True, nullable=True)
     branch: str = Column(String, default="main")
+    # [{"name", "context", "dockerfile", "port", "target", "build_args"}]; empty means one image from the repo root
+    build_targets = Column(JSON, nullable=True)
+    # Overrides LOG_RETENTION_DAYS for this project's deployment logs
+    log_retention_days: int = Column(Integer, nullable=True)
+    # Overrides IMAGE_GC_KEEP_SUCCESSFUL: images of this many successful deployments are kept
+    image_retention_count: int = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    @validates("github_url")
+    def _set_normalized_repo(self, key, github_url):
+        self.normalized_repo = normalize_repo_url(github_url) if github_url else None
+        return github_url
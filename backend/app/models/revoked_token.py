@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+class RevokedToken(Base):
+    """
+    A session JWT invalidated by logout, kept until it would have expired anyway.
+    """
+    __tablename__ = "revoked_tokens"
+
+    token_hash: str = Column(String(64), primary_key=True)  # SHA-256 of the token
+    expires_at = Column(DateTime(timezone=True), index=True)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now())
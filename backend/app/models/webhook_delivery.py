@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+class WebhookDelivery(Base):
+    """
+    A GitHub delivery (X-GitHub-Delivery) that triggered a deployment, so a
+    redelivery of the same event doesn't build twice.
+    """
+    __tablename__ = "webhook_deliveries"
+
+    delivery_id: str = Column(String, primary_key=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
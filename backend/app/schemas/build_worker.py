@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+class WorkerRegistration(BaseModel):
+    name: str
+    capacity: int = 1  # builds the worker runs at once
+
+class WorkerHeartbeat(BaseModel):
+    active_jobs: int = 0
+
+class JobLogAppend(BaseModel):
+    text: str
+
+class JobResult(BaseModel):
+    status: str  # succeeded, failed or cancelled
+    # image_id, image_ref, build_seconds, steps_cached, steps_rebuilt, rebuilt_steps, error
+    result: Dict[str, Any] = {}
+
+class BuildWorkerStatus(BaseModel):
+    id: int
+    name: str
+    capacity: int
+    active_jobs: int
+    last_heartbeat_at: Optional[datetime] = None
+    alive: bool
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, List, Any
+
+class DeploymentSummary(BaseModel):
+    """
+    A deployment without its logs, for history listings.
+    """
+    id: int
+    project_id: int
+    commit_hash: Optional[str] = None
+    status: Optional[str] = None
+    image_name: Optional[str] = None
+    image_digest: Optional[str] = None
+    target_results: Optional[List[Any]] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class DeploymentPage(BaseModel):
+    items: List[DeploymentSummary]
+    # Pass as ?before= to get the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
@@ -1,19 +1,50 @@
-from pydantic import BaseModel, HttpUrl
+import re
+from pydantic import BaseModel, HttpUrl, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List, Dict
+
+# Target names become part of Kubernetes object names, so they must be DNS labels
+_DNS_LABEL = re.compile(r"^[a-z0-9]([-a-z0-9]*[a-z0-9])?$")
+
+class BuildTarget(BaseModel):
+    name: str
+    context: str = "."  # relative to the repository root
+    dockerfile: str = "Dockerfile"  # relative to the context
+    port: int = 8000
+    target: Optional[str] = None  # multi-stage build target
+    build_args: Dict[str, str] = {}
 
 class ProjectBase(BaseModel):
     name: str
     github_url: str
     branch: Optional[str] = "main"
+    build_targets: Optional[List[BuildTarget]] = None
+    log_retention_days: Optional[int] = None
+    image_retention_count: Optional[int] = None
+
+def _check_target_names(targets: Optional[List[BuildTarget]]) -> Optional[List[BuildTarget]]:
+    """
+    Unique, lowercase RFC 1123 labels of at most 63 characters.
+    """
+    names = [target.name for target in targets or []]
+    for name in names:
+        if len(name) > 63 or not _DNS_LABEL.match(name):
+            raise ValueError(f"Build target name '{name}' must be a lowercase DNS label "
+                             "(a-z, 0-9 and '-', at most 63 characters)")
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate build target names: {', '.join(duplicates)}")
+    return targets
 
 class ProjectCreate(ProjectBase):
-    pass
+    _check_targets = field_validator("build_targets")(_check_target_names)
 
 class ProjectUpdate(ProjectBase):
     name: Optional[str] = None
     github_url: Optional[str] = None
 
+    _check_targets = field_validator("build_targets")(_check_target_names)
+
 class Project(ProjectBase):
     id: int
     created_at: datetime
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.build_cache import BuildCacheEntry
+
+def _pattern_to_regex(pattern: str) -> re.Pattern:
+    """
+    Translates a .dockerignore pattern (Go filepath.Match syntax plus **) into a regex.
+    """
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "*":
+            if pattern[i:i + 2] == "**":
+                i += 2
+                if pattern[i:i + 1] == "/":
+                    # "**/" matches zero or more leading directories
+                    regex += "(?:.*/)?"
+                    i += 1
+                else:
+                    regex += ".*"
+                continue
+            regex += "[^/]*"
+        elif c == "?":
+            regex += "[^/]"
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(c)
+            else:
+                body = pattern[i + 1:end]
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                regex += "[" + body + "]"
+                i = end
+        elif c == "\\" and i + 1 < len(pattern):
+            i += 1
+            regex += re.escape(pattern[i])
+        else:
+            regex += re.escape(c)
+        i += 1
+    return re.compile(regex + r"\Z")
+
+class DockerIgnore:
+    """
+    Evaluates .dockerignore rules the way the docker CLI does: the last matching
+    pattern wins, "!" re-includes, and a pattern matching a directory excludes
+    everything below it.
+    """
+    def __init__(self, lines: list[str]):
+        self.rules: list[tuple[re.Pattern, bool]] = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            include = line.startswith("!")
+            if include:
+                line = line[1:].strip()
+            line = os.path.normpath(line.lstrip("/"))
+            if line == ".":
+                continue
+            self.rules.append((_pattern_to_regex(line), include))
+
+    @classmethod
+    def from_context(cls, context_path: Path):
+        ignore_file = Path(context_path) / ".dockerignore"
+        if not ignore_file.exists():
+            return cls([])
+        return cls(ignore_file.read_text().splitlines())
+
+    def is_excluded(self, relative_path: str) -> bool:
+        parts = relative_path.split("/")
+        candidates = ["/".join(parts[:n]) for n in range(1, len(parts) + 1)]
+        excluded = False
+        for regex, include in self.rules:
+            if any(regex.match(candidate) for candidate in candidates):
+                excluded = not include
+        return excluded
+
+class BuildCache:
+    """
+    Content-addressed cache from a build context digest to the image it produced.
+    """
+    def hash_context(self, context_path: Path, dockerfile: str = "Dockerfile",
+                     build_args: dict | None = None, target: str | None = None) -> str:
+        context_path = Path(context_path)
+        ignore = DockerIgnore.from_context(context_path)
+        digest = hashlib.sha256()
+
+        files = []
+        for root, dirs, filenames in os.walk(context_path):
+            rel_root = os.path.relpath(root, context_path)
+            rel_root = "" if rel_root == "." else rel_root + "/"
+            # Git metadata differs per worktree checkout and would defeat the cache
+            dirs[:] = sorted(d for d in dirs if rel_root or d != ".git")
+            for name in filenames:
+                rel = rel_root + name
+                if rel == ".git":
+                    continue
+                if not ignore.is_excluded(rel):
+                    files.append(rel)
+
+        for rel in sorted(files):
+            full = context_path / rel
+            stat = full.lstat()
+            digest.update(rel.encode() + b"\0")
+            digest.update(b"x" if stat.st_mode & 0o111 else b"-")
+            if full.is_symlink():
+                digest.update(b"link:" + os.readlink(full).encode())
+            else:
+                with open(full, "rb") as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        digest.update(block)
+            digest.update(b"\0")
+
+        # The Dockerfile is always sent to the daemon, even when .dockerignore lists it
+        dockerfile_path = context_path / dockerfile
+        if dockerfile_path.exists():
+            digest.update(b"dockerfile:" + dockerfile.encode() + b"\0" + dockerfile_path.read_bytes())
+        for key in sorted(build_args or {}):
+            digest.update(f"arg:{key}={build_args[key]}\0".encode())
+        if target:
+            digest.update(f"target:{target}\0".encode())
+        return digest.hexdigest()
+
+    def lookup(self, db: Session, context_hash: str):
+        return db.query(BuildCacheEntry).filter(BuildCacheEntry.context_hash == context_hash).first()
+
+    def record_hit(self, db: Session, entry: BuildCacheEntry):
+        entry.hits = (entry.hits or 0) + 1
+        entry.last_used_at = datetime.now(timezone.utc)
+        db.commit()
+
+    def record(self, db: Session, context_hash: str, project_id: int, image_id: str, image_name: str):
+        """
+        Inserts or updates the entry of context_hash. Two deployments can build
+        the same context at once; the second insert then fails on the unique
+        hash and updates the row the first one wrote. Never raises: a missing
+        entry only costs a rebuild, it must not fail the deployment.
+        """
+        for _ in range(2):
+            try:
+                # A savepoint, so a conflict doesn't roll back the deployment's own changes
+                with db.begin_nested():
+                    entry = self.lookup(db, context_hash)
+                    if entry is None:
+                        entry = BuildCacheEntry(context_hash=context_hash, hits=0)
+                        db.add(entry)
+                    entry.project_id = project_id
+                    entry.image_id = image_id
+                    entry.image_name = image_name
+                    entry.last_used_at = datetime.now(timezone.utc)
+                db.commit()
+                return entry
+            except IntegrityError:
+                continue
+            except Exception as e:
+                db.rollback()
+                print(f"Warning: Could not record build cache entry {context_hash[:12]}: {e}")
+                return None
+        print(f"Warning: Could not record build cache entry {context_hash[:12]}: concurrent inserts kept conflicting")
+        return None
+
+    def invalidate(self, db: Session, image_id: str):
+        db.query(BuildCacheEntry).filter(BuildCacheEntry.image_id == image_id).delete()
+        db.commit()
+
+build_cache = BuildCache()
@@ -0,0 +1,261 @@
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.build_worker import BuildWorker, BuildJob, BuildJobLogChunk
+
+FINISHED = ("succeeded", "failed", "cancelled")
+# Queued jobs a claim looks at; the farm queue is short
+CLAIM_SCAN_LIMIT = 200
+
+def _aware(value: datetime | None) -> datetime | None:
+    # SQLite hands back naive datetimes; everything here is UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+class BuildFarm:
+    """
+    Build jobs kept in the database and pulled by worker agents over the
+    /workers API. The orchestrator submits one job per build target and
+    follows it; a job goes to the worker that last built the same project
+    (warm git mirror and layer cache) unless that worker is gone or the job
+    has waited affinity_wait seconds for it.
+    """
+    def __init__(self, worker_timeout: float | None = None, affinity_wait: float | None = None,
+                 poll_interval: float = 0.5):
+        self.worker_timeout = worker_timeout if worker_timeout is not None else settings.BUILD_WORKER_TIMEOUT_SECONDS
+        self.affinity_wait = affinity_wait if affinity_wait is not None else settings.BUILD_AFFINITY_WAIT_SECONDS
+        self.poll_interval = poll_interval
+
+    @property
+    def enabled(self) -> bool:
+        return settings.BUILD_FARM_ENABLED
+
+    def alive(self, worker: BuildWorker, now: datetime | None = None) -> bool:
+        now = now or datetime.now(timezone.utc)
+        heartbeat = _aware(worker.last_heartbeat_at)
+        return heartbeat is not None and now - heartbeat <= timedelta(seconds=self.worker_timeout)
+
+    def register(self, db: Session, name: str, capacity: int) -> BuildWorker:
+        """
+        Registers a worker by name. A worker registering again has restarted,
+        so the jobs it was running are gone with the old process and requeued.
+        """
+        worker = db.query(BuildWorker).filter(BuildWorker.name == name).first()
+        if worker is None:
+            worker = BuildWorker(name=name)
+            db.add(worker)
+        else:
+            self._requeue(db, [worker.id])
+        worker.capacity = max(1, capacity)
+        worker.active_jobs = 0
+        worker.last_heartbeat_at = datetime.now(timezone.utc)
+        db.commit()
+        db.refresh(worker)
+        return worker
+
+    def heartbeat(self, db: Session, worker: BuildWorker, active_jobs: int) -> list[int]:
+        """
+        Records a heartbeat and returns the worker's running jobs that were cancelled.
+        """
+        worker.last_heartbeat_at = datetime.now(timezone.utc)
+        worker.active_jobs = active_jobs
+        db.commit()
+        rows = db.query(BuildJob.id).filter(
+            BuildJob.worker_id == worker.id, BuildJob.status == "running", BuildJob.cancel_requested.is_(True)
+        )
+        return [job_id for (job_id,) in rows]
+
+    def claim(self, db: Session, worker: BuildWorker, slots: int) -> list[BuildJob]:
+        """
+        Hands up to slots queued jobs to worker, oldest first, skipping jobs
+        still waiting for the live worker they prefer.
+        """
+        now = datetime.now(timezone.utc)
+        worker.last_heartbeat_at = now
+        self.requeue_lost(db, now)
+        claimed = []
+        if slots > 0:
+            workers = {w.id: w for w in db.query(BuildWorker)}
+            queued = db.query(BuildJob.id, BuildJob.preferred_worker_id, BuildJob.created_at).filter(
+                BuildJob.status == "queued"
+            ).order_by(BuildJob.id).limit(CLAIM_SCAN_LIMIT).all()
+            for job_id, preferred_id, created_at in queued:
+                if len(claimed) >= slots:
+                    break
+                if not self._may_take(worker, workers.get(preferred_id), created_at, now):
+                    continue
+                # Conditional update: of several workers claiming the same job, one wins
+                taken = db.query(BuildJob).filter(BuildJob.id == job_id, BuildJob.status == "queued").update(
+                    {"status": "running", "worker_id": worker.id, "claimed_at": now}, synchronize_session=False
+                )
+                if taken:
+                    claimed.append(job_id)
+            worker.active_jobs = (worker.active_jobs or 0) + len(claimed)
+        db.commit()
+        if not claimed:
+            return []
+        return db.query(BuildJob).filter(BuildJob.id.in_(claimed)).order_by(BuildJob.id).all()
+
+    def _may_take(self, worker: BuildWorker, preferred: BuildWorker | None, created_at: datetime | None,
+                  now: datetime) -> bool:
+        if preferred is None or preferred.id == worker.id or not self.alive(preferred, now):
+            return True
+        waited = now - (_aware(created_at) or now)
+        return waited >= timedelta(seconds=self.affinity_wait)
+
+    def append_log(self, db: Session, worker: BuildWorker, job_id: int, text: str) -> bool | None:
+        """
+        Appends build output to a job running on worker. Returns whether the job
+        was cancelled, or None if worker doesn't hold the job (any more).
+        """
+        appended = self._add_log(db, job_id, text, BuildJob.worker_id == worker.id)
+        db.commit()
+        if not appended:
+            return None
+        return bool(db.query(BuildJob.cancel_requested).filter(BuildJob.id == job_id).scalar())
+
+    def _add_log(self, db: Session, job_id: int, text: str, *conditions) -> bool:
+        """
+        Adds text as the next chunk of a running job's output. The caller commits.
+        """
+        size = len(text.encode())
+        updated = db.query(BuildJob).filter(BuildJob.id == job_id, BuildJob.status == "running", *conditions).update(
+            {"log_size": BuildJob.log_size + size}, synchronize_session=False
+        )
+        if not updated:
+            return False
+        end = db.query(BuildJob.log_size).filter(BuildJob.id == job_id).scalar()
+        db.add(BuildJobLogChunk(job_id=job_id, start_offset=end - size, end_offset=end, content=text))
+        return True
+
+    def complete(self, db: Session, worker: BuildWorker, job_id: int, status: str, result: dict) -> bool:
+        """
+        Records the outcome of a job running on worker; False if worker doesn't hold it.
+        """
+        job = db.get(BuildJob, job_id)
+        if job is None or job.worker_id != worker.id or job.status != "running":
+            return False
+        if status != "succeeded":
+            status = "cancelled" if job.cancel_requested or status == "cancelled" else "failed"
+        job.status = status
+        job.result = result
+        job.finished_at = datetime.now(timezone.utc)
+        worker.active_jobs = max(0, (worker.active_jobs or 0) - 1)
+        db.commit()
+        return True
+
+    def requeue_lost(self, db: Session, now: datetime | None = None) -> int:
+        """
+        Puts jobs of workers that stopped sending heartbeats back in the queue.
+        """
+        now = now or datetime.now(timezone.utc)
+        lost = [worker.id for worker in db.query(BuildWorker) if not self.alive(worker, now)]
+        if not lost:
+            return 0
+        count = self._requeue(db, lost)
+        if count:
+            print(f"Requeued {count} build job(s) of unresponsive build workers")
+        return count
+
+    def _requeue(self, db: Session, worker_ids: list[int]) -> int:
+        running = db.query(BuildJob).filter(BuildJob.status == "running", BuildJob.worker_id.in_(worker_ids))
+        running.filter(BuildJob.cancel_requested.is_(True)).update(
+            {"status": "cancelled", "finished_at": datetime.now(timezone.utc)}, synchronize_session=False
+        )
+        job_ids = [job_id for (job_id,) in running.with_entities(BuildJob.id)]
+        for job_id in job_ids:
+            self._add_log(db, job_id, "\n[build farm] Worker stopped responding, build requeued.\n")
+        return running.update({"status": "queued", "worker_id": None, "claimed_at": None}, synchronize_session=False)
+
+    def preferred_worker(self, db: Session, project_id: int) -> BuildWorker | None:
+        """
+        The live worker that last built project_id successfully, if any.
+        """
+        worker_id = db.query(BuildJob.worker_id).filter(
+            BuildJob.project_id == project_id, BuildJob.status == "succeeded", BuildJob.worker_id.isnot(None)
+        ).order_by(BuildJob.id.desc()).limit(1).scalar()
+        worker = db.get(BuildWorker, worker_id) if worker_id else None
+        return worker if worker is not None and self.alive(worker) else None
+
+    def submit(self, db: Session, project_id: int, deployment_id: int, specs: dict[str, dict]) -> list[BuildJob]:
+        """
+        Queues one job per build target (name -> spec) of a deployment.
+        """
+        preferred = self.preferred_worker(db, project_id)
+        now = datetime.now(timezone.utc)
+        jobs = [
+            BuildJob(deployment_id=deployment_id, project_id=project_id, target=name, spec=spec, status="queued",
+                     preferred_worker_id=preferred.id if preferred else None, log_size=0, created_at=now)
+            for name, spec in specs.items()
+        ]
+        db.add_all(jobs)
+        db.commit()
+        return jobs
+
+    def wait(self, db: Session, jobs: list[BuildJob], on_log, check_cancelled, timeout: float):
+        """
+        Polls jobs until all have finished, passing new output to on_log(job, text).
+        A failed job cancels the others. If check_cancelled raises or timeout runs
+        out, the jobs are cancelled and the exception propagates.
+        """
+        deadline = time.monotonic() + timeout
+        offsets = {job.id: 0 for job in jobs}
+        pending = set(offsets)
+        try:
+            while pending:
+                self.requeue_lost(db)
+                db.commit()
+                # Statuses first: a job finished by then has all of its output in chunks already
+                statuses = dict(db.query(BuildJob.id, BuildJob.status).filter(BuildJob.id.in_(offsets)))
+                # Only the chunks not seen yet
+                chunks = db.query(BuildJobLogChunk.job_id, BuildJobLogChunk.end_offset, BuildJobLogChunk.content).filter(
+                    or_(*(and_(BuildJobLogChunk.job_id == job_id, BuildJobLogChunk.start_offset >= offset)
+                          for job_id, offset in offsets.items()))
+                ).order_by(BuildJobLogChunk.job_id, BuildJobLogChunk.start_offset).all()
+                output: dict[int, list[str]] = {}
+                for job_id, end_offset, content in chunks:
+                    output.setdefault(job_id, []).append(content)
+                    offsets[job_id] = end_offset
+                for job in jobs:
+                    if job.id in output:
+                        on_log(job, "".join(output[job.id]))
+                    status = statuses.get(job.id)
+                    if status in FINISHED:
+                        pending.discard(job.id)
+                        if status == "failed" and pending:
+                            self.cancel(db, jobs)
+                            pending.clear()
+                if not pending:
+                    break
+                check_cancelled()
+                if time.monotonic() > deadline:
+                    raise Exception(f"Build farm jobs did not finish within {timeout:g}s")
+                time.sleep(self.poll_interval)
+        except BaseException:
+            self.cancel(db, jobs)
+            raise
+
+    def cancel(self, db: Session, jobs: list[BuildJob]):
+        """
+        Drops queued jobs and asks workers to stop running ones.
+        """
+        ids = [job.id for job in jobs]
+        db.query(BuildJob).filter(BuildJob.id.in_(ids), BuildJob.status == "queued").update(
+            {"status": "cancelled", "finished_at": datetime.now(timezone.utc)}, synchronize_session=False
+        )
+        db.query(BuildJob).filter(BuildJob.id.in_(ids), BuildJob.status == "running").update(
+            {"cancel_requested": True}, synchronize_session=False
+        )
+        db.commit()
+
+    def list_workers(self, db: Session) -> list[dict]:
+        now = datetime.now(timezone.utc)
+        return [{
+            "id": worker.id, "name": worker.name, "capacity": worker.capacity, "active_jobs": worker.active_jobs,
+            "last_heartbeat_at": worker.last_heartbeat_at, "alive": self.alive(worker, now)
+        } for worker in db.query(BuildWorker).order_by(BuildWorker.name)]
+
+build_farm = BuildFarm()
@@ -0,0 +1,129 @@
+import asyncio
+import re
+import threading
+from dataclasses import dataclass
+from app.core.config import settings
+from app.services.github import github_client, repo_path
+
+_SHA = re.compile(r"^[0-9a-f]{40}$")
+
+# Deployment status -> GitHub commit status state and description
+STATES = {
+    "pending": ("pending", "Deployment queued"),
+    "building": ("pending", "Building images"),
+    "deploying": ("pending", "Deploying to Kubernetes"),
+    "success": ("success", "Deployed"),
+    "failed": ("failure", "Deployment failed"),
+    "cancelled": ("error", "Deployment cancelled"),
+    "superseded": ("error", "Superseded by a newer push"),
+}
+
+@dataclass(frozen=True)
+class StatusUpdate:
+    repo: str
+    sha: str
+    state: str
+    description: str
+    target_url: str | None = None
+
+class CommitStatusReporter:
+    """
+    Posts deployment state back to the pushed commit as a GitHub commit status.
+    Updates are sent from a background event loop, one at a time and in order,
+    so the pipeline never waits on GitHub and a commit's statuses can't arrive
+    swapped. Disabled without GITHUB_STATUS_TOKEN.
+    """
+    def __init__(self, client=None, token: str | None = None, context: str | None = None):
+        self.client = client or github_client
+        self.token = token if token is not None else settings.GITHUB_STATUS_TOKEN
+        self.context = context or settings.GITHUB_STATUS_CONTEXT
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token)
+
+    def report(self, project, deployment):
+        """
+        Queues the deployment's current status for its commit. Safe to call from any thread.
+        """
+        if not self.enabled:
+            return
+        sha = (deployment.commit_hash or "").lower()
+        repo = repo_path(project.github_url)
+        # Manual deploys have no commit to report on
+        if deployment.status not in STATES or not _SHA.match(sha) or repo is None:
+            return
+        state, description = STATES[deployment.status]
+        target_url = f"{settings.PUBLIC_URL.rstrip('/')}/project/{project.id}" if settings.PUBLIC_URL else None
+        loop = self._ensure_started()
+        loop.call_soon_threadsafe(self._queue.put_nowait, StatusUpdate(repo, sha, state, description, target_url))
+
+    async def send(self, update: StatusUpdate):
+        await self.client.create_commit_status(update.repo, update.sha, update.state, self.token, self.context,
+                                               description=update.description, target_url=update.target_url)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Waits until every queued update was sent (or failed).
+        """
+        loop = self._loop
+        if loop is None:
+            return True
+        future = asyncio.run_coroutine_threadsafe(self._queue.join(), loop)
+        try:
+            future.result(timeout)
+            return True
+        except TimeoutError:
+            future.cancel()
+            return False
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Sends what is queued, then stops the background loop.
+        """
+        with self._lock:
+            thread, loop = self._thread, self._loop
+            self._thread = self._loop = None
+        if thread is None:
+            return
+        loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        thread.join(timeout)
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._thread is None:
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(ready,), name="commit-status", daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def _run(self, ready: threading.Event):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        ready.set()
+        try:
+            loop.run_until_complete(self._send_loop())
+        finally:
+            loop.close()
+
+    async def _send_loop(self):
+        while True:
+            update = await self._queue.get()
+            try:
+                if update is None:
+                    break
+                await self.send(update)
+            except Exception as e:
+                print(f"Warning: Could not report {update.state} to {update.repo}@{update.sha[:7]}: {e}")
+            finally:
+                self._queue.task_done()
+        await self.client.close()
+
+commit_status = CommitStatusReporter()
@@ -1,30 +1,212 @@
+import fcntl
+import re
+import shutil
 import subprocess
+import threading
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services.process import run_command, CommandError
+
+_SIZE_UNITS = {"B": 1, "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4}
+
+def parse_size(size: str):
+    """
+    Converts docker's human readable sizes ("12.3MB", "950kB") to bytes.
+    """
+    size = size.strip().upper()
+    for unit in ("TB", "GB", "MB", "KB", "B"):
+        if size.endswith(unit):
+            try:
+                return int(float(size[:-len(unit)]) * _SIZE_UNITS[unit])
+            except ValueError:
+                return None
+    return None
+
+# BuildKit plain progress: "#7 [builder 3/5] RUN pip install ..." then "#7 CACHED" or "#7 DONE 12.3s"
+_BUILDKIT_STEP = re.compile(r"^#(\d+) \[(?:[^\]]*? )?\d+/\d+\] (.+)$")
+_BUILDKIT_RESULT = re.compile(r"^#(\d+) (CACHED|DONE|ERROR)")
+# Classic builder: "Step 3/5 : RUN ..." followed by " ---> Using cache" when reused
+_CLASSIC_STEP = re.compile(r"^Step \d+/\d+ : (.+)$")
+
+def count_build_steps(output: str) -> dict:
+    """
+    Which Dockerfile steps of a build were taken from the layer cache and which
+    were rebuilt, from the build output. Returns {"cached": n, "rebuilt": n,
+    "rebuilt_steps": [...]}.
+    """
+    steps: dict[str, str] = {}
+    outcomes: dict[str, str] = {}
+    classic_step = None
+    for line in output.splitlines():
+        line = line.strip()
+        match = _BUILDKIT_STEP.match(line)
+        if match:
+            steps.setdefault(match.group(1), match.group(2))
+            continue
+        match = _BUILDKIT_RESULT.match(line)
+        if match and match.group(1) in steps:
+            # CACHED wins over the DONE that BuildKit may print for the same step
+            if outcomes.get(match.group(1)) != "CACHED":
+                outcomes[match.group(1)] = match.group(2)
+            continue
+        match = _CLASSIC_STEP.match(line)
+        if match:
+            classic_step = f"classic-{len(steps)}"
+            steps[classic_step] = match.group(1)
+            outcomes[classic_step] = "DONE"
+        elif classic_step and line == "---> Using cache":
+            outcomes[classic_step] = "CACHED"
+
+    # FROM only resolves the base image, it isn't a cacheable step
+    built = {key: step for key, step in steps.items() if not step.upper().startswith("FROM ")}
+    cached = [key for key in built if outcomes.get(key) == "CACHED"]
+    rebuilt = [built[key] for key in built if outcomes.get(key) == "DONE"]
+    return {"cached": len(cached), "rebuilt": len(rebuilt), "rebuilt_steps": rebuilt}
 
 class DockerService:
-    def build_image(self, project_path: Path, image_name: str, tag: str = "latest"):
+    def __init__(self, cache_dir: str | None = None):
+        # Local BuildKit layer cache, one directory per image
+        self.cache_dir = Path(cache_dir or settings.BUILDKIT_CACHE_DIR)
+        self._builder_ready = False
+        self._builder_lock = threading.Lock()
+        self._logins: set[tuple[str, str]] = set()
+        self._login_lock = threading.Lock()
+
+    def build_image(self, project_path: Path, image_name: str, tag: str = "latest", on_output=None,
+                    dockerfile: str = "Dockerfile", build_args: dict | None = None, target: str | None = None):
         """
         Builds a docker image from a Dockerfile in the project_path.
+        Output is passed line by line to on_output as the build produces it;
+        if on_output raises, the build is killed and the exception propagates.
         """
         full_image_name = f"{image_name}:{tag}"
         
+        # Check if Dockerfile exists
+        if not (Path(project_path) / dockerfile).exists():
+            raise Exception(f"{dockerfile} not found in build context")
+
+        print(f"Building Docker image {full_image_name}...")
+        if settings.DOCKER_BUILDER == "buildx":
+            self.ensure_builder()
+        cache_export = self._cache_export_dir(image_name)
+        process = subprocess.Popen(
+            self._build_command(full_image_name, dockerfile, build_args, target, cache_export),
+            cwd=str(project_path),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1
+        )
+        # Same limit as build_image_async; reading the output blocks, so a timer kills the build
+        timed_out = threading.Event()
+
+        def expire():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(settings.DOCKER_BUILD_TIMEOUT_SECONDS, expire)
+        timer.daemon = True
+        timer.start()
+        output = []
         try:
-            # Check if Dockerfile exists
-            if not (project_path / "Dockerfile").exists():
-                raise Exception("Dockerfile not found in project root")
+            for line in process.stdout:
+                output.append(line)
+                if on_output is not None:
+                    on_output(line)
+        except BaseException:
+            process.kill()
+            process.wait()
+            self._discard_cache_export(cache_export)
+            raise
+        finally:
+            timer.cancel()
+            process.stdout.close()
 
-            print(f"Building Docker image {full_image_name}...")
-            result = subprocess.run(
-                ["docker", "build", "-t", full_image_name, "."],
-                cwd=str(project_path),
-                check=True,
-                capture_output=True,
-                text=True
-            )
-            return full_image_name, result.stdout
-        except subprocess.CalledProcessError as e:
-            print(f"Docker build failed: {e.stderr}")
-            raise Exception(f"Docker build failed: {e.stderr}")
+        if process.wait() != 0:
+            self._discard_cache_export(cache_export)
+            if timed_out.is_set():
+                print(f"Docker build of {full_image_name} timed out")
+                raise Exception(f"Docker build timed out after {settings.DOCKER_BUILD_TIMEOUT_SECONDS}s")
+            tail = "".join(output[-20:])
+            print(f"Docker build failed: {tail}")
+            raise Exception(f"Docker build failed: {tail}")
+        self._rotate_local_cache(image_name, cache_export)
+        return full_image_name, "".join(output)
+
+    def get_image_id(self, image_name: str):
+        """
+        Returns the local image ID for a name or ID, or None if it does not exist.
+        """
+        result = subprocess.run(
+            ["docker", "image", "inspect", "--format", "{{.Id}}", image_name],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip()
+
+    def get_repo_digests(self, image_name: str) -> list[str]:
+        """
+        The repository@digest references docker recorded for an image when it
+        was pushed or pulled. Empty if there are none or the image doesn't exist.
+        """
+        result = subprocess.run(
+            ["docker", "image", "inspect", "--format", "{{range .RepoDigests}}{{println .}}{{end}}", image_name],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            return []
+        return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
+    def push_image(self, full_image_name: str, on_output=None) -> str:
+        """
+        Pushes an image, passing progress lines to on_output. Returns the output.
+        """
+        print(f"Pushing Docker image {full_image_name}...")
+        process = subprocess.Popen(
+            ["docker", "push", full_image_name],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1
+        )
+        output = []
+        try:
+            for line in process.stdout:
+                output.append(line)
+                if on_output is not None:
+                    on_output(line)
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            process.stdout.close()
+
+        if process.wait() != 0:
+            tail = "".join(output[-20:])
+            print(f"Docker push failed: {tail}")
+            raise Exception(f"Docker push failed: {tail}")
+        return "".join(output)
+
+    def tag_image(self, source: str, target: str):
+        """
+        Points target at an existing image. Returns False if source is gone.
+        """
+        result = subprocess.run(
+            ["docker", "tag", source, target],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            print(f"Docker tag failed: {result.stderr}")
+            return False
+        return True
 
     def delete_image(self, image_id: str):
         """
@@ -48,26 +230,234 @@ class DockerService:
         Lists Docker images, optionally filtered by name.
         """
         try:
-            # Format: ID|Repository|Tag|CreatedAt
             result = subprocess.run(
-                ["docker", "images", "--filter", f"reference={filter_name}*", "--format", "{{.ID}}|{{.Repository}}|{{.Tag}}|{{.CreatedAt}}"],
+                self._list_images_command(filter_name),
                 check=True,
                 capture_output=True,
                 text=True
             )
-            images = []
-            for line in result.stdout.strip().split("\n"):
-                if not line: continue
-                parts = line.split("|")
-                images.append({
-                    "id": parts[0],
-                    "repository": parts[1],
-                    "tag": parts[2],
-                    "created_at": parts[3]
-                })
-            return images
+            return self._parse_images(result.stdout)
         except subprocess.CalledProcessError as e:
             print(f"Docker list failed: {e.stderr}")
             return []
 
+    async def build_image_async(self, project_path: Path, image_name: str, tag: str = "latest", on_output=None,
+                                dockerfile: str = "Dockerfile", build_args: dict | None = None, target: str | None = None):
+        """
+        Event-loop friendly build_image: output is streamed to on_output (plain or
+        async callable) and the build is killed on timeout or cancellation.
+        """
+        full_image_name = f"{image_name}:{tag}"
+        if not (Path(project_path) / dockerfile).exists():
+            raise Exception(f"{dockerfile} not found in build context")
+
+        print(f"Building Docker image {full_image_name}...")
+        if settings.DOCKER_BUILDER == "buildx":
+            await run_in_threadpool(self.ensure_builder)
+        cache_export = self._cache_export_dir(image_name)
+        try:
+            result = await run_command(
+                self._build_command(full_image_name, dockerfile, build_args, target, cache_export),
+                cwd=str(project_path),
+                timeout=settings.DOCKER_BUILD_TIMEOUT_SECONDS,
+                on_output=on_output or (lambda line: None)
+            )
+        except BaseException as e:
+            await run_in_threadpool(self._discard_cache_export, cache_export)
+            if not isinstance(e, CommandError):
+                raise
+            print(f"Docker build failed: {e}")
+            raise Exception(f"Docker build failed: {e}")
+        await run_in_threadpool(self._rotate_local_cache, image_name, cache_export)
+        return full_image_name, result.stdout
+
+    async def delete_image_async(self, image_id: str):
+        try:
+            print(f"Deleting Docker image {image_id}...")
+            await run_command(["docker", "rmi", "-f", image_id], timeout=settings.DOCKER_COMMAND_TIMEOUT_SECONDS)
+            return True
+        except CommandError as e:
+            print(f"Docker delete failed: {e}")
+            raise Exception(f"Docker delete failed: {e.output}")
+
+    async def delete_images_async(self, image_ids: list[str]):
+        """
+        Deletes several images with one `docker rmi`. Images that can't be removed
+        (e.g. used by a container) are reported in the output but don't stop the others.
+        """
+        print(f"Deleting {len(image_ids)} Docker images...")
+        return await run_command(["docker", "rmi", "-f", *image_ids],
+                                 timeout=settings.DOCKER_COMMAND_TIMEOUT_SECONDS, check=False)
+
+    async def images_disk_usage_async(self):
+        """
+        Bytes used by all local images, as reported by `docker system df`, or None.
+        """
+        try:
+            result = await run_command(["docker", "system", "df", "--format", "{{.Type}}|{{.Size}}"],
+                                       timeout=settings.DOCKER_COMMAND_TIMEOUT_SECONDS)
+        except (CommandError, OSError) as e:
+            print(f"Docker disk usage failed: {e}")
+            return None
+        for line in result.stdout.splitlines():
+            kind, _, size = line.partition("|")
+            if kind == "Images":
+                return parse_size(size)
+        return None
+
+    async def list_images_async(self, filter_name: str = "autodeployhub"):
+        try:
+            result = await run_command(self._list_images_command(filter_name), timeout=settings.DOCKER_COMMAND_TIMEOUT_SECONDS)
+            return self._parse_images(result.stdout)
+        except (CommandError, OSError) as e:
+            print(f"Docker list failed: {e}")
+            return []
+
+    def ensure_builder(self):
+        """
+        Creates the BuildKit builder used for buildx builds if it doesn't exist.
+        The docker-container driver is needed to export the layer cache.
+        """
+        if self._builder_ready:
+            return
+        with self._builder_lock:
+            if self._builder_ready:
+                return
+            name = settings.BUILDX_BUILDER
+            inspect = subprocess.run(["docker", "buildx", "inspect", name], capture_output=True, text=True)
+            if inspect.returncode != 0:
+                print(f"Creating BuildKit builder {name}...")
+                result = subprocess.run(
+                    ["docker", "buildx", "create", "--name", name, "--driver", "docker-container"],
+                    capture_output=True,
+                    text=True
+                )
+                if result.returncode != 0:
+                    raise Exception(f"Could not create buildx builder {name}: {result.stderr.strip()}")
+            self._builder_ready = True
+
+    def login(self, server: str, username: str, password: str):
+        """
+        docker login once per process and registry, so docker push and buildx
+        registry caches can authenticate. The password goes through stdin.
+        """
+        if (server, username) in self._logins:
+            return
+        with self._login_lock:
+            if (server, username) in self._logins:
+                return
+            result = subprocess.run(
+                ["docker", "login", server, "--username", username, "--password-stdin"],
+                input=password,
+                capture_output=True,
+                text=True,
+                timeout=settings.DOCKER_COMMAND_TIMEOUT_SECONDS
+            )
+            if result.returncode != 0:
+                raise Exception(f"docker login to {server} failed: {result.stderr.strip()}")
+            self._logins.add((server, username))
+
+    def cache_options(self, image_name: str, cache_export: Path | None = None) -> tuple[list[str], list[str]]:
+        """
+        --cache-from and --cache-to values of a buildx build, one cache per image
+        (so per project and build target).
+        """
+        if settings.BUILDKIT_CACHE == "local":
+            cache_dir = self._local_cache_dir(image_name)
+            # Exported to a directory of its own and swapped in after the build, see _rotate_local_cache
+            cache_export = cache_export or self._cache_export_dir(image_name)
+            cache_from = [f"type=local,src={cache_dir}"] if cache_dir.exists() else []
+            return cache_from, [f"type=local,dest={cache_export},mode=max"]
+        if settings.BUILDKIT_CACHE == "registry":
+            if not settings.REGISTRY_URL:
+                raise Exception("BUILDKIT_CACHE=registry needs REGISTRY_URL")
+            if settings.REGISTRY_USERNAME:
+                self.login(settings.REGISTRY_URL.split("/")[0], settings.REGISTRY_USERNAME,
+                           settings.REGISTRY_PASSWORD or "")
+            ref = f"{settings.REGISTRY_URL.rstrip('/')}/{image_name}:buildcache"
+            options = ",registry.insecure=true" if settings.REGISTRY_INSECURE else ""
+            return [f"type=registry,ref={ref}{options}"], [f"type=registry,ref={ref},mode=max{options}"]
+        return [], []
+
+    def _local_cache_dir(self, image_name: str) -> Path:
+        return self.cache_dir / image_name.replace("/", "_")
+
+    def _cache_export_dir(self, image_name: str) -> Path | None:
+        """
+        Where one build exports its local cache; unique, so concurrent builds of
+        the same image don't write into each other's export.
+        """
+        if settings.DOCKER_BUILDER != "buildx" or settings.BUILDKIT_CACHE != "local":
+            return None
+        return Path(f"{self._local_cache_dir(image_name)}.new-{uuid.uuid4().hex[:12]}")
+
+    def _rotate_local_cache(self, image_name: str, cache_export: Path | None):
+        # The local exporter never removes old blobs, so each build writes a new cache
+        if cache_export is None or not cache_export.exists():
+            return
+        cache_dir = self._local_cache_dir(image_name)
+        previous = Path(f"{cache_dir}.old-{uuid.uuid4().hex[:12]}")
+        with self._cache_lock(image_name):
+            if cache_dir.exists():
+                cache_dir.rename(previous)
+            cache_export.rename(cache_dir)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    def _discard_cache_export(self, cache_export: Path | None):
+        if cache_export is not None:
+            shutil.rmtree(cache_export, ignore_errors=True)
+
+    @contextmanager
+    def _cache_lock(self, image_name: str):
+        # flock, so builds in other threads, deployment worker processes and agents sharing the directory wait
+        lock_path = Path(f"{self._local_cache_dir(image_name)}.lock")
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _build_command(self, full_image_name: str, dockerfile: str = "Dockerfile",
+                       build_args: dict | None = None, target: str | None = None,
+                       cache_export: Path | None = None):
+        if settings.DOCKER_BUILDER == "buildx":
+            command = ["docker", "buildx", "build", "--builder", settings.BUILDX_BUILDER,
+                       "--progress=plain", "--load", "-t", full_image_name]
+            cache_from, cache_to = self.cache_options(full_image_name.rsplit(":", 1)[0], cache_export)
+            for value in cache_from:
+                command += ["--cache-from", value]
+            for value in cache_to:
+                command += ["--cache-to", value]
+        else:
+            command = ["docker", "build", "-t", full_image_name]
+        if dockerfile != "Dockerfile":
+            command += ["-f", dockerfile]
+        for key, value in (build_args or {}).items():
+            command += ["--build-arg", f"{key}={value}"]
+        if target:
+            command += ["--target", target]
+        return command + ["."]
+
+    def _list_images_command(self, filter_name: str):
+        # Format: ID|Repository|Tag|CreatedAt|Size
+        return ["docker", "images", "--no-trunc", "--filter", f"reference={filter_name}*", "--format", "{{.ID}}|{{.Repository}}|{{.Tag}}|{{.CreatedAt}}|{{.Size}}"]
+
+    def _parse_images(self, stdout: str):
+        images = []
+        for line in stdout.strip().split("\n"):
+            if not line: continue
+            parts = line.split("|")
+            images.append({
+                "id": parts[0],
+                "short_id": parts[0].removeprefix("sha256:")[:12],
+                "repository": parts[1],
+                "tag": parts[2],
+                "created_at": parts[3],
+                "size": parts[4] if len(parts) > 4 else None,
+                "size_bytes": parse_size(parts[4]) if len(parts) > 4 else None
+            })
+        return images
+
 docker_service = DockerService()
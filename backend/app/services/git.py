@@ -1,30 +1,342 @@
+import asyncio
 import os
 import subprocess
 import shutil
+import fcntl
+import hashlib
+import threading
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
+from app.core.config import settings
+from app.services.process import run_command, CommandError
+from app.services.metrics import CACHE_LOOKUPS
+
+def context_path(checkout, context: str) -> Path:
+    """
+    The directory of a build context inside a checkout; contexts outside it are refused.
+    """
+    root = Path(checkout).resolve()
+    if context == ".":
+        return root
+    path = (root / context).resolve()
+    if path != root and root not in path.parents:
+        raise Exception(f"Build context {context} is outside the repository")
+    return path
 
 class GitService:
-    def __init__(self, base_path: str = "/tmp/autodeployhub"):
-        self.base_path = Path(base_path)
-        self.base_path.mkdir(parents=True, exist_ok=True)
-
-    def clone_repo(self, repo_url: str, project_name: str, branch: str = "main") -> Path:
-        project_path = self.base_path / project_name
-        
-        # Clean up if exists
-        if project_path.exists():
-            shutil.rmtree(project_path)
-            
-        try:
-            subprocess.run(
-                ["git", "clone", "--branch", branch, repo_url, str(project_path)],
+    """
+    Keeps one bare mirror per repository under <base_path>/mirrors and checks
+    each deployment out into its own throwaway worktree, so a redeploy only
+    fetches the objects it is missing instead of recloning the whole repo.
+    """
+    def __init__(self, base_path: str | None = None, max_cache_bytes: int | None = None,
+                 depth: int | None = None, filter_spec: str | None = None):
+        self.base_path = Path(base_path or settings.GIT_CACHE_DIR)
+        self.mirrors_path = self.base_path / "mirrors"
+        self.worktrees_path = self.base_path / "worktrees"
+        self.mirrors_path.mkdir(parents=True, exist_ok=True)
+        self.worktrees_path.mkdir(parents=True, exist_ok=True)
+
+        self.max_cache_bytes = max_cache_bytes if max_cache_bytes is not None else settings.GIT_CACHE_MAX_BYTES
+        self.depth = depth if depth is not None else settings.GIT_CLONE_DEPTH
+        self.filter_spec = filter_spec if filter_spec is not None else settings.GIT_CLONE_FILTER
+
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # worktree path -> mirror path, for release() and to pin mirrors in use
+        self._worktrees: dict[Path, Path] = {}
+        # worktree path -> shared flock on the mirror's pin file, held until release()
+        self._pins: dict[Path, object] = {}
+
+    def clone_repo(self, repo_url: str, project_name: str, branch: str = "main",
+                   commit_hash: str | None = None, sparse_paths: list[str] | None = None) -> Path:
+        """
+        Checks out commit_hash (or the head of branch for manual deploys) into a
+        fresh worktree and returns its path. Call release() when done with it.
+        """
+        key = self._repo_key(repo_url, project_name)
+        mirror_path = self.mirrors_path / f"{key}.git"
+        target = commit_hash if commit_hash and commit_hash != "manual" else None
+
+        with self._repo_lock(key):
+            try:
+                self._ensure_mirror(repo_url, mirror_path)
+                revision = self._fetch(mirror_path, branch, target)
+                worktree_path = self._worktree_path(key, revision)
+                for args, kwargs in self._worktree_commands(mirror_path, worktree_path, revision, sparse_paths):
+                    self._git(args, **kwargs)
+                self._checked_out(worktree_path, mirror_path)
+            except subprocess.CalledProcessError as e:
+                print(f"Error cloning repo: {e.stderr}")
+                raise Exception(f"Failed to clone repository: {e.stderr}")
+
+        self.evict()
+        return worktree_path
+
+    async def clone_repo_async(self, repo_url: str, project_name: str, branch: str = "main",
+                               commit_hash: str | None = None, sparse_paths: list[str] | None = None) -> Path:
+        """
+        clone_repo for async callers: the same git commands run as asyncio
+        subprocesses with GIT_COMMAND_TIMEOUT_SECONDS and are killed if the
+        caller is cancelled. Locking and filesystem work happen in a thread.
+        """
+        key = self._repo_key(repo_url, project_name)
+        mirror_path = self.mirrors_path / f"{key}.git"
+        target = commit_hash if commit_hash and commit_hash != "manual" else None
+
+        acquire = asyncio.ensure_future(asyncio.to_thread(self._acquire_repo_lock, key))
+        try:
+            handle = await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            acquire.add_done_callback(lambda task: self._release_repo_lock(task.result()))
+            raise
+
+        try:
+            await asyncio.to_thread(self._remove_partial_mirror, mirror_path)
+            for args, kwargs in self._mirror_commands(repo_url, mirror_path):
+                await self._git_async(args, **kwargs)
+            revision = await self._fetch_async(mirror_path, branch, target)
+            worktree_path = self._worktree_path(key, revision)
+            for args, kwargs in self._worktree_commands(mirror_path, worktree_path, revision, sparse_paths):
+                await self._git_async(args, **kwargs)
+            self._checked_out(worktree_path, mirror_path)
+        except CommandError as e:
+            print(f"Error cloning repo: {e.output}")
+            raise Exception(f"Failed to clone repository: {e.output}")
+        finally:
+            self._release_repo_lock(handle)
+
+        await asyncio.to_thread(self.evict)
+        return worktree_path
+
+    def release(self, worktree_path: Path):
+        """
+        Removes a worktree created by clone_repo. The mirror stays cached.
+        """
+        worktree_path = Path(worktree_path)
+        mirror_path = self._worktrees.pop(worktree_path, None)
+        try:
+            if mirror_path is not None and mirror_path.exists():
+                with self._repo_lock(mirror_path.name[:-len(".git")]):
+                    try:
+                        self._git(["worktree", "remove", "--force", str(worktree_path)], git_dir=mirror_path)
+                        return
+                    except subprocess.CalledProcessError as e:
+                        print(f"Failed to remove worktree {worktree_path}: {e.stderr}")
+            if worktree_path.exists():
+                shutil.rmtree(worktree_path, ignore_errors=True)
+        finally:
+            pin = self._pins.pop(worktree_path, None)
+            if pin is not None:
+                pin.close()
+
+    def evict(self):
+        """
+        Deletes least recently used mirrors until the cache fits in max_cache_bytes.
+        Mirrors with a live worktree are never evicted.
+        """
+        if not self.max_cache_bytes:
+            return
+
+        mirrors = [p for p in self.mirrors_path.glob("*.git") if p.is_dir()]
+        sizes = {p: self._dir_size(p) for p in mirrors}
+        total = sum(sizes.values())
+        in_use = set(self._worktrees.values())
+
+        for mirror_path in sorted(mirrors, key=lambda p: p.stat().st_mtime):
+            if total <= self.max_cache_bytes:
+                break
+            if mirror_path in in_use:
+                continue
+            key = mirror_path.name[:-len(".git")]
+            with self._repo_lock(key):
+                # Worktrees of other processes (process-mode workers) hold a shared lock on the pin file
+                with open(self.mirrors_path / f"{key}.pins", "w") as pins:
+                    try:
+                        fcntl.flock(pins, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    print(f"Evicting git mirror {mirror_path.name} ({sizes[mirror_path]} bytes)")
+                    shutil.rmtree(mirror_path, ignore_errors=True)
+            total -= sizes[mirror_path]
+
+    def _ensure_mirror(self, repo_url: str, mirror_path: Path):
+        self._remove_partial_mirror(mirror_path)
+        for args, kwargs in self._mirror_commands(repo_url, mirror_path):
+            self._git(args, **kwargs)
+
+    def _remove_partial_mirror(self, mirror_path: Path):
+        if mirror_path.exists() and not (mirror_path / "HEAD").exists():
+            # Leftover from an interrupted clone
+            shutil.rmtree(mirror_path)
+
+    def _mirror_commands(self, repo_url: str, mirror_path: Path) -> list[tuple[list[str], dict]]:
+        if (mirror_path / "HEAD").exists():
+            return [(["remote", "set-url", "origin", repo_url], {"git_dir": mirror_path}),
+                    (["worktree", "prune"], {"git_dir": mirror_path})]
+        return [(self._clone_args() + [repo_url, str(mirror_path)], {})]
+
+    def _fetch(self, mirror_path: Path, branch: str, commit_hash: str | None) -> str:
+        """
+        Makes sure the wanted revision exists in the mirror and returns its sha.
+        Commits that are already present (redeploys, rollbacks) skip the network.
+        """
+        if self._count_lookup(commit_hash and self._has_commit(mirror_path, commit_hash)):
+            return commit_hash
+        self._git(self._fetch_refspec_args(branch, commit_hash), git_dir=mirror_path)
+        if commit_hash:
+            return commit_hash
+        return self._git(["rev-parse", f"refs/heads/{branch}"], git_dir=mirror_path).strip()
+
+    async def _fetch_async(self, mirror_path: Path, branch: str, commit_hash: str | None) -> str:
+        present = commit_hash and await self._git_async(
+            self._has_commit_args(commit_hash), git_dir=mirror_path, check=False
+        ) is not None
+        if self._count_lookup(present):
+            return commit_hash
+        await self._git_async(self._fetch_refspec_args(branch, commit_hash), git_dir=mirror_path)
+        if commit_hash:
+            return commit_hash
+        return (await self._git_async(["rev-parse", f"refs/heads/{branch}"], git_dir=mirror_path)).strip()
+
+    def _count_lookup(self, hit) -> bool:
+        CACHE_LOOKUPS.labels(cache="git", result="hit" if hit else "miss").inc()
+        return bool(hit)
+
+    def _fetch_refspec_args(self, branch: str, commit_hash: str | None) -> list[str]:
+        if commit_hash:
+            return self._fetch_args() + ["origin", commit_hash]
+        return self._fetch_args() + ["origin", f"+refs/heads/{branch}:refs/heads/{branch}"]
+
+    def _worktree_path(self, key: str, revision: str) -> Path:
+        return self.worktrees_path / f"{key}-{revision[:7]}-{uuid.uuid4().hex[:8]}"
+
+    def _worktree_commands(self, mirror_path: Path, worktree_path: Path, revision: str,
+                           sparse_paths: list[str] | None) -> list[tuple[list[str], dict]]:
+        if not sparse_paths:
+            return [(["worktree", "add", "--detach", str(worktree_path), revision], {"git_dir": mirror_path})]
+        return [
+            (["worktree", "add", "--detach", "--no-checkout", str(worktree_path), revision], {"git_dir": mirror_path}),
+            (["sparse-checkout", "set", "--no-cone", *[f"/{p.strip('/')}/" for p in sparse_paths]], {"cwd": worktree_path}),
+            (["reset", "--hard", "-q", revision], {"cwd": worktree_path}),
+        ]
+
+    def _checked_out(self, worktree_path: Path, mirror_path: Path):
+        # Called with the repo lock held, so evict() can't slip in before the pin
+        pin = open(self.mirrors_path / f"{mirror_path.name[:-len('.git')]}.pins", "w")
+        fcntl.flock(pin, fcntl.LOCK_SH)
+        self._pins[worktree_path] = pin
+        self._worktrees[worktree_path] = mirror_path
+        os.utime(mirror_path)
+
+    def _clone_args(self) -> list[str]:
+        return ["clone", "--bare", "--no-tags"] + self._transfer_args()
+
+    def _fetch_args(self) -> list[str]:
+        return ["fetch", "--no-tags"] + self._transfer_args()
+
+    def _transfer_args(self) -> list[str]:
+        args = []
+        if self.depth:
+            args += ["--depth", str(self.depth)]
+        if self.filter_spec:
+            args += [f"--filter={self.filter_spec}"]
+        return args
+
+    def _has_commit(self, mirror_path: Path, commit_hash: str) -> bool:
+        try:
+            result = subprocess.run(
+                ["git", "--git-dir", str(mirror_path)] + self._has_commit_args(commit_hash),
+                capture_output=True,
+                timeout=settings.GIT_COMMAND_TIMEOUT_SECONDS
+            )
+        except subprocess.TimeoutExpired:
+            return False
+        return result.returncode == 0
+
+    def _has_commit_args(self, commit_hash: str) -> list[str]:
+        return ["cat-file", "-e", f"{commit_hash}^{{commit}}"]
+
+    def _git(self, args: list[str], git_dir: Path | None = None, cwd: Path | None = None) -> str:
+        command = ["git"]
+        if git_dir is not None:
+            command += ["--git-dir", str(git_dir)]
+        try:
+            result = subprocess.run(
+                command + args,
+                cwd=str(cwd) if cwd else None,
                 check=True,
                 capture_output=True,
-                text=True
+                text=True,
+                timeout=settings.GIT_COMMAND_TIMEOUT_SECONDS
             )
-            return project_path
-        except subprocess.CalledProcessError as e:
-            print(f"Error cloning repo: {e.stderr}")
-            raise Exception(f"Failed to clone repository: {e.stderr}")
+        except subprocess.TimeoutExpired as e:
+            # subprocess.run has killed git; callers handle it like any failed command
+            raise subprocess.CalledProcessError(-9, e.cmd, output=e.stdout,
+                                                stderr=f"git timed out after {e.timeout}s")
+        return result.stdout
+
+    async def _git_async(self, args: list[str], git_dir: Path | None = None, cwd: Path | None = None,
+                         check: bool = True) -> str | None:
+        """
+        Async _git. With check=False a non-zero exit returns None instead of raising.
+        """
+        command = ["git"]
+        if git_dir is not None:
+            command += ["--git-dir", str(git_dir)]
+        result = await run_command(
+            command + args,
+            cwd=str(cwd) if cwd else None,
+            timeout=settings.GIT_COMMAND_TIMEOUT_SECONDS,
+            check=check
+        )
+        if result.returncode != 0:
+            return None
+        return result.stdout
+
+    @contextmanager
+    def _repo_lock(self, key: str):
+        handle = self._acquire_repo_lock(key)
+        try:
+            yield
+        finally:
+            self._release_repo_lock(handle)
+
+    def _acquire_repo_lock(self, key: str):
+        # Thread lock for workers in this process, flock for process-mode workers
+        with self._locks_guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        lock.acquire()
+        try:
+            lock_file = open(self.mirrors_path / f"{key}.lock", "w")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        except BaseException:
+            lock.release()
+            raise
+        return lock, lock_file
+
+    def _release_repo_lock(self, handle):
+        lock, lock_file = handle
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+        finally:
+            lock.release()
+
+    def _repo_key(self, repo_url: str, project_name: str) -> str:
+        digest = hashlib.sha1(repo_url.encode()).hexdigest()[:12]
+        name = "".join(c if c.isalnum() or c in "-_" else "-" for c in project_name.lower())
+        return f"{name}-{digest}"
+
+    def _dir_size(self, path: Path) -> int:
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return total
 
 git_service = GitService()
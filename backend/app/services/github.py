@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlencode
+import httpx
+from app.core.config import settings
+from app.core.repo import normalize_repo_url
+
+try:
+    import h2  # noqa: F401
+except ImportError:  # optional, HTTP/1.1 is used instead
+    h2 = None
+
+class GitHubError(Exception):
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        super().__init__(f"GitHub API returned {status_code}: {message}")
+
+@dataclass
+class RateLimit:
+    limit: int | None = None
+    remaining: int | None = None
+    reset_at: float = 0.0  # epoch seconds
+
+def repo_path(github_url: str) -> str | None:
+    """
+    "owner/repo" of a repository URL in any of the forms normalize_repo_url accepts.
+    """
+    _, _, path = normalize_repo_url(github_url).partition("/")
+    return path if path.count("/") == 1 else None
+
+def _token_key(token: str | None) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()[:16] if token else "anonymous"
+
+class GitHubClient:
+    """
+    GitHub API client shared for the lifetime of the app. Connections are kept
+    alive (HTTP/2 when h2 is installed), GETs are conditional on a cached ETag
+    so an unchanged resource costs a 304, which GitHub doesn't count against
+    the rate limit, and the rate-limit headers are tracked per token: a token
+    out of requests waits for its reset (up to max_wait) instead of failing.
+    """
+    def __init__(self, api_url: str | None = None, web_url: str | None = None, etag_cache_size: int | None = None,
+                 max_wait: float | None = None, retries: int = 2, transport: httpx.AsyncBaseTransport | None = None):
+        self.api_url = (api_url or settings.GITHUB_API_URL).rstrip("/")
+        self.web_url = (web_url or settings.GITHUB_WEB_URL).rstrip("/")
+        self.etag_cache_size = settings.GITHUB_ETAG_CACHE_SIZE if etag_cache_size is None else etag_cache_size
+        self.max_wait = settings.GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS if max_wait is None else max_wait
+        self.retries = retries
+        self.transport = transport
+        # One connection pool per event loop (the API's, the commit status reporter's)
+        self._clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        # "<token key> <url>" -> (etag, parsed body)
+        self._etags: OrderedDict[str, tuple[str, Any]] = OrderedDict()
+        self._limits: dict[str, RateLimit] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=self.api_url,
+                http2=settings.GITHUB_HTTP2 and h2 is not None,
+                transport=self.transport,
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                headers={"Accept": "application/vnd.github+json", "X-GitHub-Api-Version": "2022-11-28",
+                         "User-Agent": settings.PROJECT_NAME}
+            )
+            self._clients[loop] = client
+        return client
+
+    async def close(self):
+        """
+        Closes the connection pool of the running event loop.
+        """
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def rate_limit(self, token: str | None = None) -> RateLimit:
+        with self._lock:
+            limit = self._limits.get(_token_key(token))
+            return RateLimit(limit.limit, limit.remaining, limit.reset_at) if limit else RateLimit()
+
+    async def request(self, method: str, url: str, token: str | None = None, **kwargs) -> httpx.Response:
+        """
+        Sends a request, waiting out rate limits: before sending when the token
+        has no requests left, and after a 403/429 saying so (up to retries times).
+        """
+        key = _token_key(token)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        for attempt in range(self.retries + 1):
+            await self._wait_for_budget(key)
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+            self._record(key, response)
+            delay = self._retry_delay(response)
+            if delay is None or attempt == self.retries or delay > self.max_wait:
+                return response
+            print(f"GitHub rate limit hit, retrying {method} {url} in {delay:.0f}s")
+            await asyncio.sleep(delay)
+        return response
+
+    async def get_json(self, path: str, token: str | None = None, params: dict | None = None) -> Any:
+        """
+        GET with If-None-Match; a 304 answers from the cached body.
+        """
+        cache_key = f"{_token_key(token)} {path}?{urlencode(sorted((params or {}).items()))}"
+        with self._lock:
+            cached = self._etags.get(cache_key)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        response = await self.request("GET", path, token, params=params, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            with self._lock:
+                if cache_key in self._etags:
+                    self._etags.move_to_end(cache_key)
+            return cached[1]
+
+        _raise_for_status(response)
+        data = response.json()
+        etag = response.headers.get("ETag")
+        if etag and self.etag_cache_size:
+            with self._lock:
+                self._etags[cache_key] = (etag, data)
+                self._etags.move_to_end(cache_key)
+                while len(self._etags) > self.etag_cache_size:
+                    self._etags.popitem(last=False)
+        return data
+
+    async def post_json(self, path: str, token: str | None = None, json: Any = None) -> Any:
+        response = await self.request("POST", path, token, json=json)
+        _raise_for_status(response)
+        return response.json()
+
+    async def exchange_code(self, code: str) -> str | None:
+        """
+        OAuth: trades the callback code for a user access token.
+        """
+        response = await self.request(
+            "POST", f"{self.web_url}/login/oauth/access_token",
+            params={"client_id": settings.GITHUB_CLIENT_ID, "client_secret": settings.GITHUB_CLIENT_SECRET,
+                    "code": code},
+            headers={"Accept": "application/json"}
+        )
+        _raise_for_status(response)
+        return response.json().get("access_token")
+
+    async def get_user(self, token: str) -> dict:
+        return await self.get_json("/user", token)
+
+    async def get_commit(self, repo: str, sha: str, token: str | None = None) -> dict:
+        return await self.get_json(f"/repos/{repo}/commits/{sha}", token)
+
+    async def create_commit_status(self, repo: str, sha: str, state: str, token: str, context: str,
+                                   description: str | None = None, target_url: str | None = None) -> dict:
+        """
+        state is one of pending, success, failure or error.
+        """
+        body = {"state": state, "context": context}
+        if description:
+            body["description"] = description[:140]
+        if target_url:
+            body["target_url"] = target_url
+        return await self.post_json(f"/repos/{repo}/statuses/{sha}", token, json=body)
+
+    async def _wait_for_budget(self, key: str):
+        with self._lock:
+            limit = self._limits.get(key)
+            wait = limit.reset_at - time.time() + 1 if limit and limit.remaining == 0 else 0
+        if wait <= 0:
+            return
+        if wait > self.max_wait:
+            raise GitHubError(429, f"rate limit exhausted, resets in {wait:.0f}s")
+        print(f"GitHub rate limit exhausted, waiting {wait:.0f}s for the reset")
+        await asyncio.sleep(wait)
+
+    def _record(self, key: str, response: httpx.Response):
+        headers = response.headers
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        try:
+            limit = RateLimit(int(headers.get("X-RateLimit-Limit", 0)) or None,
+                              int(headers["X-RateLimit-Remaining"]),
+                              float(headers.get("X-RateLimit-Reset", 0)))
+        except ValueError:
+            return
+        with self._lock:
+            self._limits[key] = limit
+
+    def _retry_delay(self, response: httpx.Response) -> float | None:
+        """
+        Seconds to wait before retrying a rate-limited response; None if it wasn't one.
+        """
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                return None
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            reset = float(response.headers.get("X-RateLimit-Reset", 0))
+            return max(0.0, reset - time.time() + 1)
+        # A plain 403 is a permission problem, not a rate limit
+        return None if response.status_code == 403 else 60.0
+
+def _raise_for_status(response: httpx.Response):
+    if response.is_success:
+        return
+    try:
+        message = response.json().get("message", response.text)
+    except ValueError:
+        message = response.text
+    raise GitHubError(response.status_code, message)
+
+github_client = GitHubClient()
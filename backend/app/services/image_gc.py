@@ -0,0 +1,202 @@
+import asyncio
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.deployment import Deployment
+from app.models.project import Project
+from app.services.build_cache import build_cache
+from app.services.docker import docker_service
+from app.services.image_inventory import image_inventory
+from app.services.known_good import known_good
+from app.services.metrics import IMAGE_GC_DELETED, IMAGE_GC_RECLAIMED_BYTES
+
+@dataclass
+class GcReport:
+    deleted: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+    kept: int = 0
+    reclaimed_bytes: int = 0
+    dry_run: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+def parse_created(created_at: str | None):
+    """
+    Parses docker's CreatedAt ("2024-05-01 10:00:00 +0000 UTC"), or None.
+    """
+    try:
+        return datetime.strptime(created_at[:25], "%Y-%m-%d %H:%M:%S %z")
+    except (TypeError, ValueError):
+        return None
+
+def _deployment_images(deployment) -> tuple[set[str], set[str]]:
+    ids = {deployment.image_id} if deployment.image_id else set()
+    names = {deployment.image_name} if deployment.image_name else set()
+    for result in deployment.target_results or []:
+        if result.get("image_id"):
+            ids.add(result["image_id"])
+        if result.get("image_name"):
+            names.add(result["image_name"])
+    return ids, names
+
+class ImageGarbageCollector:
+    """
+    Deletes local autodeployhub/* images nothing needs anymore. Kept are the
+    images of each project's last IMAGE_GC_KEEP_SUCCESSFUL successful
+    deployments (which include what is deployed now), of the known-good
+    releases a rollback can return to, of unfinished deployments, and images
+    younger than IMAGE_GC_MIN_AGE_SECONDS.
+    """
+    def __init__(self, filter_name: str = "autodeployhub"):
+        self.filter_name = filter_name
+        self.last_report: GcReport | None = None
+        self._task: asyncio.Task | None = None
+        self._lock: asyncio.Lock | None = None
+
+    def protected_images(self, db: Session) -> tuple[set[str], set[str]]:
+        """
+        IDs and name:tag references of the images to keep.
+        """
+        ids: set[str] = set()
+        names: set[str] = set()
+        columns = (Deployment.image_id, Deployment.image_name, Deployment.target_results)
+
+        for project in db.query(Project).all():
+            keep = project.image_retention_count
+            keep = keep if keep is not None else settings.IMAGE_GC_KEEP_SUCCESSFUL
+            recent = db.query(*columns).filter(
+                Deployment.project_id == project.id,
+                Deployment.status == "success"
+            ).order_by(Deployment.id.desc()).limit(max(1, keep)).all()
+
+            # Rollback targets, which go further back than a small image_retention_count
+            known_good.sync(db, project)
+            releases = known_good.releases(project.id)
+            for release in releases:
+                names |= set(release.images.values())
+            if releases:
+                recent += db.query(*columns).filter(
+                    Deployment.id.in_([release.deployment_id for release in releases])
+                ).all()
+
+            for deployment in recent:
+                deployment_ids, deployment_names = _deployment_images(deployment)
+                ids |= deployment_ids
+                names |= deployment_names
+
+        # In flight: built images may not be recorded on a finished deployment yet
+        for deployment in db.query(*columns).filter(Deployment.finished_at.is_(None)).all():
+            deployment_ids, deployment_names = _deployment_images(deployment)
+            ids |= deployment_ids
+            names |= deployment_names
+        return ids, names
+
+    def plan(self, images: list[dict], ids: set[str], names: set[str], now: datetime | None = None) -> list[dict]:
+        """
+        The images (one entry per image ID) to delete.
+        """
+        now = now or datetime.now(timezone.utc)
+        min_age = timedelta(seconds=settings.IMAGE_GC_MIN_AGE_SECONDS)
+        by_id: dict[str, list[dict]] = {}
+        for image in images:
+            by_id.setdefault(image["id"], []).append(image)
+
+        candidates = []
+        for image_id, rows in by_id.items():
+            if image_id in ids or any(f"{row['repository']}:{row['tag']}" in names for row in rows):
+                continue
+            created = parse_created(rows[0].get("created_at"))
+            if created is None or now - created < min_age:
+                continue
+            candidates.append(rows[0])
+        return candidates
+
+    async def collect(self, dry_run: bool = False) -> GcReport:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # A manual run and the periodic one never delete concurrently
+        async with self._lock:
+            report = await self._collect(dry_run)
+        self.last_report = report
+        return report
+
+    async def _collect(self, dry_run: bool) -> GcReport:
+        images = await docker_service.list_images_async(self.filter_name)
+        ids, names = await run_in_threadpool(self._load_protected)
+        candidates = self.plan(images, ids, names)
+        report = GcReport(kept=len({image["id"] for image in images}) - len(candidates), dry_run=dry_run)
+        if dry_run or not candidates:
+            report.deleted = [image["id"] for image in candidates]
+            report.reclaimed_bytes = sum(image.get("size_bytes") or 0 for image in candidates)
+            return report
+
+        usage_before = await docker_service.images_disk_usage_async()
+        batch_size = max(1, settings.IMAGE_GC_BATCH_SIZE)
+        for start in range(0, len(candidates), batch_size):
+            batch = [image["id"] for image in candidates[start:start + batch_size]]
+            result = await docker_service.delete_images_async(batch)
+            if result.returncode != 0:
+                print(f"Image GC: some deletions failed: {(result.stderr or result.stdout).strip()}")
+        image_inventory.invalidate()
+
+        remaining = {image["id"] for image in await docker_service.list_images_async(self.filter_name)}
+        for image in candidates:
+            (report.failed if image["id"] in remaining else report.deleted).append(image["id"])
+        usage_after = await docker_service.images_disk_usage_async()
+        if usage_before is not None and usage_after is not None:
+            report.reclaimed_bytes = max(0, usage_before - usage_after)
+        else:
+            # Overestimates: shared base layers are counted once per image
+            report.reclaimed_bytes = sum(image.get("size_bytes") or 0 for image in candidates
+                                         if image["id"] in report.deleted)
+
+        await run_in_threadpool(self._forget_cached, report.deleted)
+        IMAGE_GC_DELETED.inc(len(report.deleted))
+        IMAGE_GC_RECLAIMED_BYTES.inc(report.reclaimed_bytes)
+        return report
+
+    def _load_protected(self):
+        db = SessionLocal()
+        try:
+            return self.protected_images(db)
+        finally:
+            db.close()
+
+    def _forget_cached(self, image_ids: list[str]):
+        # Build cache entries of deleted images would only cause failed retags
+        db = SessionLocal()
+        try:
+            for image_id in image_ids:
+                build_cache.invalidate(db, image_id)
+        finally:
+            db.close()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._collect_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _collect_periodically(self):
+        while True:
+            await asyncio.sleep(settings.IMAGE_GC_INTERVAL_SECONDS)
+            try:
+                report = await self.collect()
+                if report.deleted or report.failed:
+                    print(f"Image GC deleted {len(report.deleted)} images, reclaimed {report.reclaimed_bytes} bytes"
+                          + (f", {len(report.failed)} could not be deleted" if report.failed else ""))
+            except Exception as e:
+                print(f"Image GC failed: {e}")
+
+image_gc = ImageGarbageCollector()
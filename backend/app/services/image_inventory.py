@@ -0,0 +1,99 @@
+import asyncio
+import time
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.deployment import Deployment
+from app.services.docker import docker_service
+from app.services.process import run_command, CommandError
+from app.services.metrics import CACHE_LOOKUPS
+
+class ImageInventory:
+    """
+    In-memory view of our local Docker images, each annotated with the
+    deployments that reference it. Refreshed at most once per TTL, and
+    invalidated by our own builds/deletes and optionally by `docker events`.
+    """
+    def __init__(self, ttl: float | None = None, filter_name: str = "autodeployhub"):
+        self.ttl = settings.IMAGE_INVENTORY_TTL_SECONDS if ttl is None else ttl
+        self.filter_name = filter_name
+        self._images: list[dict] = []
+        self._expires_at = 0.0
+        self._generation = 0
+        self._refresh_lock: asyncio.Lock | None = None
+        self._watcher: asyncio.Task | None = None
+
+    async def list_images(self) -> list[dict]:
+        if time.monotonic() < self._expires_at:
+            CACHE_LOOKUPS.labels(cache="image_inventory", result="hit").inc()
+            return self._images
+        CACHE_LOOKUPS.labels(cache="image_inventory", result="miss").inc()
+
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        # Concurrent requests during a refresh wait for it instead of each shelling out
+        async with self._refresh_lock:
+            if time.monotonic() < self._expires_at:
+                return self._images
+            generation = self._generation
+            images = await docker_service.list_images_async(self.filter_name)
+            references = await run_in_threadpool(self._load_references, [image["id"] for image in images])
+            for image in images:
+                image["deployments"] = references.get(image["id"], [])
+            self._images = images
+            # An invalidation that raced with this refresh keeps the result stale
+            if generation == self._generation:
+                self._expires_at = time.monotonic() + self.ttl
+            return images
+
+    def invalidate(self):
+        """
+        Safe to call from any thread.
+        """
+        self._generation += 1
+        self._expires_at = 0.0
+
+    def _load_references(self, image_ids: list[str]) -> dict[str, list[dict]]:
+        if not image_ids:
+            return {}
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                Deployment.id, Deployment.project_id, Deployment.status, Deployment.image_id
+            ).filter(Deployment.image_id.in_(image_ids)).order_by(Deployment.id.desc()).all()
+        finally:
+            db.close()
+
+        references: dict[str, list[dict]] = {}
+        for row in rows:
+            references.setdefault(row.image_id, []).append(
+                {"id": row.id, "project_id": row.project_id, "status": row.status}
+            )
+        return references
+
+    def start_watcher(self):
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch_events())
+
+    async def stop_watcher(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    async def _watch_events(self):
+        # Picks up images built, pulled or removed outside of AutoDeployHub
+        while True:
+            try:
+                await run_command(
+                    ["docker", "events", "--filter", "type=image", "--format", "{{.Action}}"],
+                    on_output=lambda line: self.invalidate()
+                )
+            except (CommandError, OSError) as e:
+                print(f"Docker events watcher stopped: {e}")
+            await asyncio.sleep(5)
+
+image_inventory = ImageInventory()
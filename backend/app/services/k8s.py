@@ -1,8 +1,26 @@
-import os
-from jinja2 import Template
-from kubernetes import client, config, utils
+import json
+import threading
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, StrictUndefined
+from kubernetes import client, config
+from kubernetes.client.rest import ApiException
 from pathlib import Path
 import yaml
+from app.core.config import settings
+
+def _is_subset(desired, live) -> bool:
+    """
+    True if every field set in desired has the same value in live. Fields the
+    API server defaults (or other managers own) are ignored.
+    """
+    if isinstance(desired, dict):
+        return isinstance(live, dict) and all(
+            key in live and _is_subset(value, live[key]) for key, value in desired.items()
+        )
+    if isinstance(desired, list):
+        return isinstance(live, list) and len(desired) == len(live) and all(
+            _is_subset(d, l) for d, l in zip(desired, live)
+        )
+    return desired == live
 
 class K8sService:
     def __init__(self):
@@ -15,52 +33,118 @@ class K8sService:
             except config.ConfigException:
                 print("Warning: Could not load Kubernetes config. K8s operations will fail.")
 
+        # Templates are compiled once and recompiled only when the file changes on disk
+        self.templates = Environment(
+            loader=FileSystemLoader(str(Path(__file__).parent.parent / "templates")),
+            bytecode_cache=FileSystemBytecodeCache(),
+            auto_reload=True,
+            keep_trailing_newline=True,
+            undefined=StrictUndefined
+        )
+        self._api_client: client.ApiClient | None = None
+        self._apis: dict[type, object] = {}
+        self._api_lock = threading.Lock()
+
+    @property
+    def api_client(self) -> client.ApiClient:
+        """
+        One ApiClient for the whole process, so every deployment reuses the same
+        keep-alive connection pool instead of opening new TLS connections.
+        """
+        if self._api_client is None:
+            with self._api_lock:
+                if self._api_client is None:
+                    configuration = client.Configuration.get_default_copy()
+                    configuration.connection_pool_maxsize = settings.K8S_CONNECTION_POOL_SIZE
+                    self._api_client = client.ApiClient(configuration)
+        return self._api_client
+
+    def api(self, api_class):
+        """
+        Shared instance of a typed API (client.AppsV1Api, client.CoreV1Api, ...).
+        """
+        api = self._apis.get(api_class)
+        if api is None:
+            api = self._apis.setdefault(api_class, api_class(self.api_client))
+        return api
+
     def deploy_project(self, project_name: str, image_name: str, container_port: int = 8000):
-        # Load template
-        template_path = Path(__file__).parent.parent / "templates" / "k8s_deployment.yaml.j2"
-        with open(template_path) as f:
-            template = Template(f.read())
-        
+        """
+        Renders the manifests and server-side applies each resource that differs
+        from the live object. Unchanged resources are skipped, so a redeploy of
+        the same image sends nothing and a new image is a single PATCH.
+        """
         # Render manifest
-        manifest_yaml = template.render(
+        manifest_yaml = self.templates.get_template("k8s_deployment.yaml.j2").render(
             project_name=project_name,
             image_name=image_name,
             container_port=container_port
         )
-        
-        # Save to temp file to use with utils.create_from_yaml
-        temp_manifest = Path(f"/tmp/{project_name}-manifest.yaml")
-        temp_manifest.parent.mkdir(parents=True, exist_ok=True)
-        with open(temp_manifest, "w") as f:
-            f.write(manifest_yaml)
-            
+        manifests = [doc for doc in yaml.safe_load_all(manifest_yaml) if doc]
+
         try:
-            k8s_client = client.ApiClient()
-            utils.create_from_yaml(k8s_client, str(temp_manifest), verbose=True)
+            for manifest in manifests:
+                self.apply(manifest)
             return True
-        except utils.FailToCreateError as e:
-            # If it already exists, we might want to patch/replace (for MVP we'll just log)
-            print(f"Deployment already exists or failed to create: {e}")
-            # In a real app, you would handle 'Replace' logic here
+        except Exception as e:
+            print(f"K8s apply failed for {project_name}: {e}")
+            return False
+
+    def apply(self, manifest: dict, namespace: str | None = None) -> bool:
+        """
+        Server-side applies one resource unless the live object already matches it.
+        Returns True when a PATCH was sent.
+        """
+        namespace = namespace or manifest.get("metadata", {}).get("namespace") or settings.K8S_NAMESPACE
+        kind = manifest["kind"]
+        name = manifest["metadata"]["name"]
+        read, patch = self._resource_api(kind)
+
+        try:
+            response = read(name=name, namespace=namespace, _preload_content=False)
+            live = json.loads(response.data)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            live = None
+
+        if live is not None and _is_subset(manifest, live):
+            print(f"{kind} {namespace}/{name} unchanged, skipping apply")
             return False
-        finally:
-            if temp_manifest.exists():
-                os.remove(temp_manifest)
+
+        # JSON is valid YAML, so the manifest goes out as an apply patch as-is
+        patch(
+            name=name,
+            namespace=namespace,
+            body=json.dumps(manifest),
+            field_manager=settings.K8S_FIELD_MANAGER,
+            force=True,
+            _content_type="application/apply-patch+yaml"
+        )
+        print(f"{kind} {namespace}/{name} {'configured' if live is not None else 'created'}")
+        return True
+
+    def _resource_api(self, kind: str):
+        if kind == "Deployment":
+            api = self.api(client.AppsV1Api)
+            return api.read_namespaced_deployment, api.patch_namespaced_deployment
+        if kind == "Service":
+            api = self.api(client.CoreV1Api)
+            return api.read_namespaced_service, api.patch_namespaced_service
+        raise Exception(f"Unsupported manifest kind: {kind}")
 
     def update_image(self, project_name: str, image_name: str):
         """
-        Updates an existing deployment to use a new image.
+        Updates an existing deployment to use a new image, with one strategic
+        merge patch that only carries the container's image.
         """
         try:
-            api_instance = client.AppsV1Api()
-            # Read current deployment
-            deployment = api_instance.read_namespaced_deployment(name=project_name, namespace="default")
-            
-            # Update image
-            deployment.spec.template.spec.containers[0].image = image_name
-            
-            # Patch deployment
-            api_instance.patch_namespaced_deployment(name=project_name, namespace="default", body=deployment)
+            # The container is named after the deployment, see k8s_deployment.yaml.j2
+            patch = {"spec": {"template": {"spec": {"containers": [{"name": project_name, "image": image_name}]}}}}
+            self.api(client.AppsV1Api).patch_namespaced_deployment(
+                name=project_name, namespace=settings.K8S_NAMESPACE, body=patch,
+                _content_type="application/strategic-merge-patch+json"
+            )
             return True
         except Exception as e:
             print(f"K8s Patch failed: {str(e)}")
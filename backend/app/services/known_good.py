@@ -0,0 +1,158 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.deployment import Deployment
+from app.models.project import Project
+
+@dataclass(frozen=True)
+class Release:
+    deployment_id: int
+    commit_hash: str
+    # Kubernetes Deployment name -> exact image reference it ran (a digest once pushed)
+    images: dict
+
+def release_images(project: Project, deployment) -> dict[str, str]:
+    """
+    The images a finished deployment put on the cluster, per Kubernetes Deployment.
+    """
+    results = deployment.target_results or []
+    images = {}
+    for result in results:
+        image = result.get("image_ref") or result.get("image_name")
+        if not image:
+            continue
+        # Results from before k8s_name was recorded follow the naming of Orchestrator._build_targets
+        k8s_name = result.get("k8s_name") or (
+            project.name.lower() if len(results) == 1 else f"{project.name}-{result['name']}".lower()
+        )
+        images[k8s_name] = image
+    if not images and (deployment.image_digest or deployment.image_name):
+        images[project.name.lower()] = deployment.image_digest or deployment.image_name
+    return images
+
+# Enough to rebuild a release without loading logs
+_RELEASE_COLUMNS = (Deployment.id, Deployment.commit_hash, Deployment.target_results,
+                    Deployment.image_name, Deployment.image_digest)
+
+class KnownGoodImages:
+    """
+    The last ROLLBACK_KNOWN_GOOD successful releases of each project, kept in
+    memory so a rollback needs neither a tag lookup nor a scan of the history.
+    Deployments can finish in another process (DEPLOY_WORKER_MODE=process,
+    several API servers), so the memory is only a cache: sync() compares it
+    with the newest successful deployment in the database and reloads the
+    project when they differ.
+    """
+    def __init__(self, size: int | None = None):
+        self.size = settings.ROLLBACK_KNOWN_GOOD if size is None else size
+        self._releases: dict[int, OrderedDict[int, Release]] = {}
+        self._current: dict[int, int] = {}
+        # Newest successful deployment (rollbacks included) each project's cache reflects
+        self._latest: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, project_id: int, release: Release, current: bool = True):
+        with self._lock:
+            releases = self._releases.setdefault(project_id, OrderedDict())
+            releases[release.deployment_id] = release
+            # Deployment ids only grow, so the oldest is first
+            while len(releases) > max(1, self.size):
+                evicted, _ = releases.popitem(last=False)
+                if self._current.get(project_id) == evicted:
+                    del self._current[project_id]
+            if current:
+                self._current[project_id] = release.deployment_id
+                self._latest[project_id] = release.deployment_id
+
+    def set_current(self, project_id: int, deployment_id: int):
+        with self._lock:
+            self._current[project_id] = deployment_id
+
+    def get(self, project_id: int, deployment_id: int) -> Release | None:
+        with self._lock:
+            return self._releases.get(project_id, {}).get(deployment_id)
+
+    def current(self, project_id: int) -> Release | None:
+        with self._lock:
+            deployment_id = self._current.get(project_id)
+            return self._releases.get(project_id, {}).get(deployment_id)
+
+    def previous(self, project_id: int) -> Release | None:
+        """
+        The newest known-good release older than the one running now. Repeated
+        rollbacks walk further back instead of flipping between two releases.
+        """
+        with self._lock:
+            releases = self._releases.get(project_id)
+            if not releases:
+                return None
+            current = self._current.get(project_id)
+            for deployment_id in reversed(releases):
+                if current is None or deployment_id < current:
+                    return releases[deployment_id]
+            return None
+
+    def releases(self, project_id: int) -> list[Release]:
+        with self._lock:
+            return list(reversed(self._releases.get(project_id, {}).values()))
+
+    def sync(self, db: Session, project: Project):
+        """
+        Reloads the project from the database if a deployment or rollback
+        succeeded that this process didn't record itself. One indexed query
+        when nothing changed.
+        """
+        latest = db.query(Deployment.id).filter(
+            Deployment.project_id == project.id,
+            Deployment.status == "success"
+        ).order_by(Deployment.id.desc()).first()
+        with self._lock:
+            seen = self._latest.get(project.id)
+        if (latest.id if latest is not None else None) != seen:
+            self._load(db, project)
+
+    def warm(self, db: Session):
+        for project in db.query(Project).all():
+            self._load(db, project)
+
+    def _load(self, db: Session, project: Project):
+        """
+        Replaces the project's releases with its recent successful deployments;
+        the newest successful deployment (possibly a rollback) decides which of
+        them is running.
+        """
+        builds = db.query(*_RELEASE_COLUMNS).filter(
+            Deployment.project_id == project.id,
+            Deployment.status == "success",
+            ~Deployment.commit_hash.like("ROLLBACK-%")
+        ).order_by(Deployment.id.desc()).limit(max(1, self.size)).all()
+        releases = OrderedDict()
+        for deployment in reversed(builds):
+            images = release_images(project, deployment)
+            if images:
+                releases[deployment.id] = Release(deployment.id, deployment.commit_hash, images)
+
+        latest = db.query(*_RELEASE_COLUMNS).filter(
+            Deployment.project_id == project.id,
+            Deployment.status == "success"
+        ).order_by(Deployment.id.desc()).first()
+        current = next(reversed(releases), None)
+        if latest is not None and latest.commit_hash.startswith("ROLLBACK-"):
+            running = release_images(project, latest)
+            current = next((release.deployment_id for release in reversed(releases.values())
+                            if release.images == running), current)
+
+        with self._lock:
+            self._releases[project.id] = releases
+            if current is None:
+                self._current.pop(project.id, None)
+            else:
+                self._current[project.id] = current
+            if latest is None:
+                self._latest.pop(project.id, None)
+            else:
+                self._latest[project.id] = latest.id
+
+known_good = KnownGoodImages()
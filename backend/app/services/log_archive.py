@@ -0,0 +1,202 @@
+import asyncio
+import gzip
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.deployment import Deployment
+from app.models.project import Project
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is used instead
+    zstandard = None
+
+EXPIRED = "expired"
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    raise Exception(f"Unknown log codec: {codec}")
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise Exception("Log is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    raise Exception(f"Unknown log codec: {codec}")
+
+class LogArchive:
+    """
+    Storage for the logs of finished deployments. Logs are compressed into
+    Deployment.logs_archive, or with storage "file" written under storage_dir
+    and referenced by Deployment.logs_location. Rows whose logs_codec is unset
+    still keep their log as plain text in Deployment.logs.
+    """
+    def __init__(self, codec: str | None = None, storage: str | None = None, storage_dir: str | None = None):
+        self.requested_codec = codec or settings.LOG_COMPRESSION
+        self.storage = storage or settings.LOG_STORAGE
+        self.storage_dir = Path(storage_dir or settings.LOG_STORAGE_DIR)
+        self._retention_task: asyncio.Task | None = None
+
+    @property
+    def codec(self) -> str | None:
+        if self.requested_codec == "none":
+            return None
+        if self.requested_codec == "zstd" and zstandard is None:
+            return "gzip"
+        return self.requested_codec
+
+    def store(self, deployment: Deployment, text: str):
+        """
+        Sets the deployment's final log. The caller commits.
+        """
+        codec = self.codec
+        if codec is None:
+            deployment.logs = text
+            return
+
+        data = text.encode()
+        blob = compress(data, codec)
+        if self.storage == "file":
+            deployment.logs_location = self._write_file(deployment, blob, codec)
+            deployment.logs_archive = None
+        else:
+            deployment.logs_archive = blob
+            deployment.logs_location = None
+        deployment.logs_codec = codec
+        deployment.logs_size = len(data)
+        deployment.logs = None
+
+    def load(self, deployment: Deployment) -> str:
+        """
+        The deployment's full log, decompressed only now that it is being viewed.
+        """
+        codec = deployment.logs_codec
+        if codec is None:
+            return deployment.logs or ""
+        if codec == EXPIRED:
+            return ""
+        if deployment.logs_location:
+            blob = Path(deployment.logs_location).read_bytes()
+        else:
+            blob = deployment.logs_archive or b""
+        return decompress(blob, codec).decode(errors="replace") if blob else ""
+
+    def expire(self, deployment: Deployment):
+        if deployment.logs_location:
+            try:
+                os.remove(deployment.logs_location)
+            except FileNotFoundError:
+                pass
+        deployment.logs = None
+        deployment.logs_archive = None
+        deployment.logs_location = None
+        deployment.logs_codec = EXPIRED
+
+    def backfill(self, db: Session, batch_size: int = 500, on_batch=None) -> int:
+        """
+        Archives plain-text logs of finished deployments, committing once per batch.
+        """
+        if self.codec is None:
+            return 0
+        total = 0
+        last_id = 0
+        while True:
+            batch = db.query(Deployment).filter(
+                Deployment.id > last_id,
+                Deployment.finished_at.isnot(None),
+                Deployment.logs_codec.is_(None),
+                Deployment.logs.isnot(None)
+            ).order_by(Deployment.id).limit(batch_size).all()
+            if not batch:
+                return total
+            for deployment in batch:
+                self.store(deployment, deployment.logs)
+            db.commit()
+            last_id = batch[-1].id
+            total += len(batch)
+            # Don't keep every processed row (and its log) in the session
+            for deployment in batch:
+                db.expunge(deployment)
+            if on_batch is not None:
+                on_batch(total, last_id)
+
+    def apply_retention(self, db: Session, now: datetime | None = None, batch_size: int = 500) -> int:
+        """
+        Drops the logs of deployments that finished longer ago than their
+        project's log_retention_days (or LOG_RETENTION_DAYS). Returns how many.
+        """
+        now = now or datetime.now(timezone.utc)
+        total = 0
+        for project_id, days in db.query(Project.id, Project.log_retention_days).all():
+            days = days if days is not None else settings.LOG_RETENTION_DAYS
+            if not days:
+                continue
+            cutoff = now - timedelta(days=days)
+            while True:
+                batch = db.query(Deployment).filter(
+                    Deployment.project_id == project_id,
+                    Deployment.finished_at < cutoff,
+                    or_(Deployment.logs_codec.is_(None), Deployment.logs_codec != EXPIRED)
+                ).limit(batch_size).all()
+                if not batch:
+                    break
+                for deployment in batch:
+                    self.expire(deployment)
+                db.commit()
+                for deployment in batch:
+                    db.expunge(deployment)
+                total += len(batch)
+        return total
+
+    def start_retention(self):
+        if self._retention_task is None:
+            self._retention_task = asyncio.create_task(self._retain_periodically())
+
+    async def stop_retention(self):
+        if self._retention_task is not None:
+            self._retention_task.cancel()
+            try:
+                await self._retention_task
+            except asyncio.CancelledError:
+                pass
+            self._retention_task = None
+
+    async def _retain_periodically(self):
+        while True:
+            await asyncio.sleep(settings.LOG_RETENTION_INTERVAL_SECONDS)
+            try:
+                expired = await run_in_threadpool(self._apply_retention_once)
+                if expired:
+                    print(f"Log retention removed the logs of {expired} deployments")
+            except Exception as e:
+                print(f"Log retention failed: {e}")
+
+    def _apply_retention_once(self) -> int:
+        db = SessionLocal()
+        try:
+            return self.apply_retention(db)
+        finally:
+            db.close()
+
+    def _write_file(self, deployment: Deployment, blob: bytes, codec: str) -> str:
+        directory = self.storage_dir / str(deployment.project_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{deployment.id}.log.{'zst' if codec == 'zstd' else 'gz'}"
+        # Write then rename, so a crash never leaves a truncated log behind
+        temp_path = directory / f".{path.name}.{uuid.uuid4().hex[:8]}"
+        temp_path.write_bytes(blob)
+        os.replace(temp_path, path)
+        return str(path)
+
+log_archive = LogArchive()
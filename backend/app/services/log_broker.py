@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+class LogSubscription:
+    def __init__(self, deployment_id: int, maxsize: int = 1000):
+        self.deployment_id = deployment_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        # Set when the queue overflowed; the reader must catch up from the LogStore
+        self.lagged = False
+
+class LogBroker:
+    """
+    In-process pub/sub for live deployment logs. Writers publish from worker
+    threads; events are fanned out on the event loop to every subscribed viewer,
+    so N viewers of one deployment cost one publish, not N database polls.
+    Events are (start_offset, end_offset, text) or None when the log is complete.
+    """
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._subscribers: dict[int, set[LogSubscription]] = {}
+        self._lock = threading.Lock()
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop | None):
+        self._loop = loop
+
+    def has_subscribers(self, deployment_id: int) -> bool:
+        with self._lock:
+            return bool(self._subscribers.get(deployment_id))
+
+    def subscribe(self, deployment_id: int) -> LogSubscription:
+        subscription = LogSubscription(deployment_id)
+        with self._lock:
+            self._subscribers.setdefault(deployment_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LogSubscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.deployment_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.deployment_id]
+
+    def publish(self, deployment_id: int, start_offset: int, end_offset: int, text: str):
+        self._publish(deployment_id, (start_offset, end_offset, text))
+
+    def finish(self, deployment_id: int):
+        self._publish(deployment_id, None)
+
+    def _publish(self, deployment_id: int, event):
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self.has_subscribers(deployment_id):
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, deployment_id, event)
+        except RuntimeError:
+            # Loop shut down between the check and the call
+            pass
+
+    def _dispatch(self, deployment_id: int, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(deployment_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.lagged = True
+
+log_broker = LogBroker()
@@ -0,0 +1,168 @@
+import threading
+import time
+from datetime import datetime
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.deployment import Deployment, DeploymentLogChunk
+from app.services.log_broker import log_broker
+from app.services.log_archive import log_archive
+
+class LogStore:
+    """
+    Persists and reads deployment logs. While a deployment runs its log lives in
+    append-only DeploymentLogChunk rows; once it finishes the chunks are folded
+    into one log handed to the LogArchive. Both forms are addressed by the same
+    byte offsets.
+    """
+    def __init__(self, session_factory=SessionLocal, archive=None):
+        self.session_factory = session_factory
+        self.archive = archive or log_archive
+
+    def append(self, deployment_id: int, seq: int, start_offset: int, content: str):
+        db = self.session_factory()
+        try:
+            db.add(DeploymentLogChunk(
+                deployment_id=deployment_id,
+                seq=seq,
+                start_offset=start_offset,
+                end_offset=start_offset + len(content.encode()),
+                content=content
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def read(self, db: Session, deployment_id: int, offset: int = 0):
+        """
+        Returns (text, next_offset, complete) for everything logged after offset.
+        """
+        chunks = db.query(DeploymentLogChunk).filter(
+            DeploymentLogChunk.deployment_id == deployment_id,
+            DeploymentLogChunk.end_offset > offset
+        ).order_by(DeploymentLogChunk.seq).all()
+
+        if chunks:
+            data = b"".join(
+                chunk.content.encode()[max(0, offset - chunk.start_offset):] for chunk in chunks
+            )
+            return data.decode(errors="ignore"), chunks[-1].end_offset, False
+
+        deployment = db.query(Deployment).filter(Deployment.id == deployment_id).first()
+        if deployment is None or deployment.finished_at is None:
+            return "", offset, False
+
+        data = self.archive.load(deployment).encode()
+        return data[offset:].decode(errors="ignore"), max(offset, len(data)), True
+
+    def text(self, db: Session, deployment: Deployment) -> str:
+        """
+        The full log so far, whichever form it is stored in.
+        """
+        chunks = db.query(DeploymentLogChunk).filter(
+            DeploymentLogChunk.deployment_id == deployment.id
+        ).order_by(DeploymentLogChunk.seq).all()
+        return self.archive.load(deployment) + "".join(chunk.content for chunk in chunks)
+
+    def consolidate(self, db: Session, deployment: Deployment, text: str | None = None):
+        """
+        Archives the full log of a finished deployment and drops its chunks.
+        When text is not given it is rebuilt from the chunks.
+        """
+        if text is None:
+            text = self.text(db, deployment)
+        self.archive.store(deployment, text)
+        db.commit()
+        db.query(DeploymentLogChunk).filter(DeploymentLogChunk.deployment_id == deployment.id).delete()
+        db.commit()
+
+    def finish(self, db: Session, deployment: Deployment, message: str):
+        """
+        Ends the log of a deployment finished without a DeploymentLogWriter
+        (never started, or interrupted) with message, archives it and wakes
+        live viewers. The caller sets status and finished_at.
+        """
+        self.consolidate(db, deployment, self.text(db, deployment) + message)
+        log_broker.finish(deployment.id)
+
+class DeploymentLogWriter:
+    """
+    Buffers log output of one deployment and appends it to the LogStore in
+    batches, either once flush_bytes accumulate or every flush_interval seconds.
+    Every write is also published to the LogBroker for live viewers.
+    Safe to share between the threads of a single deployment.
+    """
+    def __init__(self, deployment_id: int, store: LogStore | None = None,
+                 flush_bytes: int | None = None, flush_interval: float | None = None):
+        self.deployment_id = deployment_id
+        self.store = store or log_store
+        self.flush_bytes = flush_bytes or settings.LOG_FLUSH_BYTES
+        self.flush_interval = flush_interval or settings.LOG_FLUSH_INTERVAL_SECONDS
+
+        self._lock = threading.Lock()
+        self._parts: list[str] = []
+        self._buffer: list[str] = []
+        self._buffered_bytes = 0
+        self._offset = 0
+        self._written = 0
+        self._seq = 0
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def write(self, text: str):
+        if not text:
+            return
+        size = len(text.encode())
+        with self._lock:
+            self._parts.append(text)
+            self._buffer.append(text)
+            self._buffered_bytes += size
+            start = self._written
+            self._written += size
+            log_broker.publish(self.deployment_id, start, self._written, text)
+            if self._buffered_bytes >= self.flush_bytes:
+                self._flush_locked()
+
+    def log(self, message: str):
+        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        self.write(f"[{timestamp}] {message}\n")
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> str:
+        """
+        Flushes what is left, stops the background flusher and returns the full log.
+        """
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        log_broker.finish(self.deployment_id)
+        return self.text()
+
+    def text(self) -> str:
+        with self._lock:
+            return "".join(self._parts)
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        content = "".join(self._buffer)
+        try:
+            self.store.append(self.deployment_id, self._seq, self._offset, content)
+        except Exception as e:
+            # Keep buffering; live readers lag but the final log is still complete
+            print(f"Failed to persist log chunk for deployment {self.deployment_id}: {e}")
+            return
+        self._seq += 1
+        self._offset += self._buffered_bytes
+        self._buffer = []
+        self._buffered_bytes = 0
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+log_store = LogStore()
@@ -0,0 +1,80 @@
+import time
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from app.db.session import engine, async_engine
+
+# Builds and rollouts take minutes; HTTP requests milliseconds
+STAGE_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+DEPLOY_STAGE_SECONDS = Histogram(
+    "autodeployhub_deploy_stage_seconds", "Duration of deployment pipeline stages",
+    ["stage"], buckets=STAGE_BUCKETS
+)
+DEPLOYMENTS_TOTAL = Counter(
+    "autodeployhub_deployments_total", "Finished deployments by final status", ["status"]
+)
+DEPLOY_QUEUE_DEPTH = Gauge(
+    "autodeployhub_deploy_queue_depth", "Deployments waiting for a worker"
+)
+CACHE_LOOKUPS = Counter(
+    "autodeployhub_cache_lookups_total", "Cache lookups by cache and result (hit or miss)", ["cache", "result"]
+)
+IMAGE_GC_DELETED = Counter(
+    "autodeployhub_image_gc_deleted_images_total", "Images deleted by the image garbage collector"
+)
+IMAGE_GC_RECLAIMED_BYTES = Counter(
+    "autodeployhub_image_gc_reclaimed_bytes_total", "Disk space reclaimed by the image garbage collector"
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "autodeployhub_http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"]
+)
+
+class StageTimer:
+    """
+    Times consecutive pipeline stages. start() ends the running stage; every
+    finished stage goes into timings (seconds) and the stage histogram.
+    """
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+        self._current: tuple[str, float] | None = None
+
+    def start(self, stage: str):
+        self.stop()
+        self._current = (stage, time.monotonic())
+
+    def stop(self):
+        if self._current is None:
+            return
+        stage, started = self._current
+        self._current = None
+        self.record(stage, time.monotonic() - started)
+
+    def record(self, stage: str, seconds: float):
+        self.timings[stage] = round(self.timings.get(stage, 0.0) + seconds, 3)
+        DEPLOY_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+class PoolCollector:
+    """
+    Reports SQLAlchemy connection pool usage at scrape time.
+    """
+    def __init__(self, engines: dict):
+        self.engines = engines
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "autodeployhub_db_pool_connections", "Database pool connections by state", labels=["engine", "state"]
+        )
+        for name, db_engine in self.engines.items():
+            pool = db_engine.pool
+            # SQLite's pools don't track these
+            for state, method in (("size", "size"), ("checked_out", "checkedout"),
+                                  ("idle", "checkedin"), ("overflow", "overflow")):
+                if hasattr(pool, method):
+                    family.add_metric([name, state], getattr(pool, method)())
+        yield family
+
+    def describe(self):
+        return []
+
+REGISTRY.register(PoolCollector({"sync": engine, "async": async_engine.sync_engine}))
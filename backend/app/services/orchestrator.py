@@ -1,113 +1,633 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import SessionLocal
 from app.models.project import Project
 from app.models.deployment import Deployment
-from app.services.git import git_service
-from app.services.docker import docker_service
+from app.services.git import git_service, context_path
+from app.services.docker import docker_service, count_build_steps
 from app.services.k8s import k8s_service
+from app.services.build_cache import build_cache
+from app.services.logs import log_store, DeploymentLogWriter
+from app.services.image_inventory import image_inventory
+from app.services.rollout import rollout_tracker
+from app.services.registry import registry_service
+from app.services.build_farm import build_farm
+from app.services.commit_status import commit_status
+from app.models.build_worker import BuildWorker
+from app.services.known_good import known_good, Release, release_images
+from app.services.metrics import StageTimer, DEPLOYMENTS_TOTAL, CACHE_LOOKUPS
+from app.core.config import settings
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime, timezone
+import threading
+import time
+
+class DeploymentCancelled(Exception):
+    pass
 
 class Orchestrator:
-    def trigger_deployment(self, db: Session, project: Project, commit_hash: str):
-        # 1. Create Deployment record
+    def create_deployment(self, db: Session, project: Project, commit_hash: str):
+        """
+        Records a pending deployment. The pipeline itself runs later in run_deployment.
+        """
+        deployment = self._new_deployment(db, project, commit_hash)
+        db.commit()
+        db.refresh(deployment)
+        return deployment
+
+    async def create_deployment_async(self, db: AsyncSession, project: Project, commit_hash: str):
+        """
+        create_deployment for async routes.
+        """
+        deployment = self._new_deployment(db, project, commit_hash)
+        await db.commit()
+        await db.refresh(deployment)
+        return deployment
+
+    def _new_deployment(self, db: Session | AsyncSession, project: Project, commit_hash: str) -> Deployment:
         deployment = Deployment(
             project_id=project.id,
             commit_hash=commit_hash,
-            status="building",
+            status="pending",
             logs=""
         )
         db.add(deployment)
+        return deployment
+
+    def trigger_deployment(self, db: Session, project: Project, commit_hash: str):
+        # 1. Create Deployment record
+        deployment = self.create_deployment(db, project, commit_hash)
+        return self.run_deployment(db, project, deployment)
+
+    def run_deployment(self, db: Session, project: Project, deployment: Deployment,
+                       cancel_event: threading.Event | None = None):
+        commit_hash = deployment.commit_hash
+        deployment.status = "building"
         db.commit()
-        db.refresh(deployment)
-        
-        def add_log(message: str):
-            timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-            deployment.logs += f"[{timestamp}] {message}\n"
-            db.commit()
+        commit_status.report(project, deployment)
+
+        # Per-stage durations, stored on the deployment and exported to /metrics
+        stages = StageTimer()
+        run_started = time.monotonic()
+        if deployment.created_at is not None:
+            created_at = deployment.created_at
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            stages.record("queue", max(0.0, (datetime.now(timezone.utc) - created_at).total_seconds()))
+
+        # Log lines are appended to chunk rows in batches instead of rewriting deployment.logs
+        log_writer = DeploymentLogWriter(deployment.id, store=log_store)
+        add_log = log_writer.log
+
+        def check_cancelled():
+            # Checked between stages (and per build output line) so a superseded build stops early
+            if cancel_event is not None and cancel_event.is_set():
+                raise DeploymentCancelled("Deployment cancelled: superseded by a newer push.")
 
+        def on_build_output(line: str):
+            log_writer.write(line)
+            check_cancelled()
+
+        project_path = None
         try:
             add_log(f"Starting deployment for {project.name}...")
             
-            # 2. Clone Repo
-            add_log(f"Cloning repository: {project.github_url} (branch: {project.branch})")
-            project_path = git_service.clone_repo(project.github_url, project.name, project.branch)
-            add_log("Clone successful.")
-            
-            # 3. Build Image
-            image_name = f"autodeployhub/{project.name}"
-            tag = commit_hash[:7] if commit_hash and commit_hash != "manual" else "latest"
-            add_log(f"Building Docker image: {image_name}:{tag}")
+            # 2. Clone Repo (build farm workers check out their own copy)
+            targets = self._build_targets(project)
+            if not build_farm.enabled:
+                add_log(f"Checking out repository: {project.github_url} (branch: {project.branch}, commit: {commit_hash})")
+                stages.start("clone")
+                project_path = git_service.clone_repo(project.github_url, project.name, project.branch,
+                                                      commit_hash=commit_hash, sparse_paths=self._sparse_paths(targets))
+                add_log("Checkout successful.")
+                check_cancelled()
             
+            # 3. Build Images
+            # Manual deploys get their own tag, a shared "latest" would be overwritten by the next one
+            tag = commit_hash[:7] if commit_hash and commit_hash != "manual" else f"manual-{deployment.id}"
+            for target in targets:
+                target["full_image_name"] = f"{target['image_name']}:{tag}"
+                if project_path is not None:
+                    target["context_path"] = context_path(project_path, target["context"])
+                # What Kubernetes runs: the local name, or the registry digest once pushed
+                target["deploy_image"] = target["full_image_name"]
+                add_log(f"{target['prefix']}Building Docker image: {target['full_image_name']}")
+
+            results = {target["name"]: {"name": target["name"], "k8s_name": target["k8s_name"],
+                                        "image_name": target["full_image_name"],
+                                        "image_id": None, "status": "pending", "cache": None,
+                                        "build_seconds": None} for target in targets}
+            deployment.target_results = list(results.values())
             deployment.status = "building"
             db.commit()
-            
-            full_image_name, build_logs = docker_service.build_image(project_path, image_name, tag)
-            deployment.logs += "\n--- DOCKER BUILD LOGS ---\n"
-            deployment.logs += build_logs
-            deployment.logs += "\n-------------------------\n"
-            add_log(f"Image built successfully: {full_image_name}")
+
+            stages.start("build")
+            try:
+                if build_farm.enabled:
+                    self._build_remote(db, project, deployment, targets, results, log_writer, check_cancelled)
+                else:
+                    self._build_all(db, project, targets, results, log_writer, check_cancelled)
+            finally:
+                # Reassign so the JSON column is flagged as changed
+                deployment.target_results = [dict(result) for result in results.values()]
+                db.commit()
+
+            primary = results[targets[0]["name"]]
+            deployment.image_name = primary["image_name"]
+            deployment.image_id = primary["image_id"]
+            image_inventory.invalidate()
+            check_cancelled()
+
+            if build_farm.enabled:
+                # Workers push themselves when they have a registry
+                if "@" in (primary.get("image_ref") or ""):
+                    deployment.image_digest = primary["image_ref"]
+                    db.commit()
+            elif registry_service.enabled:
+                add_log(f"Pushing images to {registry_service.url}...")
+                stages.start("push")
+                self._push_all(targets, results, log_writer, check_cancelled)
+                deployment.image_digest = primary["image_ref"]
+                db.commit()
+                check_cancelled()
             
             deployment.status = "deploying"
             db.commit()
+            commit_status.report(project, deployment)
             
-            # 4. Deploy to K8s
+            # 4. Deploy to K8s, only once every image is built
             add_log(f"Deploying to Kubernetes cluster...")
-            success = k8s_service.deploy_project(project.name.lower(), full_image_name)
+            stages.start("apply")
+            success = True
+            for target in targets:
+                result = results[target["name"]]
+                started = time.monotonic()
+                applied = k8s_service.deploy_project(target["k8s_name"], target["deploy_image"],
+                                                     container_port=target["port"])
+                result["deploy_seconds"] = round(time.monotonic() - started, 3)
+                result["status"] = "deployed" if applied else "deploy_failed"
+                if not applied:
+                    add_log(f"{target['prefix']}ERROR: Kubernetes apply failed for {target['k8s_name']}.")
+                success = success and applied
             
             if success:
                 add_log("Kubernetes deployment/update applied successfully.")
-                deployment.status = "success"
+                stages.start("ready")
+                success = self._wait_for_rollout(db, project, deployment, targets, results, add_log)
+                deployment.status = "success" if success else "failed"
+                if success:
+                    known_good.record(project.id, Release(
+                        deployment.id, commit_hash, {target["k8s_name"]: target["deploy_image"] for target in targets}
+                    ))
             else:
                 add_log("ERROR: Kubernetes deployment failed.")
                 deployment.status = "failed"
+            deployment.target_results = [dict(result) for result in results.values()]
             
+        except DeploymentCancelled as e:
+            add_log(str(e))
+            deployment.status = "cancelled"
         except Exception as e:
             add_log(f"FATAL ERROR: {str(e)}")
             deployment.status = "failed"
+        finally:
+            stages.stop()
+            if project_path is not None:
+                git_service.release(project_path)
         
-        deployment.finished_at = datetime.now(timezone.utc)
+        stages.record("total", time.monotonic() - run_started)
+        deployment.stage_timings = stages.timings
+        DEPLOYMENTS_TOTAL.labels(status=deployment.status).inc()
         add_log(f"Deployment process finished with status: {deployment.status}")
-        db.commit()
+        add_log("Stage timings: " + ", ".join(f"{stage} {seconds}s" for stage, seconds in stages.timings.items()))
+        deployment.finished_at = datetime.now(timezone.utc)
+        log_store.consolidate(db, deployment, log_writer.close())
+        commit_status.report(project, deployment)
         return deployment
 
+    def _build_targets(self, project: Project) -> list[dict]:
+        """
+        The project's build targets with defaults filled in. Without any configured
+        targets the repo root is built as a single image, as before.
+        """
+        configured = project.build_targets or []
+        if not configured:
+            return [{
+                "name": project.name, "context": ".", "dockerfile": "Dockerfile", "port": 8000,
+                "target": None, "build_args": {}, "prefix": "",
+                "image_name": f"autodeployhub/{project.name}", "k8s_name": project.name.lower()
+            }]
+
+        targets = []
+        for item in configured:
+            name = item["name"]
+            # A single configured target keeps the project's image and k8s names
+            suffix = f"-{name}" if len(configured) > 1 else ""
+            context = item.get("context") or "."
+            context = context.strip("/") or "."
+            targets.append({
+                "name": name,
+                "context": context,
+                "dockerfile": item.get("dockerfile") or "Dockerfile",
+                "port": item.get("port") or 8000,
+                "target": item.get("target"),
+                "build_args": item.get("build_args") or {},
+                "prefix": f"[{name}] " if len(configured) > 1 else "",
+                "image_name": f"autodeployhub/{project.name}{suffix}",
+                "k8s_name": f"{project.name}{suffix}".lower()
+            })
+        return targets
+
+    def _sparse_paths(self, targets: list[dict]) -> list[str] | None:
+        # Targets that all live in subdirectories only need those paths checked out
+        if all(target["context"] != "." for target in targets):
+            return [target["context"] for target in targets]
+        return None
+
+    def _build_all(self, db: Session, project: Project, targets: list[dict], results: dict,
+                   log_writer: DeploymentLogWriter, check_cancelled):
+        """
+        Builds every target, running docker builds for cache misses concurrently
+        (up to BUILD_MAX_PARALLEL). If any build fails the others are stopped and
+        the error is raised: a deployment ships all of its images or none.
+        """
+        add_log = log_writer.log
+        workers = max(1, min(settings.BUILD_MAX_PARALLEL, len(targets)))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hashes = {}
+            if settings.BUILD_CACHE_ENABLED:
+                futures = {
+                    target["name"]: pool.submit(build_cache.hash_context, target["context_path"], target["dockerfile"],
+                                                target["build_args"], target["target"])
+                    for target in targets
+                }
+                hashes = {name: future.result() for name, future in futures.items()}
+
+            # Cache lookups stay on this thread; the session isn't shared with the pool
+            misses = []
+            for target in targets:
+                result = results[target["name"]]
+                context_hash = hashes.get(target["name"])
+                cached = build_cache.lookup(db, context_hash) if context_hash else None
+                if cached and docker_service.tag_image(cached.image_id, target["full_image_name"]):
+                    CACHE_LOOKUPS.labels(cache="build", result="hit").inc()
+                    build_cache.record_hit(db, cached)
+                    result.update(status="built", cache="hit", image_id=cached.image_id, build_seconds=0.0)
+                    add_log(f"{target['prefix']}Build cache HIT: context {context_hash[:12]} matches image {cached.image_id[:19]}, retagged without running docker build.")
+                else:
+                    if context_hash:
+                        CACHE_LOOKUPS.labels(cache="build", result="miss").inc()
+                        result["cache"] = "miss"
+                        add_log(f"{target['prefix']}Build cache MISS: context {context_hash[:12]}.")
+                    misses.append(target)
+            check_cancelled()
+            if not misses:
+                return
+
+            failed = threading.Event()
+
+            def build(target):
+                prefix = target["prefix"]
+
+                def on_output(line: str):
+                    log_writer.write(prefix + line if prefix and line.strip() else line)
+                    if failed.is_set():
+                        raise DeploymentCancelled("Stopped: another build target failed.")
+                    check_cancelled()
+
+                result = results[target["name"]]
+                result["status"] = "building"
+                started = time.monotonic()
+                try:
+                    full_image_name, output = docker_service.build_image(
+                        target["context_path"], target["image_name"], target["full_image_name"].rsplit(":", 1)[1],
+                        on_output=on_output, dockerfile=target["dockerfile"],
+                        build_args=target["build_args"], target=target["target"]
+                    )
+                    result["image_id"] = docker_service.get_image_id(full_image_name)
+                except BaseException as e:
+                    if failed.is_set():
+                        result["status"] = "aborted"
+                    else:
+                        result["status"] = "cancelled" if isinstance(e, DeploymentCancelled) else "failed"
+                    failed.set()
+                    raise
+                finally:
+                    result["build_seconds"] = round(time.monotonic() - started, 3)
+                result["status"] = "built"
+                add_log(f"{prefix}Image built successfully in {result['build_seconds']}s: {full_image_name}")
+                steps = count_build_steps(output)
+                if steps["cached"] or steps["rebuilt"]:
+                    result["steps_cached"] = steps["cached"]
+                    result["steps_rebuilt"] = steps["rebuilt"]
+                    add_log(f"{prefix}Build steps: {steps['cached']} cached, {steps['rebuilt']} rebuilt.")
+                    for step in steps["rebuilt_steps"]:
+                        add_log(f"{prefix}  rebuilt: {step[:120]}")
+                return full_image_name
+
+            log_writer.write("\n--- DOCKER BUILD LOGS ---\n")
+            futures = [(target, pool.submit(build, target)) for target in misses]
+            errors = []
+            for target, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append((target, e))
+            log_writer.write("\n-------------------------\n")
+
+        # Surface the build that actually broke rather than one stopped because of it
+        for target, error in errors:
+            if results[target["name"]]["status"] == "failed":
+                raise error
+        if errors:
+            raise errors[0][1]
+
+        for target in misses:
+            result = results[target["name"]]
+            context_hash = hashes.get(target["name"])
+            if context_hash and result["image_id"]:
+                build_cache.record(db, context_hash, project.id, result["image_id"], target["full_image_name"])
+
+    def _build_remote(self, db: Session, project: Project, deployment: Deployment, targets: list[dict],
+                      results: dict, log_writer: DeploymentLogWriter, check_cancelled):
+        """
+        Build-farm counterpart of _build_all: queues a job per target for the
+        worker agents and follows them, forwarding their output to the
+        deployment log. Raises if any target failed to build.
+        """
+        add_log = log_writer.log
+        sparse_paths = self._sparse_paths(targets)
+        specs = {target["name"]: {
+            "repo_url": project.github_url, "branch": project.branch, "commit_hash": deployment.commit_hash,
+            "project_name": project.name, "sparse_paths": sparse_paths, "context": target["context"],
+            "dockerfile": target["dockerfile"], "build_args": target["build_args"], "target": target["target"],
+            "image_name": target["image_name"], "tag": target["full_image_name"].rsplit(":", 1)[1]
+        } for target in targets}
+        jobs = build_farm.submit(db, project.id, deployment.id, specs)
+        preferred = db.get(BuildWorker, jobs[0].preferred_worker_id) if jobs[0].preferred_worker_id else None
+        add_log(f"Queued {len(jobs)} build job(s) on the build farm"
+                + (f", preferring worker {preferred.name} (built this project last)." if preferred else "."))
+        if not any(worker["alive"] for worker in build_farm.list_workers(db)):
+            add_log("WARNING: No build workers are online; the build waits for one to register.")
+        by_name = {target["name"]: target for target in targets}
+        for result in results.values():
+            result["status"] = "queued"
+
+        def on_log(job, text: str):
+            prefix = by_name[job.target]["prefix"]
+            if prefix:
+                text = "".join(prefix + line if line.strip() else line for line in text.splitlines(keepends=True))
+            log_writer.write(text)
+
+        log_writer.write("\n--- DOCKER BUILD LOGS ---\n")
+        try:
+            build_farm.wait(db, jobs, on_log, check_cancelled, settings.DOCKER_BUILD_TIMEOUT_SECONDS)
+        finally:
+            log_writer.write("\n-------------------------\n")
+            for job in jobs:
+                db.refresh(job)
+                result = results[job.target]
+                outcome = job.result or {}
+                for key in ("image_id", "image_ref", "build_seconds", "steps_cached", "steps_rebuilt"):
+                    if outcome.get(key) is not None:
+                        result[key] = outcome[key]
+                worker = db.get(BuildWorker, job.worker_id) if job.worker_id else None
+                result["worker"] = worker.name if worker else None
+                result["status"] = {"succeeded": "built", "failed": "failed", "cancelled": "cancelled"}.get(job.status, "aborted")
+
+        for job in jobs:
+            if job.status == "failed":
+                target = by_name[job.target]
+                raise Exception(f"{target['prefix']}Build failed on worker {results[job.target]['worker']}: "
+                                f"{(job.result or {}).get('error', 'unknown error')}")
+
+        for target in targets:
+            result = results[target["name"]]
+            prefix = target["prefix"]
+            target["deploy_image"] = result.get("image_ref") or target["full_image_name"]
+            add_log(f"{prefix}Image built in {result.get('build_seconds')}s on worker {result['worker']}: {target['deploy_image']}")
+            if result.get("steps_cached") or result.get("steps_rebuilt"):
+                add_log(f"{prefix}Build steps: {result.get('steps_cached', 0)} cached, {result.get('steps_rebuilt', 0)} rebuilt.")
+
+    def _push_all(self, targets: list[dict], results: dict, log_writer: DeploymentLogWriter, check_cancelled):
+        """
+        Pushes every target's image to the registry, concurrently, and switches
+        the targets over to the pushed digest references.
+        """
+        add_log = log_writer.log
+
+        def push(target):
+            prefix = target["prefix"]
+
+            def on_output(line: str):
+                log_writer.write(prefix + line if prefix and line.strip() else line)
+                check_cancelled()
+
+            started = time.monotonic()
+            image_ref = registry_service.push(target["full_image_name"], on_output=on_output)
+            result = results[target["name"]]
+            result["image_ref"] = image_ref
+            result["push_seconds"] = round(time.monotonic() - started, 3)
+            target["deploy_image"] = image_ref
+            add_log(f"{prefix}Pushed in {result['push_seconds']}s: {image_ref}")
+
+        workers = max(1, min(settings.BUILD_MAX_PARALLEL, len(targets)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(push, target) for target in targets]
+            errors = []
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def _wait_for_rollout(self, db: Session, project: Project, deployment: Deployment, targets: list[dict],
+                          results: dict, add_log) -> bool:
+        """
+        Waits for every applied target to become ready and records time-to-ready.
+        Returns False if any of them didn't, after rolling back if configured to.
+        """
+        if not settings.ROLLOUT_TIMEOUT_SECONDS:
+            return True
+        add_log(f"Waiting up to {settings.ROLLOUT_TIMEOUT_SECONDS:g}s for the rollout to become ready...")
+        rollouts = rollout_tracker.wait_for_rollouts(
+            [(target["k8s_name"], target["deploy_image"]) for target in targets]
+        )
+
+        ready = True
+        for target, rollout in zip(targets, rollouts):
+            result = results[target["name"]]
+            if rollout.ready:
+                result["status"] = "ready"
+                result["ready_seconds"] = rollout.seconds
+                add_log(f"{target['prefix']}{target['k8s_name']} ready after {rollout.seconds}s.")
+            else:
+                result["status"] = "not_ready"
+                add_log(f"{target['prefix']}ERROR: {target['k8s_name']} did not become ready: {rollout.reason}")
+                ready = False
+
+        if not ready and settings.ROLLOUT_AUTO_ROLLBACK:
+            self._restore_previous(db, project, deployment, targets, add_log)
+        return ready
+
+    def _restore_previous(self, db: Session, project: Project, deployment: Deployment, targets: list[dict], add_log):
+        # Still the release from before this deployment, since this one didn't succeed
+        known_good.sync(db, project)
+        release = known_good.current(project.id)
+        if release is not None:
+            for target in targets:
+                image = release.images.get(target["k8s_name"])
+                if image is None:
+                    continue
+                if k8s_service.update_image(target["k8s_name"], image):
+                    add_log(f"{target['prefix']}Auto-rollback: {target['k8s_name']} restored to {image}.")
+                else:
+                    add_log(f"{target['prefix']}ERROR: Auto-rollback of {target['k8s_name']} failed.")
+            return
+
+        previous = db.query(Deployment).filter(
+            Deployment.project_id == project.id,
+            Deployment.status == "success",
+            Deployment.id != deployment.id
+        ).order_by(Deployment.id.desc()).first()
+        if previous is None:
+            add_log("Auto-rollback skipped: no previous successful deployment.")
+            return
+
+        previous_images = {result["name"]: result.get("image_ref") or result["image_name"]
+                           for result in previous.target_results or []}
+        for index, target in enumerate(targets):
+            # Deployments from before build targets only recorded the primary image
+            image = previous_images.get(target["name"]) or (
+                (previous.image_digest or previous.image_name) if index == 0 else None
+            )
+            if image is None:
+                continue
+            if k8s_service.update_image(target["k8s_name"], image):
+                add_log(f"{target['prefix']}Auto-rollback: {target['k8s_name']} restored to {image}.")
+            else:
+                add_log(f"{target['prefix']}ERROR: Auto-rollback of {target['k8s_name']} failed.")
+
     def rollback(self, db: Session, project: Project, target_deployment: Deployment):
-        # 1. Create a new deployment record for the rollback event
+        """
+        Puts the images of target_deployment back on the cluster, as recorded
+        when it was deployed (digests when pushed), so no tag has to still be right.
+        """
+        release = known_good.get(project.id, target_deployment.id)
+        if release is None:
+            images = release_images(project, target_deployment)
+            if not images:
+                # Deployments from before image references were recorded
+                tag = "latest" if target_deployment.commit_hash == "manual" else target_deployment.commit_hash[:7]
+                images = {project.name.lower(): f"autodeployhub/{project.name}:{tag}"}
+            release = Release(target_deployment.id, target_deployment.commit_hash, images)
+        return self.rollback_to_release(db, project, release)
+
+    def rollback_to_release(self, db: Session, project: Project, release: Release):
+        """
+        One image-only patch per Kubernetes Deployment. Readiness is tracked in
+        the background, so the returned rollback record may still be deploying.
+        """
         rollback_deployment = Deployment(
             project_id=project.id,
-            commit_hash=f"ROLLBACK-{target_deployment.commit_hash[:7]}",
+            commit_hash=f"ROLLBACK-{release.commit_hash[:7]}",
             status="deploying",
-            logs=f"Rollback initiated to commit {target_deployment.commit_hash}\n"
+            logs="",
+            # Tracked by this process, recover() elsewhere leaves it alone
+            heartbeat_at=datetime.now(timezone.utc)
         )
         db.add(rollback_deployment)
         db.commit()
-        db.refresh(rollback_deployment)
 
-        def add_log(message: str):
-            rollback_deployment.logs += f"[{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')}] {message}\n"
-            db.commit()
+        log_writer = DeploymentLogWriter(rollback_deployment.id, store=log_store)
+        add_log = log_writer.log
+        add_log(f"Rollback initiated to commit {release.commit_hash}")
 
+        results = [{"name": k8s_name, "k8s_name": k8s_name, "image_name": image, "image_ref": image, "status": "pending"}
+                   for k8s_name, image in release.images.items()]
+        success = True
         try:
-            # We assume the image still exists locally or in the registry
-            image_name = f"autodeployhub/{project.name}:{target_deployment.commit_hash[:7]}"
-            if target_deployment.commit_hash == "manual":
-                image_name = f"autodeployhub/{project.name}:latest"
-
-            add_log(f"Rolling back to image: {image_name}")
-            
-            success = k8s_service.update_image(project.name.lower(), image_name)
-            
-            if success:
-                add_log("Successfully patched Kubernetes deployment.")
-                rollback_deployment.status = "success"
-            else:
-                add_log("ERROR: Kubernetes patch failed.")
-                rollback_deployment.status = "failed"
-
+            for result in results:
+                add_log(f"Rolling back {result['k8s_name']} to image: {result['image_ref']}")
+                if k8s_service.update_image(result["k8s_name"], result["image_ref"]):
+                    result["status"] = "deployed"
+                else:
+                    add_log(f"ERROR: Kubernetes patch of {result['k8s_name']} failed.")
+                    result["status"] = "deploy_failed"
+                    success = False
         except Exception as e:
             add_log(f"FATAL ERROR during rollback: {str(e)}")
-            rollback_deployment.status = "failed"
+            success = False
 
-        rollback_deployment.finished_at = datetime.now(timezone.utc)
-        db.commit()
+        primary = results[0]["image_ref"] if results else None
+        # Recorded so the images count as deployed for garbage collection
+        rollback_deployment.image_name = primary
+        rollback_deployment.image_digest = primary if primary and "@" in primary else None
+        rollback_deployment.target_results = results
+        if success:
+            add_log("Successfully patched Kubernetes deployment.")
+        if success and settings.ROLLOUT_TIMEOUT_SECONDS:
+            add_log(f"Waiting up to {settings.ROLLOUT_TIMEOUT_SECONDS:g}s for the rollout to become ready...")
+            db.commit()
+            threading.Thread(target=self._track_rollback, args=(rollback_deployment.id, release, log_writer),
+                             name=f"rollback-{rollback_deployment.id}", daemon=True).start()
+            return rollback_deployment
+
+        self._finish_rollback(db, project, rollback_deployment, release, success, log_writer)
         return rollback_deployment
 
+    def _track_rollback(self, deployment_id: int, release: Release, log_writer: DeploymentLogWriter):
+        """
+        Waits for a patched rollback to become ready and finishes its record.
+        """
+        db = SessionLocal()
+        try:
+            deployment = db.get(Deployment, deployment_id)
+            project = db.get(Project, deployment.project_id)
+            results = [dict(result) for result in deployment.target_results or []]
+            success = True
+            try:
+                rollouts = self._wait_with_heartbeat(db, deployment, list(release.images.items()))
+                for result, rollout in zip(results, rollouts):
+                    if rollout.ready:
+                        result["status"] = "ready"
+                        result["ready_seconds"] = rollout.seconds
+                        log_writer.log(f"{result['k8s_name']} ready after {rollout.seconds}s.")
+                    else:
+                        result["status"] = "not_ready"
+                        log_writer.log(f"ERROR: {result['k8s_name']} did not become ready: {rollout.reason}")
+                        success = False
+            except Exception as e:
+                log_writer.log(f"FATAL ERROR during rollback: {str(e)}")
+                success = False
+            deployment.target_results = results
+            self._finish_rollback(db, project, deployment, release, success, log_writer)
+        except Exception as e:
+            print(f"Failed to finish rollback {deployment_id}: {e}")
+        finally:
+            db.close()
+
+    def _wait_with_heartbeat(self, db: Session, deployment: Deployment, rollouts: list[tuple[str, str]]):
+        # Heartbeats like a queued deployment while the rollout tracker waits
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(rollout_tracker.wait_for_rollouts, rollouts)
+            while True:
+                try:
+                    return future.result(timeout=settings.DEPLOY_HEARTBEAT_SECONDS)
+                except FutureTimeout:
+                    deployment.heartbeat_at = datetime.now(timezone.utc)
+                    db.commit()
+
+    def _finish_rollback(self, db: Session, project: Project, deployment: Deployment, release: Release,
+                         success: bool, log_writer: DeploymentLogWriter):
+        if success:
+            known_good.set_current(project.id, release.deployment_id)
+        deployment.status = "success" if success else "failed"
+        log_writer.log(f"Rollback finished with status: {deployment.status}")
+        deployment.finished_at = datetime.now(timezone.utc)
+        log_store.consolidate(db, deployment, log_writer.close())
+
 orchestrator = Orchestrator()
@@ -0,0 +1,76 @@
+import asyncio
+import inspect
+from dataclasses import dataclass
+
+class CommandError(Exception):
+    def __init__(self, args: list[str], returncode: int | None, output: str):
+        self.command = args
+        self.returncode = returncode
+        self.output = output
+        super().__init__(f"{args[0]} exited with {returncode}: {output.strip()}")
+
+class CommandTimeout(CommandError):
+    def __init__(self, args: list[str], timeout: float, output: str):
+        self.command = args
+        self.returncode = None
+        self.output = output
+        Exception.__init__(self, f"{args[0]} timed out after {timeout}s")
+
+@dataclass
+class CommandResult:
+    returncode: int
+    stdout: str
+    stderr: str
+
+async def run_command(args: list[str], cwd: str | None = None, timeout: float | None = None,
+                      on_output=None, check: bool = True) -> CommandResult:
+    """
+    Runs a command without blocking the event loop.
+
+    With on_output (a plain or async callable), stderr is merged into stdout and
+    each line is passed on as it arrives. On timeout or task cancellation the
+    process is killed before the exception propagates.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT if on_output else asyncio.subprocess.PIPE
+    )
+    lines: list[str] = []
+
+    async def stream():
+        async for raw in process.stdout:
+            line = raw.decode(errors="replace")
+            lines.append(line)
+            result = on_output(line)
+            if inspect.isawaitable(result):
+                await result
+        await process.wait()
+        return "".join(lines), ""
+
+    async def collect():
+        stdout, stderr = await process.communicate()
+        return stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+    try:
+        stdout, stderr = await asyncio.wait_for(stream() if on_output else collect(), timeout=timeout)
+    except asyncio.TimeoutError:
+        _kill(process)
+        await process.wait()
+        raise CommandTimeout(args, timeout, "".join(lines))
+    except BaseException:
+        # Cancelled, or on_output raised: don't leave the child running
+        _kill(process)
+        await process.wait()
+        raise
+
+    if check and process.returncode != 0:
+        raise CommandError(args, process.returncode, stderr or stdout[-4000:])
+    return CommandResult(process.returncode, stdout, stderr)
+
+def _kill(process: asyncio.subprocess.Process):
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.repo import normalize_repo_url
+from app.db.session import SessionLocal
+from app.models.project import Project
+from app.models.webhook_delivery import WebhookDelivery
+
+@dataclass(frozen=True)
+class ProjectRef:
+    id: int
+    name: str
+    branch: str
+
+class ProjectIndex:
+    """
+    In-memory map from normalized repository URL to project, so a webhook finds
+    its project without querying. Reloaded with one query after invalidate()
+    (projects created, updated or deleted here) or once the TTL passes, which
+    picks up changes made by other processes.
+    """
+    def __init__(self, ttl: float | None = None):
+        self.ttl = settings.PROJECT_INDEX_TTL_SECONDS if ttl is None else ttl
+        self._projects: dict[str, ProjectRef] = {}
+        self._expires_at = 0.0
+        self._generation = 0
+        self._reload_lock: asyncio.Lock | None = None
+
+    async def lookup(self, db: AsyncSession, repo_url: str) -> ProjectRef | None:
+        if time.monotonic() >= self._expires_at:
+            await self._reload(db)
+        return self._projects.get(normalize_repo_url(repo_url))
+
+    def invalidate(self):
+        """
+        Safe to call from any thread.
+        """
+        self._generation += 1
+        self._expires_at = 0.0
+
+    async def _reload(self, db: AsyncSession):
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+        async with self._reload_lock:
+            if time.monotonic() < self._expires_at:
+                return
+            generation = self._generation
+            rows = (await db.execute(
+                select(Project.id, Project.name, Project.branch, Project.normalized_repo)
+            )).all()
+            self._projects = {
+                row.normalized_repo: ProjectRef(row.id, row.name, row.branch)
+                for row in rows if row.normalized_repo
+            }
+            if generation == self._generation:
+                self._expires_at = time.monotonic() + self.ttl
+
+class RecentDeliveries:
+    """
+    Bounded LRU of webhook delivery IDs already handled by this process. The
+    webhook_deliveries table is the source of truth; this only saves the
+    round trip for redeliveries that arrive here again. Rows older than the
+    redelivery window are pruned periodically.
+    """
+    def __init__(self, size: int | None = None):
+        self.size = settings.WEBHOOK_DELIVERY_CACHE_SIZE if size is None else size
+        self._ids: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.Lock()
+        self._prune_task: asyncio.Task | None = None
+
+    def seen(self, delivery_id: str) -> bool:
+        with self._lock:
+            if delivery_id in self._ids:
+                self._ids.move_to_end(delivery_id)
+                return True
+            return False
+
+    def remember(self, delivery_id: str):
+        with self._lock:
+            self._ids[delivery_id] = None
+            self._ids.move_to_end(delivery_id)
+            while len(self._ids) > self.size:
+                self._ids.popitem(last=False)
+
+    def prune(self, db: Session, now: datetime | None = None) -> int:
+        """
+        Forgets recorded deliveries GitHub can no longer redeliver. Returns how many.
+        """
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=settings.WEBHOOK_DELIVERY_RETENTION_HOURS)
+        deleted = db.query(WebhookDelivery).filter(WebhookDelivery.received_at < cutoff).delete()
+        db.commit()
+        return deleted
+
+    def start_pruning(self):
+        if self._prune_task is None:
+            self._prune_task = asyncio.create_task(self._prune_periodically())
+
+    async def stop_pruning(self):
+        if self._prune_task is not None:
+            self._prune_task.cancel()
+            try:
+                await self._prune_task
+            except asyncio.CancelledError:
+                pass
+            self._prune_task = None
+
+    async def _prune_periodically(self):
+        while True:
+            await asyncio.sleep(settings.WEBHOOK_DELIVERY_PRUNE_INTERVAL_SECONDS)
+            try:
+                pruned = await run_in_threadpool(self._prune_once)
+                if pruned:
+                    print(f"Forgot {pruned} webhook deliveries past the redelivery window")
+            except Exception as e:
+                print(f"Webhook delivery pruning failed: {e}")
+
+    def _prune_once(self) -> int:
+        db = SessionLocal()
+        try:
+            return self.prune(db)
+        finally:
+            db.close()
+
+project_index = ProjectIndex()
+recent_deliveries = RecentDeliveries()
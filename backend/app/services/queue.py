@@ -0,0 +1,287 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.models.deployment import Deployment
+from app.models.project import Project
+from app.services.commit_status import commit_status
+from app.services.logs import log_store
+from app.services.metrics import DEPLOY_QUEUE_DEPTH
+
+def run_deployment_job(deployment_id: int, cancel_event: threading.Event | None = None):
+    """
+    Worker entry point: runs a single queued deployment in its own DB session.
+    Kept at module level so it can be pickled into a process pool.
+    """
+    from app.services.orchestrator import orchestrator
+
+    db = SessionLocal()
+    try:
+        # Several server processes may have queued it (recover() runs in each); one claims it
+        claimed = db.query(Deployment).filter(
+            Deployment.id == deployment_id,
+            Deployment.status == "pending",
+            _unclaimed()
+        ).update({Deployment.heartbeat_at: datetime.now(timezone.utc)}, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return None
+
+        deployment = db.query(Deployment).filter(Deployment.id == deployment_id).first()
+        if deployment is None or deployment.status != "pending":
+            return None
+
+        project = db.query(Project).filter(Project.id == deployment.project_id).first()
+        if project is None:
+            deployment.status = "failed"
+            deployment.finished_at = datetime.now(timezone.utc)
+            log_store.finish(db, deployment, "Project no longer exists.\n")
+            return deployment.status
+
+        orchestrator.run_deployment(db, project, deployment, cancel_event=cancel_event)
+        return deployment.status
+    finally:
+        db.close()
+
+def _unclaimed():
+    # No live process has heartbeated the deployment recently
+    stale = datetime.now(timezone.utc) - timedelta(seconds=settings.DEPLOY_STALE_SECONDS)
+    return or_(Deployment.heartbeat_at.is_(None), Deployment.heartbeat_at < stale)
+
+def _init_worker_process():
+    # Pooled connections inherited from the parent must not be shared after fork
+    engine.dispose(close=False)
+
+@dataclass
+class DeploymentJob:
+    deployment_id: int
+    project_id: int
+    coalesce: bool = False
+    not_before: float = 0.0
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+
+class DeploymentQueue:
+    """
+    In-process deployment queue. The deployments table is the durable record
+    (rows stay 'pending' until a worker picks them up), so jobs survive a
+    restart via recover() without needing an external broker.
+    """
+    def __init__(self, runner=run_deployment_job, max_workers: int | None = None,
+                 mode: str | None = None, per_project_limit: int | None = None,
+                 debounce_seconds: float | None = None, cancel_in_flight: bool | None = None):
+        self.runner = runner
+        self.max_workers = max_workers or settings.DEPLOY_WORKERS
+        self.mode = mode or settings.DEPLOY_WORKER_MODE
+        self.per_project_limit = per_project_limit or settings.DEPLOY_PER_PROJECT_CONCURRENCY
+        self.debounce_seconds = settings.DEPLOY_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        self.cancel_in_flight = settings.DEPLOY_CANCEL_IN_FLIGHT if cancel_in_flight is None else cancel_in_flight
+
+        self._pending: deque[DeploymentJob] = deque()
+        self._in_flight: dict[int, DeploymentJob] = {}
+        self._running: dict[int, int] = {}
+        self._active = 0
+        self._cond = threading.Condition()
+        self._executor = None
+        self._dispatcher = None
+        self._heartbeat = None
+        self._stopping = False
+
+    def start(self):
+        with self._cond:
+            if self._executor is not None:
+                return
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker_process
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="deploy-worker"
+                )
+            self._stopping = False
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="deploy-dispatcher", daemon=True)
+            self._dispatcher.start()
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="deploy-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def shutdown(self, wait: bool = True):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+            self._dispatcher = None
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def enqueue(self, deployment_id: int, project_id: int, coalesce: bool = False):
+        """
+        Queues a deployment. Coalescing jobs (webhook pushes) are held for the
+        debounce window and replace any coalescing job of the same project that
+        has not started yet; the replaced deployments are marked 'superseded'.
+        """
+        job = DeploymentJob(deployment_id, project_id, coalesce=coalesce)
+        superseded = []
+        with self._cond:
+            if coalesce:
+                job.not_before = time.monotonic() + self.debounce_seconds
+                superseded = [j for j in self._pending if j.project_id == project_id and j.coalesce]
+                for old in superseded:
+                    self._pending.remove(old)
+                if self.cancel_in_flight:
+                    for running in self._in_flight.values():
+                        if running.project_id == project_id and running.coalesce:
+                            running.cancel_event.set()
+            self._pending.append(job)
+            self._cond.notify_all()
+
+        if superseded:
+            self._mark_superseded([old.deployment_id for old in superseded], deployment_id)
+        return [old.deployment_id for old in superseded]
+
+    def cancel(self, deployment_id: int) -> bool:
+        """
+        Asks a running deployment to stop at its next stage boundary.
+        Only effective in thread mode; process workers cannot see the event.
+        """
+        with self._cond:
+            job = self._in_flight.get(deployment_id)
+            if job is None:
+                return False
+            job.cancel_event.set()
+            return True
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def recover(self, db: Session):
+        """
+        Re-queues deployments left pending by a previous process and fails the
+        ones that were interrupted mid-run. Deployments another live server
+        process is running keep their fresh heartbeat and are left alone.
+        """
+        interrupted = db.query(Deployment).filter(
+            Deployment.status.in_(["building", "deploying"]),
+            _unclaimed()
+        ).all()
+        for deployment in interrupted:
+            deployment.status = "failed"
+            deployment.finished_at = datetime.now(timezone.utc)
+            log_store.finish(db, deployment, "Deployment interrupted by a server restart.\n")
+        db.commit()
+
+        pending = db.query(Deployment).filter(Deployment.status == "pending").order_by(Deployment.id).all()
+        for deployment in pending:
+            self.enqueue(deployment.id, deployment.project_id, coalesce=deployment.commit_hash != "manual")
+        return len(pending)
+
+    def _mark_superseded(self, deployment_ids: list[int], superseded_by: int):
+        db = SessionLocal()
+        try:
+            deployments = db.query(Deployment).filter(
+                Deployment.id.in_(deployment_ids),
+                Deployment.status == "pending"
+            ).all()
+            for deployment in deployments:
+                deployment.status = "superseded"
+                deployment.finished_at = datetime.now(timezone.utc)
+                log_store.finish(db, deployment, f"Superseded by deployment #{superseded_by}.\n")
+                project = db.get(Project, deployment.project_id)
+                if project is not None:
+                    commit_status.report(project, deployment)
+        except Exception as e:
+            # The worker skips non-pending rows anyway; a stale 'pending' row is only cosmetic
+            print(f"Failed to mark deployments {deployment_ids} as superseded: {e}")
+        finally:
+            db.close()
+
+    def _heartbeat_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping, timeout=settings.DEPLOY_HEARTBEAT_SECONDS)
+                if self._stopping:
+                    return
+                deployment_ids = list(self._in_flight)
+            if deployment_ids:
+                self._beat(deployment_ids)
+
+    def _beat(self, deployment_ids: list[int]):
+        db = SessionLocal()
+        try:
+            db.query(Deployment).filter(Deployment.id.in_(deployment_ids)).update(
+                {Deployment.heartbeat_at: datetime.now(timezone.utc)}, synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            print(f"Failed to heartbeat deployments {deployment_ids}: {e}")
+        finally:
+            db.close()
+
+    def _next_job(self):
+        """
+        Returns the first job in FIFO order whose debounce window has elapsed and
+        whose project is below its concurrency limit, plus how long to wait for
+        the next debounced job when nothing is ready yet.
+        """
+        now = time.monotonic()
+        wait_for = None
+        for job in self._pending:
+            if job.not_before > now:
+                delay = job.not_before - now
+                wait_for = delay if wait_for is None else min(wait_for, delay)
+                continue
+            if self._running.get(job.project_id, 0) < self.per_project_limit:
+                self._pending.remove(job)
+                return job, None
+        return None, wait_for
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopping:
+                    wait_for = None
+                    if self._active < self.max_workers:
+                        job, wait_for = self._next_job()
+                        if job is not None:
+                            break
+                    self._cond.wait(timeout=wait_for)
+                if self._stopping:
+                    return
+                self._active += 1
+                self._running[job.project_id] = self._running.get(job.project_id, 0) + 1
+                self._in_flight[job.deployment_id] = job
+
+            if self.mode == "process":
+                future = self._executor.submit(self.runner, job.deployment_id)
+            else:
+                future = self._executor.submit(self.runner, job.deployment_id, job.cancel_event)
+            future.add_done_callback(lambda f, job=job: self._finished(job, f))
+
+    def _finished(self, job: DeploymentJob, future):
+        with self._cond:
+            self._in_flight.pop(job.deployment_id, None)
+            self._active -= 1
+            self._running[job.project_id] -= 1
+            if self._running[job.project_id] <= 0:
+                del self._running[job.project_id]
+            self._cond.notify_all()
+
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Deployment job {job.deployment_id} crashed: {future.exception()}")
+
+deployment_queue = DeploymentQueue()
+DEPLOY_QUEUE_DEPTH.set_function(deployment_queue.depth)
@@ -0,0 +1,126 @@
+import re
+import httpx
+from app.core.config import settings
+from app.services.docker import docker_service
+
+MANIFEST_TYPES = ", ".join([
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+])
+
+_PUSH_DIGEST = re.compile(r"digest: (sha256:[0-9a-f]{64})")
+_CHALLENGE_PARAM = re.compile(r'(\w+)="([^"]*)"')
+
+class RegistryService:
+    """
+    Pushes built images to an OCI registry (REGISTRY_URL) so that every node
+    of the cluster can pull them, and resolves them to digest references.
+    Docker uploads the layers of a push concurrently and skips layers the
+    registry already has; whole pushes are skipped when the manifest is there.
+    """
+    def __init__(self, url: str | None = None, insecure: bool | None = None,
+                 username: str | None = None, password: str | None = None):
+        self.url = (url if url is not None else settings.REGISTRY_URL or "").rstrip("/")
+        self.insecure = settings.REGISTRY_INSECURE if insecure is None else insecure
+        self.username = username if username is not None else settings.REGISTRY_USERNAME
+        self.password = password if password is not None else settings.REGISTRY_PASSWORD
+        self._client: httpx.Client | None = None
+        self._tokens: dict[str, str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(timeout=settings.DOCKER_COMMAND_TIMEOUT_SECONDS)
+        return self._client
+
+    def repository(self, image_name: str) -> str:
+        """
+        Registry repository for a local image name, e.g. autodeployhub/api ->
+        localhost:5000/autodeployhub/api.
+        """
+        return f"{self.url}/{image_name}"
+
+    def manifest_digest(self, repository: str, reference: str) -> str | None:
+        """
+        Digest of the manifest at repository:reference (a tag or digest), or None
+        if the registry doesn't have it. Only a HEAD request, no layers are read.
+        """
+        host, _, path = repository.partition("/")
+        scheme = "http" if self.insecure else "https"
+        response = self._request("HEAD", f"{scheme}://{host}/v2/{path}/manifests/{reference}", path)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise Exception(f"Registry lookup of {repository}:{reference} failed: HTTP {response.status_code}")
+        return response.headers.get("Docker-Content-Digest") or (reference if reference.startswith("sha256:") else None)
+
+    def push(self, image: str, on_output=None) -> str:
+        """
+        Pushes a local image (name:tag) and returns its digest reference,
+        repository@sha256:.... Nothing is uploaded when the registry already
+        holds the manifest docker recorded for this image.
+        """
+        name, _, tag = image.rpartition(":")
+        repository = self.repository(name)
+        remote = f"{repository}:{tag}"
+        if self.username:
+            # docker push uses the daemon's credential store, not REGISTRY_USERNAME/PASSWORD
+            docker_service.login(self.url.split("/")[0], self.username, self.password or "")
+        if not docker_service.tag_image(image, remote):
+            raise Exception(f"Image {image} not found")
+
+        for digest in self._local_digests(image, repository):
+            if self.manifest_digest(repository, digest):
+                if on_output is not None:
+                    on_output(f"{remote}: {digest} already in the registry, push skipped\n")
+                return f"{repository}@{digest}"
+
+        output = docker_service.push_image(remote, on_output=on_output)
+        match = _PUSH_DIGEST.search(output)
+        digest = match.group(1) if match else next(iter(self._local_digests(image, repository)), None)
+        if digest is None:
+            raise Exception(f"Pushed {remote} but could not determine its digest")
+        return f"{repository}@{digest}"
+
+    def _local_digests(self, image: str, repository: str) -> list[str]:
+        # Docker records the manifest digest of every push and pull of an image
+        return [
+            reference.split("@", 1)[1]
+            for reference in docker_service.get_repo_digests(image)
+            if reference.split("@", 1)[0] == repository
+        ]
+
+    def _request(self, method: str, url: str, path: str) -> httpx.Response:
+        headers = {"Accept": MANIFEST_TYPES}
+        if path in self._tokens:
+            headers["Authorization"] = f"Bearer {self._tokens[path]}"
+        auth = (self.username, self.password) if self.username and path not in self._tokens else None
+        response = self.client.request(method, url, headers=headers, auth=auth)
+        if response.status_code == 401:
+            challenge = response.headers.get("WWW-Authenticate", "")
+            if challenge.lower().startswith("bearer "):
+                self._tokens[path] = self._fetch_token(challenge)
+                headers["Authorization"] = f"Bearer {self._tokens[path]}"
+                response = self.client.request(method, url, headers=headers)
+        return response
+
+    def _fetch_token(self, challenge: str) -> str:
+        # Token auth as used by Docker Hub, GHCR and registries behind an auth server
+        params = dict(_CHALLENGE_PARAM.findall(challenge))
+        realm = params.pop("realm", None)
+        if realm is None:
+            raise Exception(f"Unsupported registry auth challenge: {challenge}")
+        auth = (self.username, self.password) if self.username else None
+        response = self.client.get(realm, params=params, auth=auth)
+        if response.status_code != 200:
+            raise Exception(f"Registry token request failed: HTTP {response.status_code}")
+        data = response.json()
+        return data.get("token") or data.get("access_token")
+
+registry_service = RegistryService()
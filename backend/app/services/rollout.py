@@ -0,0 +1,208 @@
+import json
+import threading
+import time
+from dataclasses import dataclass
+from kubernetes import client, watch
+from app.core.config import settings
+from app.services.k8s import k8s_service
+
+@dataclass
+class RolloutResult:
+    name: str
+    ready: bool
+    seconds: float
+    reason: str | None = None
+
+def rollout_status(deployment: dict, image: str | None = None) -> tuple[bool, str | None]:
+    """
+    Evaluates a Deployment the way `kubectl rollout status` does.
+    Returns (done, failure_reason); failure_reason is set when the rollout can't finish.
+    """
+    metadata = deployment.get("metadata", {})
+    spec = deployment.get("spec", {})
+    status = deployment.get("status") or {}
+
+    if image is not None:
+        containers = spec.get("template", {}).get("spec", {}).get("containers", [])
+        # The cached object may still be the one from before our apply
+        if image not in [c.get("image") for c in containers]:
+            return False, None
+    if status.get("observedGeneration", 0) < metadata.get("generation", 0):
+        return False, None
+    for condition in status.get("conditions") or []:
+        if condition.get("type") == "Progressing" and condition.get("reason") == "ProgressDeadlineExceeded":
+            return False, condition.get("message") or "progress deadline exceeded"
+
+    replicas = spec.get("replicas", 1)
+    updated = status.get("updatedReplicas", 0)
+    if updated < replicas:
+        return False, None
+    if status.get("replicas", 0) > updated:
+        # Old pods are still terminating
+        return False, None
+    if status.get("availableReplicas", 0) < updated:
+        return False, None
+    return True, None
+
+class _Waiter:
+    def __init__(self, name: str, image: str | None):
+        self.name = name
+        self.image = image
+        self.started = time.monotonic()
+        self.done = threading.Event()
+        self.result: RolloutResult | None = None
+
+    def finish(self, ready: bool, reason: str | None = None):
+        if not self.done.is_set():
+            self.result = RolloutResult(self.name, ready, round(time.monotonic() - self.started, 3), reason)
+            self.done.set()
+
+class _NamespaceWatch:
+    """
+    One watch connection on the Deployments of a namespace, shared by every
+    waiter in it. Runs while anybody is waiting and exits once idle.
+    """
+    def __init__(self, namespace: str, api_factory, watch_factory, watch_timeout: int):
+        self.namespace = namespace
+        self.api_factory = api_factory
+        self.watch_factory = watch_factory
+        self.watch_timeout = watch_timeout
+        self.objects: dict[str, dict] = {}
+        self.waiters: dict[str, set[_Waiter]] = {}
+        self.resource_version: str | None = None
+        self.lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+        self._watch = None
+
+    def add(self, waiter: _Waiter):
+        with self.lock:
+            self.waiters.setdefault(waiter.name, set()).add(waiter)
+            current = self.objects.get(waiter.name)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        if current is not None:
+            self._evaluate(waiter, current)
+
+    def remove(self, waiter: _Waiter):
+        with self.lock:
+            waiters = self.waiters.get(waiter.name)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self.waiters[waiter.name]
+            if not self.waiters and self._watch is not None:
+                self._watch.stop()
+
+    def _run(self):
+        api = self.api_factory()
+        while True:
+            with self.lock:
+                if not self.waiters:
+                    self.thread = None
+                    self._watch = None
+                    return
+                self._watch = self.watch_factory()
+                stream_watch = self._watch
+            try:
+                if self.resource_version is None:
+                    self._relist(api)
+                for event in stream_watch.stream(api.list_namespaced_deployment, namespace=self.namespace,
+                                                 resource_version=self.resource_version,
+                                                 timeout_seconds=self.watch_timeout):
+                    self._handle(event)
+            except Exception as e:
+                print(f"Rollout watch on namespace {self.namespace} failed: {e}")
+                self.resource_version = None
+                time.sleep(1)
+
+    def _relist(self, api):
+        response = api.list_namespaced_deployment(namespace=self.namespace, _preload_content=False)
+        listing = json.loads(response.data)
+        objects = {item["metadata"]["name"]: item for item in listing.get("items", [])}
+        with self.lock:
+            self.objects = objects
+            self.resource_version = listing.get("metadata", {}).get("resourceVersion")
+        for name, deployment in objects.items():
+            self._notify(name, deployment)
+
+    def _handle(self, event: dict):
+        obj = event.get("raw_object") or {}
+        if event.get("type") == "ERROR":
+            # 410 Gone: our resourceVersion is too old, start over from a fresh list
+            self.resource_version = None
+            raise Exception(obj.get("message", "watch error"))
+
+        metadata = obj.get("metadata", {})
+        self.resource_version = metadata.get("resourceVersion", self.resource_version)
+        name = metadata.get("name")
+        if event.get("type") == "BOOKMARK" or name is None:
+            return
+        with self.lock:
+            if event.get("type") == "DELETED":
+                self.objects.pop(name, None)
+            else:
+                self.objects[name] = obj
+        self._notify(name, obj)
+
+    def _notify(self, name: str, deployment: dict):
+        with self.lock:
+            waiters = list(self.waiters.get(name, ()))
+        for waiter in waiters:
+            self._evaluate(waiter, deployment)
+
+    def _evaluate(self, waiter: _Waiter, deployment: dict):
+        done, reason = rollout_status(deployment, waiter.image)
+        if done:
+            waiter.finish(True)
+        elif reason:
+            waiter.finish(False, reason)
+
+class RolloutTracker:
+    """
+    Waits for Deployments to become ready after an apply, driven by watch events
+    instead of polling each Deployment.
+    """
+    def __init__(self, api_factory=None, watch_factory=None, watch_timeout: int = 60):
+        # Defaults to the K8sService connection pool; the watch holds one of its connections
+        self.api_factory = api_factory or (lambda: k8s_service.api(client.AppsV1Api))
+        self.watch_factory = watch_factory or watch.Watch
+        self.watch_timeout = watch_timeout
+        self._namespaces: dict[str, _NamespaceWatch] = {}
+        self._lock = threading.Lock()
+
+    def wait_for_rollouts(self, rollouts: list[tuple[str, str | None]], namespace: str | None = None,
+                          timeout: float | None = None) -> list[RolloutResult]:
+        """
+        Waits until every (deployment name, image) pair is rolled out, or timeout.
+        Results are in the order given; time-to-ready is measured from the call.
+        """
+        namespace_watch = self._namespace(namespace or settings.K8S_NAMESPACE)
+        timeout = settings.ROLLOUT_TIMEOUT_SECONDS if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        waiters = [_Waiter(name, image) for name, image in rollouts]
+        for waiter in waiters:
+            namespace_watch.add(waiter)
+        try:
+            for waiter in waiters:
+                if not waiter.done.wait(max(0.0, deadline - time.monotonic())):
+                    waiter.finish(False, f"not ready after {timeout:g}s")
+        finally:
+            for waiter in waiters:
+                namespace_watch.remove(waiter)
+        return [waiter.result for waiter in waiters]
+
+    def wait_for_rollout(self, name: str, image: str | None = None, namespace: str | None = None,
+                         timeout: float | None = None) -> RolloutResult:
+        return self.wait_for_rollouts([(name, image)], namespace=namespace, timeout=timeout)[0]
+
+    def _namespace(self, namespace: str) -> _NamespaceWatch:
+        with self._lock:
+            if namespace not in self._namespaces:
+                self._namespaces[namespace] = _NamespaceWatch(
+                    namespace, self.api_factory, self.watch_factory, self.watch_timeout
+                )
+            return self._namespaces[namespace]
+
+rollout_tracker = RolloutTracker()
@@ -0,0 +1,124 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from jose import JWTError, jwt
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.revoked_token import RevokedToken
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class SessionTokens:
+    """
+    Verifies session JWTs from the access_token cookie. Verified tokens are kept
+    in a bounded LRU keyed by the token's SHA-256 until their exp, so repeat
+    requests skip the signature check. Logout revokes a token in the
+    revoked_tokens table; every process reloads that list at least every
+    revocation_ttl seconds.
+    """
+    def __init__(self, size: int | None = None, revocation_ttl: float | None = None, session_factory=None):
+        self.size = settings.SESSION_CACHE_SIZE if size is None else size
+        self.revocation_ttl = settings.SESSION_REVOCATION_TTL_SECONDS if revocation_ttl is None else revocation_ttl
+        self.session_factory = session_factory
+        # token hash -> (username, exp as a timestamp or None)
+        self._verified: OrderedDict[str, tuple[str, float | None]] = OrderedDict()
+        # token hash -> timestamp after which the token is invalid anyway
+        self._revoked: dict[str, float] = {}
+        self._revoked_expires_at = 0.0
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    def verify(self, token: str) -> str | None:
+        """
+        The username (sub) of a valid, unrevoked token, else None.
+        """
+        key = token_hash(token)
+        self._refresh_revoked()
+        now = time.time()
+        with self._lock:
+            if key in self._revoked:
+                return None
+            entry = self._verified.get(key)
+            if entry is not None:
+                username, exp = entry
+                if exp is None or exp > now:
+                    self._verified.move_to_end(key)
+                    return username
+                del self._verified[key]
+
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            return None
+        username = payload.get("sub")
+        if username is None or not isinstance(username, str):
+            return None
+        exp = payload.get("exp")
+
+        with self._lock:
+            self._verified[key] = (username, float(exp) if exp is not None else None)
+            self._verified.move_to_end(key)
+            while len(self._verified) > self.size:
+                self._verified.popitem(last=False)
+        return username
+
+    def revoke(self, db: Session, token: str):
+        """
+        Invalidates token here right away and, through the database, in other processes.
+        """
+        key = token_hash(token)
+        expires_at = self._expiry(token)
+        with self._lock:
+            self._verified.pop(key, None)
+            self._revoked[key] = expires_at.timestamp()
+        db.merge(RevokedToken(token_hash=key, expires_at=expires_at))
+        # Tokens past their exp fail verification on their own
+        db.query(RevokedToken).filter(RevokedToken.expires_at < datetime.now(timezone.utc)).delete()
+        db.commit()
+
+    def _expiry(self, token: str) -> datetime:
+        try:
+            exp = jwt.get_unverified_claims(token).get("exp")
+        except JWTError:
+            exp = None
+        if exp is None:
+            return datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        return datetime.fromtimestamp(exp, timezone.utc)
+
+    def _refresh_revoked(self):
+        if time.monotonic() < self._revoked_expires_at:
+            return
+        with self._reload_lock:
+            if time.monotonic() < self._revoked_expires_at:
+                return
+            rows = None
+            db = (self.session_factory or SessionLocal)()
+            try:
+                rows = db.query(RevokedToken.token_hash, RevokedToken.expires_at).filter(
+                    RevokedToken.expires_at > datetime.now(timezone.utc)
+                ).all()
+            except Exception as e:
+                print(f"Warning: Could not load revoked sessions: {e}")
+            finally:
+                db.close()
+            # Retried after the TTL either way, so a database outage doesn't hit every request
+            self._revoked_expires_at = time.monotonic() + self.revocation_ttl
+            if rows is None:
+                return
+
+            now = time.time()
+            with self._lock:
+                # Keep local revocations too, in case recording one failed
+                revoked = {key: expires for key, expires in self._revoked.items() if expires > now}
+                for key, expires_at in rows:
+                    if expires_at.tzinfo is None:
+                        expires_at = expires_at.replace(tzinfo=timezone.utc)
+                    revoked[key] = expires_at.timestamp()
+                    self._verified.pop(key, None)
+                self._revoked = revoked
+
+session_tokens = SessionTokens()
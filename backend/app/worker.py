@@ -0,0 +1,241 @@
+"""
+Build-farm worker agent. Registers with the API, advertises its capacity,
+sends heartbeats and pulls build jobs: each job is checked out from the
+agent's own git mirror, built with docker (BuildKit cache included) and,
+when REGISTRY_URL is set, pushed; the result goes back to the API.
+
+    cd backend && python -m app.worker --api http://localhost:8000 --name worker-1 --capacity 2
+
+Several agents can run on one machine for testing, each with its own --name
+and --cache-dir. Without a registry the image stays in the agent's docker
+daemon, so the agents must then share the daemon the cluster pulls from.
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import httpx
+from app.core.config import settings
+from app.services.git import GitService, context_path, git_service
+from app.services.docker import DockerService, docker_service, count_build_steps
+from app.services.registry import registry_service
+
+class JobCancelled(Exception):
+    pass
+
+class JobLog:
+    """
+    Build output of one job, sent to the API in batches. A response saying the
+    job was cancelled makes the next write raise JobCancelled, which stops the build.
+    """
+    def __init__(self, agent: "WorkerAgent", job_id: int, cancelled: threading.Event):
+        self.agent = agent
+        self.job_id = job_id
+        self.cancelled = cancelled
+        self._buffer: list[str] = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, text: str, check: bool = True):
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= settings.LOG_FLUSH_BYTES or \
+                time.monotonic() - self._last_flush >= settings.LOG_FLUSH_INTERVAL_SECONDS:
+            self.flush()
+        if check:
+            self.check()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise JobCancelled("Build cancelled")
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        try:
+            response = self.agent.post(f"/jobs/{self.job_id}/log", json={"text": text})
+        except httpx.HTTPError as e:
+            # Kept for the next flush
+            print(f"Warning: Could not send build output of job {self.job_id}: {e}")
+            return
+        self._buffer, self._size = [], 0
+        # 409: requeued to another worker after we looked gone
+        if response.status_code == 409 or (response.is_success and response.json().get("cancel")):
+            self.cancelled.set()
+
+class WorkerAgent:
+    def __init__(self, api_url: str, name: str, capacity: int = 1, token: str | None = None,
+                 git: GitService | None = None, docker=None, registry=None, http: httpx.Client | None = None):
+        self.name = name
+        self.capacity = max(1, capacity)
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.http = http or httpx.Client(base_url=api_url.rstrip("/"), headers=headers, timeout=30)
+        self.git = git or git_service
+        self.docker = docker or docker_service
+        self.registry = registry or registry_service
+        self.worker_id: int | None = None
+        self.heartbeat_seconds = settings.BUILD_WORKER_HEARTBEAT_SECONDS
+        self.poll_seconds = settings.BUILD_WORKER_POLL_SECONDS
+        # job id -> cancel flag, for the jobs running now
+        self._active: dict[int, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def post(self, path: str, **kwargs) -> httpx.Response:
+        """
+        POST to /workers/<our id><path>.
+        """
+        return self.http.post(f"/workers/{self.worker_id}{path}", **kwargs)
+
+    def register(self):
+        response = self.http.post("/workers/register", json={"name": self.name, "capacity": self.capacity})
+        response.raise_for_status()
+        registration = response.json()
+        self.worker_id = registration["id"]
+        self.heartbeat_seconds = registration.get("heartbeat_seconds", self.heartbeat_seconds)
+        self.poll_seconds = registration.get("poll_seconds", self.poll_seconds)
+        print(f"Registered as build worker {self.name} (id {self.worker_id}, capacity {self.capacity})")
+
+    def heartbeat(self):
+        with self._lock:
+            active = len(self._active)
+        response = self.post("/heartbeat", json={"active_jobs": active})
+        if response.status_code == 404:
+            self.register()
+            return
+        response.raise_for_status()
+        for job_id in response.json()["cancel"]:
+            with self._lock:
+                cancelled = self._active.get(job_id)
+            if cancelled is not None:
+                cancelled.set()
+
+    def claim(self) -> list[dict]:
+        with self._lock:
+            slots = self.capacity - len(self._active)
+        if slots <= 0:
+            return []
+        response = self.post("/claim", params={"slots": slots})
+        if response.status_code == 404:
+            self.register()
+            return []
+        response.raise_for_status()
+        jobs = response.json()["jobs"]
+        with self._lock:
+            for job in jobs:
+                self._active[job["id"]] = threading.Event()
+        return jobs
+
+    def run(self):
+        """
+        Claims and builds jobs until stop(). Running builds finish before it returns.
+        """
+        self.register()
+        threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+        with ThreadPoolExecutor(max_workers=self.capacity) as pool:
+            while not self._stop.is_set():
+                try:
+                    jobs = self.claim()
+                except httpx.HTTPError as e:
+                    print(f"Warning: Could not claim build jobs: {e}")
+                    jobs = []
+                for job in jobs:
+                    pool.submit(self.run_job, job)
+                if not jobs:
+                    self._stop.wait(self.poll_seconds)
+
+    def stop(self):
+        self._stop.set()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self.heartbeat()
+            except httpx.HTTPError as e:
+                print(f"Warning: Build worker heartbeat failed: {e}")
+
+    def run_job(self, job: dict):
+        """
+        Checks out, builds and pushes one job, then reports the outcome.
+        """
+        job_id, spec = job["id"], job["spec"]
+        with self._lock:
+            cancelled = self._active.setdefault(job_id, threading.Event())
+        log = JobLog(self, job_id, cancelled)
+        status, result = "failed", {}
+        worktree = None
+        try:
+            log.write(f"[{self.name}] Checking out {spec['repo_url']} (branch: {spec['branch']}, commit: {spec['commit_hash']})\n")
+            worktree = self.git.clone_repo(spec["repo_url"], spec["project_name"], spec["branch"],
+                                           commit_hash=spec["commit_hash"], sparse_paths=spec.get("sparse_paths"))
+            log.check()
+            started = time.monotonic()
+            full_image_name, output = self.docker.build_image(
+                context_path(worktree, spec["context"]), spec["image_name"], spec["tag"], on_output=log.write,
+                dockerfile=spec["dockerfile"], build_args=spec.get("build_args"), target=spec.get("target")
+            )
+            result["build_seconds"] = round(time.monotonic() - started, 3)
+            result["image_id"] = self.docker.get_image_id(full_image_name)
+            steps = count_build_steps(output)
+            result.update(steps_cached=steps["cached"], steps_rebuilt=steps["rebuilt"])
+            result["image_ref"] = full_image_name
+            if self.registry.enabled:
+                result["image_ref"] = self.registry.push(full_image_name, on_output=log.write)
+            status = "succeeded"
+        except JobCancelled:
+            status = "cancelled"
+            result["error"] = "Cancelled"
+        except Exception as e:
+            result["error"] = str(e)
+            # Not check()ed: a cancellation arriving now must not skip reporting the failure
+            log.write(f"[{self.name}] ERROR: {e}\n", check=False)
+        finally:
+            if worktree is not None:
+                self.git.release(worktree)
+            try:
+                log.flush()
+            except Exception:
+                pass
+            self._report(job_id, status, result)
+            with self._lock:
+                self._active.pop(job_id, None)
+        print(f"Job {job_id} ({spec['image_name']}:{spec['tag']}) {status}")
+        return status
+
+    def _report(self, job_id: int, status: str, result: dict, attempts: int = 5):
+        for attempt in range(attempts):
+            try:
+                response = self.post(f"/jobs/{job_id}/result", json={"status": status, "result": result})
+                if response.status_code != 409:
+                    response.raise_for_status()
+                return
+            except httpx.HTTPError as e:
+                print(f"Warning: Could not report job {job_id} (attempt {attempt + 1}): {e}")
+                time.sleep(min(2 ** attempt, 30))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default=os.environ.get("AUTODEPLOYHUB_API_URL", "http://localhost:8000"))
+    parser.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--capacity", type=int, default=1, help="builds to run at once")
+    parser.add_argument("--token", default=settings.BUILD_WORKER_TOKEN)
+    parser.add_argument("--cache-dir", help="git mirrors and BuildKit cache (default: GIT_CACHE_DIR, BUILDKIT_CACHE_DIR)")
+    args = parser.parse_args()
+
+    git = docker = None
+    if args.cache_dir:
+        git = GitService(base_path=str(Path(args.cache_dir) / "git"))
+        docker = DockerService(cache_dir=str(Path(args.cache_dir) / "buildkit-cache"))
+    agent = WorkerAgent(args.api, args.name, capacity=args.capacity, token=args.token, git=git, docker=docker)
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        agent.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Compares two load.py result files, e.g. from the previous and the current
+commit. Exits non-zero when throughput drops or p50/p99 latency grows by more
+than --threshold percent.
+
+    cd backend && python -m benchmarks.compare main.json branch.json --threshold 10
+
+For the pytest benchmarks use pytest-benchmark's own comparison:
+python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:15%
+"""
+import argparse
+import json
+import sys
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """
+    Lines describing each metric; regressions beyond threshold start with "REGRESSION".
+    """
+    metrics = [
+        ("requests_per_second", baseline["requests_per_second"], current["requests_per_second"], True),
+        ("p50 ms", baseline["latency_ms"]["p50"], current["latency_ms"]["p50"], False),
+        ("p99 ms", baseline["latency_ms"]["p99"], current["latency_ms"]["p99"], False),
+    ]
+    lines = []
+    for name, before, after, higher_is_better in metrics:
+        change = 100.0 * (after - before) / before if before else 0.0
+        worse = -change if higher_is_better else change
+        prefix = "REGRESSION " if worse > threshold else ""
+        lines.append(f"{prefix}{name}: {before} -> {after} ({change:+.1f}%)")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline.get("scenario") != current.get("scenario"):
+        sys.exit(f"Different scenarios: {baseline.get('scenario')} vs {current.get('scenario')}")
+
+    print(f"{current['scenario']}: {baseline.get('commit')} -> {current.get('commit')}")
+    lines = compare(baseline, current, args.threshold)
+    print("\n".join(lines))
+    if any(line.startswith("REGRESSION") for line in lines):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
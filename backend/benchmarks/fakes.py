@@ -0,0 +1,59 @@
+"""
+Stand-ins for git, docker and the Kubernetes API with the same call surface,
+so the pipeline's own overhead (database, logs, bookkeeping) is what is measured.
+"""
+import hashlib
+import time
+from pathlib import Path
+from app.services.rollout import RolloutResult
+
+class FakeGit:
+    def __init__(self, root: Path, files: int = 50):
+        self.checkout = Path(root) / "checkout"
+        self.checkout.mkdir(parents=True, exist_ok=True)
+        (self.checkout / "Dockerfile").write_text("FROM python:3.11-slim\nCOPY . .\n")
+        for i in range(files):
+            (self.checkout / f"module_{i}.py").write_text(f"VALUE = {i}\n" * 50)
+
+    def clone_repo(self, repo_url, project_name, branch="main", commit_hash=None, sparse_paths=None):
+        return self.checkout
+
+    def release(self, path):
+        pass
+
+class FakeDocker:
+    def __init__(self, steps: int = 40, build_seconds: float = 0.0):
+        self.steps = steps
+        self.build_seconds = build_seconds
+
+    def build_image(self, project_path, image_name, tag="latest", on_output=None, dockerfile="Dockerfile",
+                    build_args=None, target=None):
+        lines = []
+        for i in range(1, self.steps + 1):
+            lines += [f"#{i} [{i}/{self.steps}] RUN step {i}\n", f"#{i} {'CACHED' if i % 2 else 'DONE 0.1s'}\n"]
+        for line in lines:
+            if on_output is not None:
+                on_output(line)
+        if self.build_seconds:
+            time.sleep(self.build_seconds)
+        return f"{image_name}:{tag}", "".join(lines)
+
+    def get_image_id(self, image_name):
+        return "sha256:" + hashlib.sha256(image_name.encode()).hexdigest()
+
+    def tag_image(self, source, target):
+        return True
+
+class FakeK8s:
+    def deploy_project(self, project_name, image_name, container_port=8000):
+        return True
+
+    def update_image(self, project_name, image_name):
+        return True
+
+class FakeRolloutTracker:
+    def wait_for_rollouts(self, rollouts, namespace=None, timeout=None):
+        return [RolloutResult(name, True, 0.0) for name, _ in rollouts]
+
+    def wait_for_rollout(self, name, image=None, namespace=None, timeout=None):
+        return RolloutResult(name, True, 0.0)
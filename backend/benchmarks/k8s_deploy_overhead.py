@@ -0,0 +1,46 @@
+"""
+Per-deploy client-side overhead of K8sService, before and after caching the
+compiled manifest template and sharing one ApiClient.
+
+No cluster is needed: API calls are not made, this measures only what
+deploy_project does before the first request goes out.
+
+    cd backend && python -m benchmarks.k8s_deploy_overhead
+"""
+import os
+import timeit
+from pathlib import Path
+from jinja2 import Template
+from kubernetes import client
+from app.services.k8s import k8s_service
+
+TEMPLATE_PATH = Path(__file__).parent.parent / "app" / "templates" / "k8s_deployment.yaml.j2"
+RENDER_ARGS = {"project_name": "bench", "image_name": "autodeployhub/bench:abc1234", "container_port": 8000}
+
+def before():
+    # Re-read and re-compile the template, write and remove the temp manifest, new clients
+    with open(TEMPLATE_PATH) as f:
+        template = Template(f.read())
+    manifest_yaml = template.render(**RENDER_ARGS)
+    temp_manifest = Path("/tmp/bench-manifest.yaml")
+    with open(temp_manifest, "w") as f:
+        f.write(manifest_yaml)
+    api_client = client.ApiClient()
+    client.AppsV1Api(api_client)
+    client.CoreV1Api(api_client)
+    os.remove(temp_manifest)
+
+def after():
+    k8s_service.templates.get_template("k8s_deployment.yaml.j2").render(**RENDER_ARGS)
+    k8s_service.api(client.AppsV1Api)
+    k8s_service.api(client.CoreV1Api)
+
+def main(number: int = 500):
+    # Warm up: the first call compiles the template and creates the shared client
+    after()
+    for name, func in (("before", before), ("after", after)):
+        seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+        print(f"{name:>6}: {seconds * 1e6:8.1f} us per deploy")
+
+if __name__ == "__main__":
+    main()
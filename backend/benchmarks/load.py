@@ -0,0 +1,124 @@
+"""
+HTTP load driver for a running AutoDeployHub instance. Simulated users each
+send requests back to back for the duration; latencies and throughput are
+printed and optionally written as JSON for compare.py.
+
+    cd backend && python -m benchmarks.load --url http://localhost:8000 \\
+        --scenario webhook --repo https://github.com/acme/api --users 50 --duration 30 --json webhook.json
+
+Scenarios: webhook (signed push deliveries, needs --repo of a registered
+project and the server's GITHUB_WEBHOOK_SECRET), dashboard and history
+(need the server's SECRET_KEY to mint a session), health.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import platform
+import subprocess
+import time
+import uuid
+from datetime import datetime, timezone
+import httpx
+from jose import jwt
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def webhook_request(args):
+    body = json.dumps({
+        "ref": f"refs/heads/{args.branch}", "after": uuid.uuid4().hex,
+        "repository": {"clone_url": args.repo}
+    }).encode()
+    headers = {"X-GitHub-Event": "push", "X-GitHub-Delivery": str(uuid.uuid4()), "Content-Type": "application/json"}
+    if args.webhook_secret:
+        headers["X-Hub-Signature-256"] = "sha256=" + hmac.new(args.webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+    return "POST", "/webhooks/github", {"content": body, "headers": headers}
+
+SCENARIOS = {
+    "webhook": webhook_request,
+    "dashboard": lambda args: ("GET", "/dashboard", {}),
+    "history": lambda args: ("GET", f"/projects/{args.project_id}/deployments", {}),
+    "health": lambda args: ("GET", "/health", {}),
+}
+
+async def user(http: httpx.AsyncClient, args, deadline: float, latencies: list[float], errors: dict):
+    make_request = SCENARIOS[args.scenario]
+    while time.monotonic() < deadline:
+        method, path, options = make_request(args)
+        started = time.perf_counter()
+        try:
+            response = await http.request(method, path, **options)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        latencies.append(time.perf_counter() - started)
+        if not isinstance(status, int) or status >= 400:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+async def run(args) -> dict:
+    cookies = {}
+    if args.secret_key:
+        token = jwt.encode({"sub": "loadtest"}, args.secret_key, algorithm="HS256")
+        cookies["access_token"] = f"Bearer {token}"
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    async with httpx.AsyncClient(base_url=args.url, cookies=cookies, limits=limits, timeout=30) as http:
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*[user(http, args, deadline, latencies, errors) for _ in range(args.users)])
+        elapsed = time.monotonic() - started
+
+    ordered = sorted(latencies)
+    return {
+        "scenario": args.scenario,
+        "users": args.users,
+        "duration_seconds": round(elapsed, 2),
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(1000 * sum(ordered) / len(ordered), 2) if ordered else 0.0,
+            "p50": round(1000 * percentile(ordered, 0.50), 2),
+            "p90": round(1000 * percentile(ordered, 0.90), 2),
+            "p99": round(1000 * percentile(ordered, 0.99), 2),
+            "max": round(1000 * ordered[-1], 2) if ordered else 0.0,
+        },
+    }
+
+def _commit() -> str | None:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="health")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--repo", help="clone URL of a registered project (webhook)")
+    parser.add_argument("--branch", default="main")
+    parser.add_argument("--project-id", type=int, default=1, help="project for the history scenario")
+    parser.add_argument("--webhook-secret", default=os.environ.get("GITHUB_WEBHOOK_SECRET"))
+    parser.add_argument("--secret-key", default=os.environ.get("SECRET_KEY"))
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    if args.scenario == "webhook" and not args.repo:
+        parser.error("--repo is required for the webhook scenario")
+
+    results = asyncio.run(run(args))
+    results.update({"url": args.url, "commit": _commit(), "python": platform.python_version(),
+                    "finished_at": datetime.now(timezone.utc).isoformat()})
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
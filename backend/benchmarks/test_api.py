@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import time
+import uuid
+from unittest.mock import patch
+import httpx
+from app.main import app
+
+SECRET = "bench-secret"
+
+def _signed_push(project_number: int, delivery_id: str):
+    body = json.dumps({
+        "ref": "refs/heads/main", "after": uuid.uuid4().hex,
+        "repository": {"clone_url": f"https://github.com/bench/repo-{project_number}.git"}
+    }).encode()
+    signature = "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+    headers = {"X-GitHub-Event": "push", "X-GitHub-Delivery": delivery_id, "X-Hub-Signature-256": signature,
+               "Content-Type": "application/json"}
+    return body, headers
+
+def test_webhook_push_latency(benchmark, client):
+    counter = itertools.count()
+
+    def push():
+        n = next(counter)
+        body, headers = _signed_push(n % 20 + 1, f"bench-{uuid.uuid4()}")
+        return client.post("/webhooks/github", content=body, headers=headers)
+
+    with patch("app.api.webhooks.settings.GITHUB_WEBHOOK_SECRET", SECRET):
+        response = benchmark(push)
+    assert response.status_code == 202
+
+def test_webhook_ingestion_throughput(benchmark, client):
+    """
+    Concurrent deliveries through the ASGI app, as GitHub sends them during a burst of pushes.
+    """
+    deliveries = 200
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            requests = [_signed_push(i % 20 + 1, f"bench-{uuid.uuid4()}") for i in range(deliveries)]
+            responses = await asyncio.gather(*[
+                http.post("/webhooks/github", content=body, headers=headers) for body, headers in requests
+            ])
+        return [response.status_code for response in responses]
+
+    # One loop for every round, like a server process
+    loop = asyncio.new_event_loop()
+
+    def run():
+        started = time.perf_counter()
+        statuses = loop.run_until_complete(burst())
+        return statuses, time.perf_counter() - started
+
+    try:
+        with patch("app.api.webhooks.settings.GITHUB_WEBHOOK_SECRET", SECRET):
+            statuses, seconds = benchmark.pedantic(run, rounds=5, iterations=1)
+    finally:
+        loop.close()
+    assert statuses.count(202) == deliveries
+    benchmark.extra_info["deliveries_per_second"] = round(deliveries / seconds, 1)
+
+def test_duplicate_delivery_latency(benchmark, client):
+    body, headers = _signed_push(1, f"bench-{uuid.uuid4()}")
+    with patch("app.api.webhooks.settings.GITHUB_WEBHOOK_SECRET", SECRET):
+        assert client.post("/webhooks/github", content=body, headers=headers).status_code == 202
+        response = benchmark(client.post, "/webhooks/github", content=body, headers=headers)
+    assert response.json()["message"] == "Duplicate delivery"
+
+def test_dashboard_render(benchmark, client):
+    response = benchmark(client.get, "/dashboard")
+    assert response.status_code == 200
+
+def test_project_detail_render(benchmark, client):
+    response = benchmark(client.get, "/project/1")
+    assert response.status_code == 200
+
+def test_deployment_history_page(benchmark, client):
+    first = client.get("/projects/1/deployments").json()
+    # A page deep in the history costs the same as the first with keyset pagination
+    cursor = first["next_cursor"]
+    for _ in range(10):
+        cursor = client.get("/projects/1/deployments", params={"before": cursor}).json()["next_cursor"]
+
+    response = benchmark(client.get, "/projects/1/deployments", params={"before": cursor})
+    assert response.status_code == 200 and len(response.json()["items"]) > 0
@@ -0,0 +1,42 @@
+import time
+from starlette.requests import Request
+from jose import jwt
+from app.api.auth import get_current_user
+from app.core.config import settings
+from app.services.sessions import SessionTokens
+
+def _token(sub="bench"):
+    return jwt.encode({"sub": sub, "exp": int(time.time()) + 3600}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def _request(token: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/dashboard",
+                    "headers": [(b"cookie", f"access_token=Bearer {token}".encode())]})
+
+def test_verify_token_cached(benchmark, session_factory):
+    tokens = SessionTokens(session_factory=session_factory, revocation_ttl=3600)
+    token = _token()
+    tokens.verify(token)
+    assert benchmark(tokens.verify, token) == "bench"
+
+def test_verify_token_uncached(benchmark, session_factory):
+    """
+    Baseline: signature check and claim parsing on every call, as before the cache.
+    """
+    tokens = SessionTokens(size=0, session_factory=session_factory, revocation_ttl=3600)
+    assert benchmark(tokens.verify, _token()) == "bench"
+
+def test_get_current_user(benchmark, client):
+    """
+    The whole dependency as routes run it: cookie parsing plus the shared token cache.
+    """
+    request = _request(_token())
+    assert benchmark(get_current_user, request) == "bench"
+
+def test_authenticated_request(benchmark, client):
+    # The smallest route behind get_current_user; compare with test_health_request
+    response = benchmark(client.get, "/admin/images/gc")
+    assert response.status_code == 200
+
+def test_health_request(benchmark, client):
+    response = benchmark(client.get, "/health")
+    assert response.status_code == 200
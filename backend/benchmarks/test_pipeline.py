@@ -0,0 +1,125 @@
+import threading
+import time
+import uuid
+from unittest.mock import patch
+import pytest
+from app.models.deployment import Deployment
+from app.models.project import Project
+from app.services.logs import LogStore, DeploymentLogWriter
+from app.services.orchestrator import orchestrator
+from app.services.queue import DeploymentQueue, run_deployment_job
+from benchmarks.fakes import FakeGit, FakeDocker, FakeK8s, FakeRolloutTracker
+
+@pytest.fixture
+def log_store(session_factory, seeded):
+    return LogStore(session_factory=session_factory)
+
+@pytest.fixture
+def pipeline(tmp_path, log_store):
+    with patch.multiple("app.services.orchestrator", git_service=FakeGit(tmp_path), docker_service=FakeDocker(),
+                        k8s_service=FakeK8s(), rollout_tracker=FakeRolloutTracker(), log_store=log_store), \
+         patch("app.services.orchestrator.settings.BUILD_CACHE_ENABLED", False):
+        yield
+
+def _pending(db, project_id=1):
+    deployment = Deployment(project_id=project_id, commit_hash=uuid.uuid4().hex, status="pending", logs="")
+    db.add(deployment)
+    db.commit()
+    return deployment
+
+def test_run_deployment(benchmark, pipeline, session_factory):
+    """
+    One deployment through every stage, with git, docker and Kubernetes faked.
+    """
+    db = session_factory()
+    project = db.get(Project, 1)
+
+    def setup():
+        return (db, project, _pending(db)), {}
+
+    deployment = benchmark.pedantic(orchestrator.run_deployment, setup=setup, rounds=30)
+    assert deployment.status == "success"
+    db.close()
+
+def test_queue_throughput(benchmark, pipeline, session_factory):
+    """
+    Deployments per second through the queue and its workers, across projects.
+    """
+    deployments = 40
+    db = session_factory()
+
+    def run():
+        ids = [(_pending(db, project_id=i % 10 + 1).id, i % 10 + 1) for i in range(deployments)]
+        done = threading.Semaphore(0)
+
+        def runner(deployment_id, cancel_event=None):
+            try:
+                return run_deployment_job(deployment_id, cancel_event)
+            finally:
+                done.release()
+
+        queue = DeploymentQueue(runner=runner, max_workers=4, mode="thread", per_project_limit=1,
+                                debounce_seconds=0)
+        started = time.perf_counter()
+        queue.start()
+        for deployment_id, project_id in ids:
+            queue.enqueue(deployment_id, project_id)
+        for _ in ids:
+            done.acquire()
+        seconds = time.perf_counter() - started
+        queue.shutdown()
+        return seconds
+
+    with patch("app.services.queue.SessionLocal", session_factory):
+        seconds = benchmark.pedantic(run, rounds=3, iterations=1)
+    benchmark.extra_info["deployments_per_second"] = round(deployments / seconds, 1)
+    db.close()
+
+def test_log_append(benchmark, log_store, session_factory):
+    """
+    Cost of persisting one flushed log chunk.
+    """
+    db = session_factory()
+    deployment_id = _pending(db).id
+    db.close()
+    chunk = "#12 [builder 5/9] RUN pip install -r requirements.txt\n" * 150  # ~8 KiB, one flush
+    state = {"seq": 0, "offset": 0}
+
+    def append():
+        log_store.append(deployment_id, state["seq"], state["offset"], chunk)
+        state["seq"] += 1
+        state["offset"] += len(chunk.encode())
+
+    benchmark(append)
+
+def test_log_writer_lines(benchmark, log_store, session_factory):
+    """
+    10k build output lines through a DeploymentLogWriter, including its batched flushes.
+    """
+    db = session_factory()
+    lines = [f"#{i} [builder 3/9] RUN step output line {i}\n" for i in range(10_000)]
+
+    def write():
+        writer = DeploymentLogWriter(_pending(db).id, store=log_store)
+        for line in lines:
+            writer.write(line)
+        return writer.close()
+
+    text = benchmark.pedantic(write, rounds=5, iterations=1)
+    assert text.count("\n") == len(lines)
+    db.close()
+
+def test_log_consolidate(benchmark, log_store, session_factory):
+    """
+    Folding a finished deployment's chunks into its compressed archive.
+    """
+    db = session_factory()
+    text = "".join(f"#{i} [builder 3/9] RUN step output line {i}\n" for i in range(10_000))
+
+    def setup():
+        deployment = _pending(db)
+        log_store.append(deployment.id, 0, 0, text)
+        return (db, deployment), {}
+
+    benchmark.pedantic(log_store.consolidate, setup=setup, rounds=10)
+    db.close()
@@ -1,6 +1,17 @@
+import asyncio
 import pytest
+from unittest.mock import AsyncMock, patch
 from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.config import settings
+from app.db.session import Base, get_async_db, get_db
 from app.main import app
+from app.models.project import Project
+from app.services.image_inventory import image_inventory
 
 client = TestClient(app)
 
@@ -18,3 +29,68 @@ def test_login_redirect():
     # Test that /auth/login redirects to github
     response = client.get("/auth/login", follow_redirects=False)
     assert response.status_code == 307 or response.status_code == 200 # Depending on if GITHUB_CLIENT_ID is set
+
+def test_dashboard_pages_render():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with session_factory() as db:
+            db.add(Project(id=1, name="demo", github_url="https://github.com/test/demo", branch="main"))
+            await db.commit()
+
+    async def override():
+        async with session_factory() as db:
+            yield db
+
+    asyncio.run(setup())
+    app.dependency_overrides[get_async_db] = override
+    token = jwt.encode({"sub": "tester"}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    try:
+        with patch.object(image_inventory, "list_images", AsyncMock(return_value=[])):
+            pages = TestClient(app, cookies={"access_token": f"Bearer {token}"})
+            assert pages.get("/dashboard").status_code == 200
+            response = pages.get("/project/1")
+            assert response.status_code == 200 and "demo" in response.text
+    finally:
+        app.dependency_overrides.clear()
+        asyncio.run(engine.dispose())
+
+@pytest.mark.parametrize("targets", [
+    [{"name": "API"}],
+    [{"name": "web_app"}],
+    [{"name": "-api"}],
+    [{"name": "a" * 64}],
+    [{"name": "api"}, {"name": "web"}, {"name": "api"}],
+])
+def test_invalid_build_target_names_are_rejected(targets):
+    response = client.post("/projects/", json={"name": "demo", "github_url": "https://github.com/test/demo",
+                                               "build_targets": targets})
+    assert response.status_code == 422
+    assert client.patch("/projects/1", json={"build_targets": targets}).status_code == 422
+
+def test_concurrent_project_create_returns_400():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    def override():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    body = {"name": "demo", "github_url": "https://github.com/test/demo"}
+    app.dependency_overrides[get_db] = override
+    try:
+        assert client.post("/projects/", json=body).status_code == 201
+        # The other request's insert landed after this one's existence check
+        with patch("app.api.projects.normalize_repo_url", return_value="github.com/test/not-yet"):
+            response = client.post("/projects/", json={**body, "github_url": "git@github.com:test/demo.git"})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Project with this GitHub URL already exists"
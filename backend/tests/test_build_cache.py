@@ -0,0 +1,86 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.session import Base
+from app.models.build_cache import BuildCacheEntry
+from app.models.project import Project
+from app.services.build_cache import BuildCache, DockerIgnore
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Project(id=1, name="demo", github_url="https://github.com/test/demo"))
+    session.commit()
+    yield session
+    session.close()
+
+def make_context(path):
+    (path / "src").mkdir()
+    (path / "src" / "main.py").write_text("print('hi')\n")
+    (path / "docs").mkdir()
+    (path / "docs" / "index.md").write_text("docs\n")
+    (path / "Dockerfile").write_text("FROM python:3.13-slim\nCOPY src /src\n")
+    return path
+
+def test_dockerignore_rules():
+    ignore = DockerIgnore(["# comment", "docs", "**/*.pyc", "!docs/keep.md", "/build/*.log"])
+    assert ignore.is_excluded("docs/index.md")
+    assert not ignore.is_excluded("docs/keep.md")
+    assert ignore.is_excluded("src/pkg/mod.pyc")
+    assert ignore.is_excluded("build/out.log")
+    assert not ignore.is_excluded("build/nested/out.log")
+    assert not ignore.is_excluded("src/main.py")
+
+def test_hash_context_ignores_dockerignored_changes(tmp_path):
+    cache = BuildCache()
+    context = make_context(tmp_path)
+    (context / ".dockerignore").write_text("docs\n")
+    before = cache.hash_context(context)
+
+    (context / "docs" / "index.md").write_text("docs changed\n")
+    assert cache.hash_context(context) == before
+
+    (context / "src" / "main.py").write_text("print('changed')\n")
+    assert cache.hash_context(context) != before
+
+def test_hash_context_includes_dockerfile_and_build_args(tmp_path):
+    cache = BuildCache()
+    context = make_context(tmp_path)
+    (context / ".dockerignore").write_text("Dockerfile\n")
+    base = cache.hash_context(context)
+
+    assert cache.hash_context(context, build_args={"MODE": "prod"}) != base
+    assert cache.hash_context(context, target="runtime") != base
+    (context / "Dockerfile").write_text("FROM python:3.12-slim\n")
+    assert cache.hash_context(context) != base
+
+def test_hash_context_skips_git_metadata(tmp_path):
+    cache = BuildCache()
+    context = make_context(tmp_path)
+    before = cache.hash_context(context)
+    (context / ".git").write_text("gitdir: /tmp/autodeployhub/mirrors/x.git/worktrees/abc\n")
+    assert cache.hash_context(context) == before
+
+def test_record_updates_the_row_a_concurrent_build_inserted(db):
+    cache = BuildCache()
+    db.add(BuildCacheEntry(context_hash="h" * 64, project_id=1, image_id="sha256:first",
+                           image_name="autodeployhub/demo:a", hits=3))
+    db.commit()
+
+    # The other build's insert landed between this one's lookup and insert
+    with patch.object(cache, "lookup", side_effect=[None, cache.lookup(db, "h" * 64)]) as lookup:
+        entry = cache.record(db, "h" * 64, 1, "sha256:second", "autodeployhub/demo:b")
+    assert lookup.call_count == 2
+
+    assert entry.image_id == "sha256:second" and entry.hits == 3
+    assert db.query(BuildCacheEntry).count() == 1
+
+def test_record_never_raises(db):
+    cache = BuildCache()
+    with patch.object(db, "commit", side_effect=Exception("database is locked")):
+        assert cache.record(db, "h" * 64, 1, "sha256:first", "autodeployhub/demo:a") is None
+    assert cache.record(db, "h" * 64, 1, "sha256:first", "autodeployhub/demo:a").image_id == "sha256:first"
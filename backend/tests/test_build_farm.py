@@ -0,0 +1,279 @@
+import threading
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.session import Base, get_db
+from app.main import app
+from app.models.deployment import Deployment
+from app.models.project import Project
+from app.models.build_worker import BuildJobLogChunk
+from app.services.build_farm import BuildFarm
+from app.services.known_good import KnownGoodImages
+from app.services.orchestrator import orchestrator
+from app.services.rollout import RolloutResult
+from app.worker import WorkerAgent
+
+TOKEN = "test-worker-token"
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A file database: the API and the orchestrator use it from different threads
+    engine = create_engine(f"sqlite:///{tmp_path / 'farm.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add_all([
+        Project(id=1, name="api", github_url="https://github.com/test/api", branch="main"),
+        Project(id=2, name="web", github_url="https://github.com/test/web", branch="main"),
+    ])
+    db.add_all([Deployment(id=1, project_id=1, commit_hash="a" * 40, status="building"),
+                Deployment(id=2, project_id=2, commit_hash="b" * 40, status="building")])
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+@pytest.fixture
+def farm():
+    return BuildFarm(worker_timeout=30, affinity_wait=15, poll_interval=0.01)
+
+def _spec(image_name="autodeployhub/api"):
+    return {"repo_url": "https://github.com/test/api", "branch": "main", "commit_hash": "a" * 40,
+            "project_name": "api", "sparse_paths": None, "context": ".", "dockerfile": "Dockerfile",
+            "build_args": {}, "target": None, "image_name": image_name, "tag": "aaaaaaa"}
+
+def _build_once(db, farm, worker, project_id=1, deployment_id=1):
+    job, = farm.submit(db, project_id, deployment_id, {"app": _spec()})
+    assert [claimed.id for claimed in farm.claim(db, worker, 1)] == [job.id]
+    assert farm.complete(db, worker, job.id, "succeeded", {"image_ref": "autodeployhub/api:aaaaaaa"})
+    return job
+
+def test_job_waits_for_the_worker_that_built_the_project_last(db, farm):
+    warm = farm.register(db, "warm", 1)
+    cold = farm.register(db, "cold", 1)
+    _build_once(db, farm, warm)
+
+    job, = farm.submit(db, 1, 1, {"app": _spec()})
+    assert job.preferred_worker_id == warm.id
+    assert farm.claim(db, cold, 1) == []
+    assert [claimed.id for claimed in farm.claim(db, warm, 1)] == [job.id]
+
+def test_other_workers_take_the_job_after_the_affinity_wait(db, farm):
+    warm = farm.register(db, "warm", 1)
+    cold = farm.register(db, "cold", 1)
+    _build_once(db, farm, warm)
+
+    job, = farm.submit(db, 1, 1, {"app": _spec()})
+    job.created_at = datetime.now(timezone.utc) - timedelta(seconds=20)
+    db.commit()
+    assert [claimed.id for claimed in farm.claim(db, cold, 1)] == [job.id]
+
+def test_jobs_of_other_projects_go_to_any_worker(db, farm):
+    warm = farm.register(db, "warm", 1)
+    cold = farm.register(db, "cold", 2)
+    _build_once(db, farm, warm)
+
+    preferred, = farm.submit(db, 1, 1, {"app": _spec()})
+    other, = farm.submit(db, 2, 2, {"app": _spec("autodeployhub/web")})
+    assert other.preferred_worker_id is None
+    # Skips the job waiting for "warm" and takes the next one
+    assert [claimed.id for claimed in farm.claim(db, cold, 2)] == [other.id]
+
+def test_gone_worker_loses_its_preference_and_its_running_jobs(db, farm):
+    warm = farm.register(db, "warm", 1)
+    cold = farm.register(db, "cold", 1)
+    _build_once(db, farm, warm)
+    running, = farm.submit(db, 1, 1, {"app": _spec()})
+    farm.claim(db, warm, 1)
+
+    warm.last_heartbeat_at = datetime.now(timezone.utc) - timedelta(seconds=60)
+    db.commit()
+    # The claim requeues warm's job and, warm being gone, hands it out right away
+    assert [claimed.id for claimed in farm.claim(db, cold, 1)] == [running.id]
+    db.refresh(running)
+    assert running.worker_id == cold.id
+    assert "requeued" in "".join(chunk.content for chunk in db.query(BuildJobLogChunk).filter_by(job_id=running.id))
+    assert farm.complete(db, warm, running.id, "succeeded", {}) is False
+
+def test_reregistering_worker_requeues_its_jobs(db, farm):
+    worker = farm.register(db, "w1", 2)
+    job, = farm.submit(db, 1, 1, {"app": _spec()})
+    farm.claim(db, worker, 2)
+
+    again = farm.register(db, "w1", 2)
+    assert again.id == worker.id
+    db.refresh(job)
+    assert job.status == "queued" and job.worker_id is None
+
+def test_cancel_drops_queued_and_flags_running_jobs(db, farm):
+    worker = farm.register(db, "w1", 1)
+    first, second = farm.submit(db, 1, 1, {"one": _spec(), "two": _spec()})
+    farm.claim(db, worker, 1)
+
+    farm.cancel(db, [first, second])
+    assert farm.heartbeat(db, worker, 1) == [first.id]
+    assert farm.append_log(db, worker, first.id, "step\n") is True
+    db.refresh(second)
+    assert second.status == "cancelled"
+    farm.complete(db, worker, first.id, "failed", {"error": "Cancelled"})
+    db.refresh(first)
+    assert first.status == "cancelled"
+
+def test_wait_forwards_only_output_not_seen_yet(db, farm):
+    worker = farm.register(db, "w1", 1)
+    job, = farm.submit(db, 1, 1, {"app": _spec()})
+    farm.claim(db, worker, 1)
+    farm.append_log(db, worker, job.id, "#1 building\n")
+    farm.append_log(db, worker, job.id, "#2 caf\u00e9\n")
+    received = []
+
+    def on_log(job, text):
+        received.append(text)
+        if len(received) == 1:
+            farm.append_log(db, worker, job.id, "#3 DONE\n")
+            farm.complete(db, worker, job.id, "succeeded", {})
+
+    farm.wait(db, [job], on_log, lambda: None, timeout=5)
+    assert received == ["#1 building\n#2 caf\u00e9\n", "#3 DONE\n"]
+    assert [(chunk.start_offset, chunk.end_offset) for chunk in
+            db.query(BuildJobLogChunk).filter_by(job_id=job.id).order_by(BuildJobLogChunk.start_offset)] == [
+        (0, 12), (12, 21), (21, 29)
+    ]
+
+def test_worker_endpoints(session_factory):
+    def override():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override
+    try:
+        with patch("app.api.workers.settings.BUILD_WORKER_TOKEN", TOKEN):
+            client = TestClient(app)
+            assert client.post("/workers/register", json={"name": "w1"}).status_code == 401
+
+            client.headers["Authorization"] = f"Bearer {TOKEN}"
+            worker_id = client.post("/workers/register", json={"name": "w1", "capacity": 2}).json()["id"]
+            db = session_factory()
+            job_id = BuildFarm().submit(db, 1, 1, {"app": _spec()})[0].id
+            db.close()
+
+            jobs = client.post(f"/workers/{worker_id}/claim", params={"slots": 2}).json()["jobs"]
+            assert [claimed["id"] for claimed in jobs] == [job_id] and jobs[0]["spec"]["tag"] == "aaaaaaa"
+            assert client.post(f"/workers/{worker_id}/jobs/{job_id}/log", json={"text": "#1 DONE\n"}).json() == {"cancel": False}
+            assert client.post(f"/workers/{worker_id}/heartbeat", json={"active_jobs": 1}).json() == {"cancel": []}
+            result = client.post(f"/workers/{worker_id}/jobs/{job_id}/result",
+                                 json={"status": "succeeded", "result": {"image_id": "sha256:1"}})
+            assert result.status_code == 200
+            # Already finished
+            again = client.post(f"/workers/{worker_id}/jobs/{job_id}/result", json={"status": "succeeded"})
+            assert again.status_code == 409
+            assert client.post("/workers/99/heartbeat", json={}).status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+
+def test_worker_reports_a_failed_build_cancelled_meanwhile():
+    git = MagicMock()
+    git.clone_repo.return_value = "/tmp/checkout"
+    docker = MagicMock()
+    agent = WorkerAgent("http://testserver", "agent-1", git=git, docker=docker,
+                        registry=MagicMock(enabled=False), http=MagicMock())
+    agent.worker_id = 7
+
+    def build_image(*args, **kwargs):
+        agent._active[3].set()
+        raise Exception("no space left on device")
+    docker.build_image.side_effect = build_image
+
+    assert agent.run_job({"id": 3, "spec": _spec()}) == "failed"
+    report = agent.http.post.call_args
+    assert report.args[0] == "/workers/7/jobs/3/result"
+    assert report.kwargs["json"] == {"status": "failed", "result": {"error": "no space left on device"}}
+    git.release.assert_called_once_with("/tmp/checkout")
+
+def test_deployment_builds_on_worker_agent(session_factory, tmp_path):
+    """
+    The orchestrator queues the build; an agent talking to the API builds it.
+    """
+    def override():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    checkout = tmp_path / "checkout"
+    checkout.mkdir()
+    git = MagicMock()
+    git.clone_repo.return_value = checkout
+    docker = MagicMock()
+
+    def build_image(path, image_name, tag, on_output=None, **kwargs):
+        on_output("#5 [2/3] RUN pip install\n")
+        on_output("#5 DONE 1.0s\n")
+        return f"{image_name}:{tag}", "#5 [2/3] RUN pip install\n#5 DONE 1.0s\n"
+
+    docker.build_image.side_effect = build_image
+    docker.get_image_id.return_value = "sha256:built"
+    registry = MagicMock(enabled=False)
+    log_store = MagicMock()
+    log_store.consolidate.side_effect = lambda db, deployment, text=None: setattr(deployment, "logs", text)
+
+    app.dependency_overrides[get_db] = override
+    farm = BuildFarm(poll_interval=0.01)
+    try:
+        with patch("app.api.workers.settings.BUILD_WORKER_TOKEN", TOKEN), \
+             patch("app.services.orchestrator.settings.BUILD_FARM_ENABLED", True), \
+             patch("app.services.orchestrator.build_farm", farm), \
+             patch("app.services.orchestrator.log_store", log_store), \
+             patch("app.services.orchestrator.known_good", KnownGoodImages(size=5)), \
+             patch("app.services.orchestrator.k8s_service") as k8s, \
+             patch("app.services.orchestrator.git_service") as local_git, \
+             patch("app.services.orchestrator.rollout_tracker") as tracker:
+            k8s.deploy_project.return_value = True
+            tracker.wait_for_rollouts.side_effect = lambda rollouts, **kwargs: [
+                RolloutResult(name, True, 0.1) for name, _ in rollouts
+            ]
+            http = TestClient(app)
+            http.headers["Authorization"] = f"Bearer {TOKEN}"
+            agent = WorkerAgent("http://testserver", "agent-1", capacity=1, git=git, docker=docker,
+                                registry=registry, http=http)
+            agent.poll_seconds = 0.01
+            runner = threading.Thread(target=agent.run, daemon=True)
+
+            db = session_factory()
+            project = db.get(Project, 1)
+            deployment = db.get(Deployment, 1)
+            deployment.status = "pending"
+            db.commit()
+            runner.start()
+            try:
+                deployment = orchestrator.run_deployment(db, project, deployment)
+            finally:
+                agent.stop()
+                runner.join(timeout=10)
+
+            assert deployment.status == "success"
+            local_git.clone_repo.assert_not_called()
+            git.clone_repo.assert_called_once()
+            git.release.assert_called_once_with(checkout)
+            k8s.deploy_project.assert_called_once_with("api", "autodeployhub/api:aaaaaaa", container_port=8000)
+            assert "#5 DONE 1.0s" in deployment.logs
+            assert "on worker agent-1" in deployment.logs
+            result, = deployment.target_results
+            assert result["worker"] == "agent-1" and result["image_id"] == "sha256:built"
+            assert result["steps_rebuilt"] == 1
+            db.close()
+    finally:
+        app.dependency_overrides.clear()
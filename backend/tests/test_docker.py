@@ -0,0 +1,133 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from app.services.docker import DockerService, count_build_steps
+
+BUILDKIT_OUTPUT = """#0 building with "autodeployhub" instance using docker-container driver
+#1 [internal] load build definition from Dockerfile
+#1 DONE 0.0s
+#4 [builder 1/4] FROM docker.io/library/python:3.11-slim@sha256:abc
+#4 DONE 0.1s
+#5 [builder 2/4] COPY requirements.txt .
+#5 CACHED
+#6 [builder 3/4] RUN pip install -r requirements.txt
+#6 CACHED
+#7 [builder 4/4] COPY . .
+#7 DONE 0.2s
+#8 [stage-1 2/2] RUN python -m compileall .
+#8 0.512 Listing '.'...
+#8 DONE 1.3s
+#9 exporting to image
+#9 DONE 0.4s
+"""
+
+CLASSIC_OUTPUT = """Step 1/3 : FROM python:3.11-slim
+ ---> 0123456789ab
+Step 2/3 : RUN pip install flask
+ ---> Using cache
+ ---> 23456789abcd
+Step 3/3 : COPY . .
+ ---> 3456789abcde
+Successfully built 3456789abcde
+"""
+
+def test_count_build_steps_buildkit():
+    steps = count_build_steps(BUILDKIT_OUTPUT)
+    assert steps["cached"] == 2
+    assert steps["rebuilt"] == 2
+    assert steps["rebuilt_steps"] == ["COPY . .", "RUN python -m compileall ."]
+
+def test_count_build_steps_classic_builder():
+    steps = count_build_steps(CLASSIC_OUTPUT)
+    assert steps == {"cached": 1, "rebuilt": 1, "rebuilt_steps": ["COPY . ."]}
+
+def test_build_command_classic_unchanged():
+    command = DockerService()._build_command("autodeployhub/demo:abc1234", build_args={"A": "1"}, target="prod")
+    assert command == ["docker", "build", "-t", "autodeployhub/demo:abc1234",
+                       "--build-arg", "A=1", "--target", "prod", "."]
+
+def test_buildx_command_with_local_cache(tmp_path):
+    service = DockerService(cache_dir=str(tmp_path))
+    with patch("app.services.docker.settings") as settings:
+        settings.DOCKER_BUILDER = "buildx"
+        settings.BUILDX_BUILDER = "adh"
+        settings.BUILDKIT_CACHE = "local"
+
+        export = service._cache_export_dir("autodeployhub/demo")
+        command = service._build_command("autodeployhub/demo:abc1234", dockerfile="api/Dockerfile", target="prod",
+                                         cache_export=export)
+        # No cache to import yet on the first build
+        assert "--cache-from" not in command
+        assert command[:7] == ["docker", "buildx", "build", "--builder", "adh", "--progress=plain", "--load"]
+        assert command[command.index("--cache-to") + 1] == f"type=local,dest={export},mode=max"
+        assert export.name.startswith("autodeployhub_demo.new-")
+        assert command[-5:] == ["-f", "api/Dockerfile", "--target", "prod", "."]
+
+        # The build exports into its own directory, which then replaces the previous cache
+        export.mkdir()
+        service._rotate_local_cache("autodeployhub/demo", export)
+        assert (tmp_path / "autodeployhub_demo").is_dir()
+        assert not export.exists()
+
+        command = service._build_command("autodeployhub/demo:def5678")
+        assert command[command.index("--cache-from") + 1] == f"type=local,src={tmp_path}/autodeployhub_demo"
+
+def test_concurrent_builds_export_and_rotate_separately(tmp_path):
+    service = DockerService(cache_dir=str(tmp_path))
+    with patch("app.services.docker.settings") as settings:
+        settings.DOCKER_BUILDER = "buildx"
+        settings.BUILDKIT_CACHE = "local"
+
+        first, second = service._cache_export_dir("autodeployhub/demo"), service._cache_export_dir("autodeployhub/demo")
+        assert first != second
+        for export, blob in ((first, "one"), (second, "two")):
+            export.mkdir()
+            (export / "index.json").write_text(blob)
+
+        threads = [threading.Thread(target=service._rotate_local_cache, args=("autodeployhub/demo", export))
+                   for export in (first, second)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # One complete export won; nothing half-rotated or left behind
+    assert (tmp_path / "autodeployhub_demo" / "index.json").read_text() in ("one", "two")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["autodeployhub_demo", "autodeployhub_demo.lock"]
+
+def test_buildx_registry_cache():
+    with patch("app.services.docker.settings") as settings:
+        settings.BUILDKIT_CACHE = "registry"
+        settings.REGISTRY_URL = "localhost:5000/"
+        settings.REGISTRY_INSECURE = True
+        settings.REGISTRY_USERNAME = None
+
+        cache_from, cache_to = DockerService().cache_options("autodeployhub/demo-api")
+
+    ref = "localhost:5000/autodeployhub/demo-api:buildcache"
+    assert cache_from == [f"type=registry,ref={ref},registry.insecure=true"]
+    assert cache_to == [f"type=registry,ref={ref},mode=max,registry.insecure=true"]
+
+def test_login_once_with_password_on_stdin():
+    service = DockerService()
+    with patch("app.services.docker.subprocess.run") as run:
+        run.return_value.returncode = 0
+        service.login("ghcr.io", "acme-bot", "s3cret")
+        service.login("ghcr.io", "acme-bot", "s3cret")
+
+    run.assert_called_once()
+    args, kwargs = run.call_args
+    assert args[0] == ["docker", "login", "ghcr.io", "--username", "acme-bot", "--password-stdin"]
+    assert kwargs["input"] == "s3cret"
+
+def test_build_image_killed_after_build_timeout(tmp_path):
+    (tmp_path / "Dockerfile").write_text("FROM scratch\n")
+    service = DockerService()
+    with patch("app.services.docker.settings.DOCKER_BUILDER", "docker"), \
+         patch("app.services.docker.settings.DOCKER_BUILD_TIMEOUT_SECONDS", 0.2), \
+         patch.object(service, "_build_command", return_value=["sh", "-c", "echo step 1; exec sleep 30"]):
+        started = time.monotonic()
+        with pytest.raises(Exception, match="timed out after 0.2s"):
+            service.build_image(tmp_path, "autodeployhub/demo", "abc1234")
+    assert time.monotonic() - started < 10
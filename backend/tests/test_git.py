@@ -0,0 +1,115 @@
+import asyncio
+import shutil
+import subprocess
+import pytest
+from unittest.mock import patch
+from app.services.git import GitService
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+def git(cwd, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+@pytest.fixture
+def upstream(tmp_path):
+    repo = tmp_path / "upstream"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    (repo / "app").mkdir()
+    (repo / "app" / "Dockerfile").write_text("FROM scratch\n")
+    (repo / "docs").mkdir()
+    (repo / "docs" / "index.md").write_text("v1\n")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "first")
+    return repo
+
+def test_clone_repo_checks_out_requested_commit(tmp_path, upstream):
+    service = GitService(base_path=str(tmp_path / "cache"), max_cache_bytes=0)
+    first = git(upstream, "rev-parse", "HEAD")
+    (upstream / "docs" / "index.md").write_text("v2\n")
+    git(upstream, "commit", "-q", "-am", "second")
+
+    old = service.clone_repo(str(upstream), "demo", "main", commit_hash=first)
+    head = service.clone_repo(str(upstream), "demo", "main", commit_hash="manual")
+
+    assert (old / "docs" / "index.md").read_text() == "v1\n"
+    assert (head / "docs" / "index.md").read_text() == "v2\n"
+    assert len(list(service.mirrors_path.glob("*.git"))) == 1
+
+    service.release(old)
+    service.release(head)
+    assert not old.exists() and not head.exists()
+
+def test_clone_repo_reuses_mirror_for_known_commits(tmp_path, upstream):
+    service = GitService(base_path=str(tmp_path / "cache"), max_cache_bytes=0)
+    commit = git(upstream, "rev-parse", "HEAD")
+    service.release(service.clone_repo(str(upstream), "demo", "main", commit_hash=commit))
+
+    # The mirror already has the commit, so the upstream is not contacted again
+    shutil.rmtree(upstream)
+    path = service.clone_repo(str(upstream), "demo", "main", commit_hash=commit)
+    assert (path / "app" / "Dockerfile").exists()
+
+def test_clone_repo_sparse_checkout(tmp_path, upstream):
+    service = GitService(base_path=str(tmp_path / "cache"), max_cache_bytes=0)
+    path = service.clone_repo(str(upstream), "demo", "main", sparse_paths=["app"])
+    assert (path / "app" / "Dockerfile").exists()
+    assert not (path / "docs").exists()
+
+def test_evict_removes_least_recently_used_unpinned_mirrors(tmp_path, upstream):
+    service = GitService(base_path=str(tmp_path / "cache"), max_cache_bytes=0)
+    service.release(service.clone_repo(str(upstream), "old", "main"))
+    pinned = service.clone_repo(str(upstream), "new", "main")
+
+    service.max_cache_bytes = 1
+    service.evict()
+
+    mirrors = [p.name for p in service.mirrors_path.glob("*.git")]
+    assert len(mirrors) == 1 and mirrors[0].startswith("new-")
+    assert (pinned / "app" / "Dockerfile").exists()
+
+def test_clone_repo_async_matches_sync_checkout(tmp_path, upstream):
+    service = GitService(base_path=str(tmp_path / "cache"), max_cache_bytes=0)
+    commit = git(upstream, "rev-parse", "HEAD")
+
+    path = asyncio.run(service.clone_repo_async(str(upstream), "demo", "main", commit_hash=commit))
+    assert (path / "app" / "Dockerfile").exists()
+    assert git(path, "rev-parse", "HEAD") == commit
+
+    # Second checkout of the same commit is served from the mirror
+    again = asyncio.run(service.clone_repo_async(str(upstream), "demo", "main", commit_hash=commit))
+    assert again != path and (again / "docs" / "index.md").exists()
+
+def test_clone_repo_async_replaces_interrupted_mirror_and_sparse_checks_out(tmp_path, upstream):
+    service = GitService(base_path=str(tmp_path / "cache"), max_cache_bytes=0)
+    mirror = service.mirrors_path / f"{service._repo_key(str(upstream), 'demo')}.git"
+    (mirror / "objects").mkdir(parents=True)
+
+    path = asyncio.run(service.clone_repo_async(str(upstream), "demo", "main", sparse_paths=["app"]))
+    assert (mirror / "HEAD").exists()
+    assert (path / "app" / "Dockerfile").exists() and not (path / "docs").exists()
+
+def test_evict_keeps_mirrors_pinned_by_another_process(tmp_path, upstream):
+    base = str(tmp_path / "cache")
+    worker = GitService(base_path=base, max_cache_bytes=0)
+    # A second service has none of the worker's in-memory state, like another process
+    other = GitService(base_path=base, max_cache_bytes=1)
+    path = worker.clone_repo(str(upstream), "demo", "main")
+
+    other.evict()
+    assert len(list(other.mirrors_path.glob("*.git"))) == 1
+    assert (path / "app" / "Dockerfile").exists()
+
+    worker.release(path)
+    other.evict()
+    assert list(other.mirrors_path.glob("*.git")) == []
+
+def test_git_commands_time_out(tmp_path, upstream):
+    service = GitService(base_path=str(tmp_path / "cache"), max_cache_bytes=0)
+    with patch("app.services.git.subprocess.run",
+               side_effect=subprocess.TimeoutExpired(["git", "clone"], 600)):
+        with pytest.raises(Exception, match="Failed to clone repository: git timed out after 600s"):
+            service.clone_repo(str(upstream), "demo", "main")
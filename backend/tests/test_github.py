@@ -0,0 +1,183 @@
+import asyncio
+import socket
+import threading
+import time
+import pytest
+import uvicorn
+from unittest.mock import patch
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.deployment import Deployment
+from app.models.project import Project
+from app.services.commit_status import CommitStatusReporter
+from app.services.github import GitHubClient, GitHubError, repo_path
+
+SHA = "c" * 40
+
+class MockGitHub:
+    """
+    A local stand-in for api.github.com and the OAuth endpoints of github.com.
+    """
+    def __init__(self):
+        self.app = FastAPI()
+        self.requests: list[tuple[str, str, dict]] = []
+        self.statuses: list[dict] = []
+        self.rate_limited = 0  # requests to answer with 429 first
+        self.remaining = 4999
+        app = self.app
+
+        @app.middleware("http")
+        async def record(request: Request, call_next):
+            self.requests.append((request.method, request.url.path, dict(request.headers)))
+            if self.rate_limited:
+                self.rate_limited -= 1
+                return Response(status_code=429, headers={"Retry-After": "0"})
+            response = await call_next(request)
+            response.headers["X-RateLimit-Limit"] = "5000"
+            response.headers["X-RateLimit-Remaining"] = str(self.remaining)
+            response.headers["X-RateLimit-Reset"] = str(int(time.time()) + 3600)
+            return response
+
+        @app.post("/login/oauth/access_token")
+        async def access_token(code: str):
+            return {"access_token": f"gho_{code}"} if code == "good" else {"error": "bad_verification_code"}
+
+        @app.get("/user")
+        async def user(request: Request):
+            if request.headers.get("If-None-Match") == '"user-v1"':
+                return Response(status_code=304)
+            login = request.headers["Authorization"].removeprefix("Bearer gho_")
+            return Response(content=f'{{"login": "{login}-user"}}', media_type="application/json",
+                            headers={"ETag": '"user-v1"'})
+
+        @app.post("/repos/{owner}/{repo}/statuses/{sha}")
+        async def create_status(owner: str, repo: str, sha: str, request: Request):
+            body = await request.json()
+            self.statuses.append({"repo": f"{owner}/{repo}", "sha": sha, **body})
+            return body
+
+        @app.get("/repos/{owner}/{repo}/commits/{sha}")
+        async def forbidden_commit(owner: str, repo: str, sha: str):
+            return Response(content='{"message": "Resource not accessible"}', status_code=403,
+                            media_type="application/json")
+
+@pytest.fixture(scope="module")
+def mock_github():
+    mock = MockGitHub()
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(mock.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    mock.url = f"http://127.0.0.1:{port}"
+    yield mock
+    server.should_exit = True
+    thread.join(timeout=5)
+
+@pytest.fixture
+def github(mock_github):
+    mock_github.requests.clear()
+    mock_github.statuses.clear()
+    mock_github.remaining = 4999
+    return GitHubClient(api_url=mock_github.url, web_url=mock_github.url, max_wait=5)
+
+def test_repo_path():
+    assert repo_path("https://github.com/Acme/API.git") == "acme/api"
+    assert repo_path("git@github.com:acme/api.git") == "acme/api"
+    assert repo_path("https://github.com/acme") is None
+
+def test_etag_cache_answers_not_modified(github, mock_github):
+    async def run():
+        try:
+            first = await github.get_user("gho_alice")
+            second = await github.get_user("gho_alice")
+        finally:
+            await github.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == {"login": "alice-user"}
+    (_, _, initial), (_, _, conditional) = mock_github.requests
+    assert "if-none-match" not in initial and conditional["if-none-match"] == '"user-v1"'
+
+def test_rate_limit_headers_tracked_and_429_retried(github, mock_github):
+    mock_github.rate_limited = 1
+
+    async def run():
+        try:
+            return await github.get_user("gho_bob")
+        finally:
+            await github.close()
+
+    assert asyncio.run(run()) == {"login": "bob-user"}
+    assert len(mock_github.requests) == 2
+    limit = github.rate_limit("gho_bob")
+    assert limit.limit == 5000 and limit.remaining == 4999
+
+def test_exhausted_budget_fails_without_a_request(github, mock_github):
+    mock_github.remaining = 0
+
+    async def run():
+        try:
+            await github.get_user("gho_carol")
+            await github.get_user("gho_carol")
+        finally:
+            await github.close()
+
+    # Resets in an hour, longer than max_wait
+    with pytest.raises(GitHubError) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 429
+    assert len(mock_github.requests) == 1
+
+def test_plain_403_is_not_retried(github, mock_github):
+    async def run():
+        try:
+            await github.get_commit("acme/api", SHA, token="gho_dave")
+        finally:
+            await github.close()
+
+    with pytest.raises(GitHubError) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 403 and "Resource not accessible" in str(error.value)
+    assert len(mock_github.requests) == 1
+
+def test_reporter_posts_deployment_states_in_order(github, mock_github):
+    reporter = CommitStatusReporter(client=github, token="ghp_status", context="autodeployhub/deploy")
+    project = Project(id=7, name="api", github_url="https://github.com/acme/api.git", branch="main")
+    try:
+        for status in ("building", "deploying", "success"):
+            reporter.report(project, Deployment(id=1, commit_hash=SHA, status=status))
+        reporter.report(project, Deployment(id=2, commit_hash="manual", status="success"))
+        with patch("app.services.commit_status.settings.PUBLIC_URL", "https://deploy.example.com"):
+            reporter.report(project, Deployment(id=3, commit_hash=SHA, status="failed"))
+        assert reporter.flush()
+    finally:
+        reporter.stop()
+
+    assert [status["state"] for status in mock_github.statuses] == ["pending", "pending", "success", "failure"]
+    assert {status["repo"] for status in mock_github.statuses} == {"acme/api"}
+    assert mock_github.statuses[0]["context"] == "autodeployhub/deploy"
+    assert mock_github.statuses[-1]["target_url"] == "https://deploy.example.com/project/7"
+    assert all(headers["authorization"] == "Bearer ghp_status" for _, _, headers in mock_github.requests)
+
+def test_reporter_disabled_without_token(github, mock_github):
+    reporter = CommitStatusReporter(client=github, token="")
+    reporter.report(Project(id=1, name="api", github_url="https://github.com/acme/api"),
+                    Deployment(id=1, commit_hash=SHA, status="success"))
+    assert reporter._thread is None and mock_github.requests == []
+
+def test_oauth_callback_uses_shared_client(github, mock_github):
+    with patch("app.api.auth.github_client", github):
+        client = TestClient(app)
+        response = client.get("/auth/callback", params={"code": "good"}, follow_redirects=False)
+        assert response.status_code == 307
+        assert response.cookies.get("access_token")
+        assert client.get("/auth/callback", params={"code": "bad"}).status_code == 400
+    assert [path for _, path, _ in mock_github.requests] == [
+        "/login/oauth/access_token", "/user", "/login/oauth/access_token"
+    ]
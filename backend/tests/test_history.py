@@ -0,0 +1,61 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.session import Base, get_db
+from app.db.pagination import deployment_history, split_page
+from app.main import app
+from app.models.project import Project
+from app.models.deployment import Deployment
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Project(id=1, name="demo", github_url="https://github.com/test/demo", branch="main"),
+        Project(id=2, name="other", github_url="https://github.com/test/other", branch="main")
+    ])
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i in range(25):
+        # Pairs of deployments share a timestamp to exercise the id tie-break
+        session.add(Deployment(project_id=1, commit_hash=f"c{i}", status="success", logs="x" * 1000,
+                               created_at=start + timedelta(minutes=i // 2)))
+    session.add(Deployment(project_id=2, commit_hash="o", status="success", created_at=start))
+    session.commit()
+    yield session
+    session.close()
+
+def test_keyset_pages_cover_history_once_newest_first(db):
+    seen = []
+    cursor = None
+    while True:
+        query = db.query(Deployment).filter(Deployment.project_id == 1)
+        items, cursor = split_page(deployment_history(query, cursor, limit=10).all(), 10)
+        seen += [d.id for d in items]
+        if cursor is None:
+            break
+    assert seen == sorted(seen, reverse=True) and len(seen) == 25
+
+def test_history_does_not_load_logs(db):
+    items, _ = split_page(deployment_history(db.query(Deployment), limit=5).all(), 5)
+    with pytest.raises(InvalidRequestError):
+        items[0].logs
+
+def test_project_deployments_endpoint(db):
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        first = client.get("/projects/1/deployments?limit=20").json()
+        second = client.get(f"/projects/1/deployments?limit=20&before={first['next_cursor']}").json()
+        assert len(first["items"]) == 20 and len(second["items"]) == 5
+        assert second["next_cursor"] is None
+        assert "logs" not in first["items"][0]
+        assert client.get("/projects/1/deployments?before=garbage").status_code == 400
+        assert client.get("/projects/99/deployments").status_code == 404
+    finally:
+        app.dependency_overrides.clear()
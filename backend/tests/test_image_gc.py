@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.session import Base
+from app.models.project import Project
+from app.models.deployment import Deployment
+from app.services.image_gc import ImageGarbageCollector, parse_created
+from app.services.known_good import KnownGoodImages
+from app.services.process import CommandResult
+
+NOW = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+OLD = "2026-01-01 10:00:00 +0000 UTC"
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+@pytest.fixture(autouse=True)
+def known_good():
+    # Releases cached by other tests' databases must not leak in
+    with patch("app.services.image_gc.known_good", KnownGoodImages(size=3)) as releases:
+        yield releases
+
+def _image(n, repository="autodeployhub/demo", created_at=OLD, size_bytes=1000):
+    return {"id": f"sha256:{n:064x}", "repository": repository, "tag": f"t{n}",
+            "created_at": created_at, "size_bytes": size_bytes}
+
+def _deploy(db, n, status="success", project_id=1, finished=True, image_name=None):
+    if db.get(Project, project_id) is None:
+        db.add(Project(id=project_id, name=f"p{project_id}", github_url=f"https://github.com/test/p{project_id}"))
+    deployment = Deployment(project_id=project_id, commit_hash=f"c{n}", status=status,
+                            image_id=f"sha256:{n:064x}" if image_name is None else None, image_name=image_name,
+                            finished_at=NOW if finished else None)
+    db.add(deployment)
+    db.commit()
+    return deployment
+
+def test_parse_created():
+    assert parse_created(OLD) == datetime(2026, 1, 1, 10, 0, tzinfo=timezone.utc)
+    assert parse_created("garbage") is None
+
+def test_keeps_last_successful_unfinished_and_rollback_images(db):
+    gc = ImageGarbageCollector()
+    for n in range(1, 6):
+        _deploy(db, n)
+    _deploy(db, 6, status="failed")
+    _deploy(db, 7, status="building", finished=False)
+    _deploy(db, 8, project_id=2)
+    # A rollback is recorded by image name only
+    _deploy(db, 9, project_id=2, image_name="autodeployhub/other:t20")
+
+    with patch("app.services.image_gc.settings") as settings:
+        settings.IMAGE_GC_KEEP_SUCCESSFUL = 2
+        settings.IMAGE_GC_MIN_AGE_SECONDS = 3600
+        ids, names = gc.protected_images(db)
+        images = [_image(n) for n in range(1, 10)] + [_image(20, "autodeployhub/other"), _image(21)]
+        images.append(_image(30, created_at=(NOW - timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M:%S +0000 UTC")))
+        delete = gc.plan(images, ids, names, now=NOW)
+
+    # Project 1 keeps 4 and 5, project 2 keeps its build 8 and the image it was rolled back to
+    assert sorted(int(image["id"][7:], 16) for image in delete) == [1, 2, 3, 6, 9, 21]
+
+def test_project_override_of_kept_count(db):
+    gc = ImageGarbageCollector()
+    for n in range(1, 4):
+        _deploy(db, n)
+    db.get(Project, 1).image_retention_count = 1
+    db.commit()
+
+    ids, _ = gc.protected_images(db)
+    assert ids == {f"sha256:{3:064x}"}
+
+def test_keeps_known_good_releases_beyond_the_retention_count(db):
+    gc = ImageGarbageCollector()
+    db.add(Project(id=1, name="demo", github_url="https://github.com/test/demo", image_retention_count=1))
+    for n in range(1, 6):
+        db.add(Deployment(project_id=1, commit_hash=f"c{n}", status="success", finished_at=NOW,
+                          image_id=f"sha256:{n:064x}", image_name=f"autodeployhub/demo:t{n}",
+                          target_results=[{"name": "app", "k8s_name": "demo", "image_name": f"autodeployhub/demo:t{n}"}]))
+    db.commit()
+
+    ids, names = gc.protected_images(db)
+    delete = gc.plan([_image(n) for n in range(1, 6)], ids, names, now=NOW)
+
+    # Only the last build is retained, but a rollback can still go back to the three known-good releases
+    assert sorted(int(image["id"][7:], 16) for image in delete) == [1, 2]
+
+def test_collect_deletes_in_batches_and_reports_reclaimed_bytes():
+    gc = ImageGarbageCollector()
+    images = [_image(n) for n in range(1, 6)]
+    listings = [images, [images[0], images[3]]]  # image 4 could not be deleted
+
+    with patch("app.services.image_gc.docker_service") as docker, \
+         patch("app.services.image_gc.settings") as settings, \
+         patch.object(gc, "_load_protected", return_value=({images[0]["id"]}, set())), \
+         patch.object(gc, "_forget_cached") as forget, \
+         patch("app.services.image_gc.image_inventory") as inventory:
+        settings.IMAGE_GC_BATCH_SIZE = 2
+        settings.IMAGE_GC_MIN_AGE_SECONDS = 0
+        docker.list_images_async = AsyncMock(side_effect=lambda name: listings.pop(0))
+        docker.delete_images_async = AsyncMock(return_value=CommandResult(0, "", ""))
+        docker.images_disk_usage_async = AsyncMock(side_effect=[10_000, 7_500])
+
+        report = asyncio.run(gc.collect())
+
+    assert [len(call.args[0]) for call in docker.delete_images_async.await_args_list] == [2, 2]
+    assert report.deleted == [images[1]["id"], images[2]["id"], images[4]["id"]]
+    assert report.failed == [images[3]["id"]]
+    assert report.kept == 1
+    assert report.reclaimed_bytes == 2500
+    forget.assert_called_once_with(report.deleted)
+    inventory.invalidate.assert_called_once()
+    assert gc.last_report is report
+
+def test_collect_dry_run_deletes_nothing():
+    gc = ImageGarbageCollector()
+    images = [_image(1), _image(2)]
+    with patch("app.services.image_gc.docker_service") as docker, \
+         patch.object(gc, "_load_protected", return_value=(set(), {"autodeployhub/demo:t1"})):
+        docker.list_images_async = AsyncMock(return_value=images)
+        docker.delete_images_async = AsyncMock()
+
+        report = asyncio.run(gc.collect(dry_run=True))
+
+    docker.delete_images_async.assert_not_awaited()
+    assert report.dry_run and report.deleted == [images[1]["id"]]
+    assert report.reclaimed_bytes == 1000
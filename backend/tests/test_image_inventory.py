@@ -0,0 +1,49 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+from app.services.docker import parse_size, docker_service
+from app.services.image_inventory import ImageInventory
+
+IMAGE = {"id": "sha256:" + "a" * 64, "repository": "autodeployhub/demo", "tag": "abc1234", "size": "12.5MB"}
+
+def test_parse_size():
+    assert parse_size("12.5MB") == 12_500_000
+    assert parse_size("950kB") == 950_000
+    assert parse_size("1.2GB") == 1_200_000_000
+    assert parse_size("0B") == 0
+    assert parse_size("n/a") is None
+
+def test_inventory_serves_from_memory_until_ttl_or_invalidation():
+    inventory = ImageInventory(ttl=60)
+    references = {IMAGE["id"]: [{"id": 7, "project_id": 1, "status": "success"}]}
+
+    async def run():
+        first = await inventory.list_images()
+        second = await inventory.list_images()
+        inventory.invalidate()
+        third = await inventory.list_images()
+        return first, second, third
+
+    with patch.object(docker_service, "list_images_async", AsyncMock(side_effect=lambda name: [dict(IMAGE)])) as list_images, \
+         patch.object(inventory, "_load_references", return_value=references):
+        first, second, third = asyncio.run(run())
+
+    assert list_images.await_count == 2
+    assert first is second
+    assert third[0]["deployments"] == [{"id": 7, "project_id": 1, "status": "success"}]
+
+def test_inventory_coalesces_concurrent_refreshes():
+    inventory = ImageInventory(ttl=60)
+
+    async def slow_list(name):
+        await asyncio.sleep(0.05)
+        return [dict(IMAGE)]
+
+    async def run():
+        return await asyncio.gather(*[inventory.list_images() for _ in range(10)])
+
+    with patch.object(docker_service, "list_images_async", AsyncMock(side_effect=slow_list)) as list_images, \
+         patch.object(inventory, "_load_references", return_value={}):
+        results = asyncio.run(run())
+
+    assert list_images.await_count == 1
+    assert all(result[0]["deployments"] == [] for result in results)
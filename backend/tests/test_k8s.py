@@ -0,0 +1,123 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from kubernetes.client.rest import ApiException
+from app.services.k8s import k8s_service, _is_subset
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    # The service caches its API objects; start each test without them
+    with patch.object(k8s_service, "_api_client", None), patch.object(k8s_service, "_apis", {}):
+        yield
+
+def _live(body: dict):
+    response = MagicMock()
+    response.data = json.dumps(body).encode()
+    return response
+
+def _rendered_live(image_name: str):
+    # What the API server returns: our fields plus defaults it filled in
+    deployment = {
+        "apiVersion": "apps/v1", "kind": "Deployment",
+        "metadata": {"name": "demo", "labels": {"app": "demo"}, "resourceVersion": "42", "uid": "x"},
+        "spec": {
+            "replicas": 1, "revisionHistoryLimit": 10,
+            "selector": {"matchLabels": {"app": "demo"}},
+            "template": {
+                "metadata": {"labels": {"app": "demo"}},
+                "spec": {"containers": [{
+                    "name": "demo", "image": image_name, "imagePullPolicy": "IfNotPresent",
+                    "ports": [{"containerPort": 8000, "protocol": "TCP"}]
+                }]}
+            }
+        },
+        "status": {"replicas": 1}
+    }
+    service = {
+        "apiVersion": "v1", "kind": "Service",
+        "metadata": {"name": "demo"},
+        "spec": {
+            "selector": {"app": "demo"}, "clusterIP": "10.0.0.1", "type": "ClusterIP",
+            "ports": [{"protocol": "TCP", "port": 80, "targetPort": 8000}]
+        }
+    }
+    return deployment, service
+
+def test_is_subset_ignores_server_defaults():
+    assert _is_subset({"a": {"b": [{"c": 1}]}}, {"a": {"b": [{"c": 1, "d": 2}]}, "e": 3})
+    assert not _is_subset({"a": {"b": [{"c": 1}]}}, {"a": {"b": [{"c": 2}]}})
+    assert not _is_subset({"a": [1, 2]}, {"a": [1]})
+
+def test_deploy_project_creates_missing_resources():
+    with patch("app.services.k8s.client") as mock_client:
+        apps, core = mock_client.AppsV1Api.return_value, mock_client.CoreV1Api.return_value
+        apps.read_namespaced_deployment.side_effect = ApiException(status=404)
+        core.read_namespaced_service.side_effect = ApiException(status=404)
+
+        assert k8s_service.deploy_project("demo", "autodeployhub/demo:abc1234") is True
+
+        kwargs = apps.patch_namespaced_deployment.call_args.kwargs
+        assert kwargs["_content_type"] == "application/apply-patch+yaml"
+        assert kwargs["field_manager"] == "autodeployhub" and kwargs["force"] is True
+        assert json.loads(kwargs["body"])["spec"]["template"]["spec"]["containers"][0]["image"] == "autodeployhub/demo:abc1234"
+        core.patch_namespaced_service.assert_called_once()
+
+def test_redeploy_patches_only_changed_resources():
+    deployment, service = _rendered_live("autodeployhub/demo:old0000")
+    with patch("app.services.k8s.client") as mock_client:
+        apps, core = mock_client.AppsV1Api.return_value, mock_client.CoreV1Api.return_value
+        apps.read_namespaced_deployment.return_value = _live(deployment)
+        core.read_namespaced_service.return_value = _live(service)
+
+        assert k8s_service.deploy_project("demo", "autodeployhub/demo:abc1234") is True
+
+        apps.patch_namespaced_deployment.assert_called_once()
+        core.patch_namespaced_service.assert_not_called()
+
+def test_redeploy_of_same_image_sends_nothing():
+    deployment, service = _rendered_live("autodeployhub/demo:abc1234")
+    with patch("app.services.k8s.client") as mock_client:
+        apps, core = mock_client.AppsV1Api.return_value, mock_client.CoreV1Api.return_value
+        apps.read_namespaced_deployment.return_value = _live(deployment)
+        core.read_namespaced_service.return_value = _live(service)
+
+        assert k8s_service.deploy_project("demo", "autodeployhub/demo:abc1234") is True
+
+        apps.patch_namespaced_deployment.assert_not_called()
+        core.patch_namespaced_service.assert_not_called()
+
+def test_deploy_project_reports_api_errors():
+    with patch("app.services.k8s.client") as mock_client:
+        mock_client.AppsV1Api.return_value.read_namespaced_deployment.side_effect = ApiException(status=403)
+
+        assert k8s_service.deploy_project("demo", "autodeployhub/demo:abc1234") is False
+
+def test_api_client_is_shared_across_deployments():
+    deployment, service = _rendered_live("autodeployhub/demo:abc1234")
+    with patch("app.services.k8s.client") as mock_client:
+        apps, core = mock_client.AppsV1Api.return_value, mock_client.CoreV1Api.return_value
+        apps.read_namespaced_deployment.return_value = _live(deployment)
+        core.read_namespaced_service.return_value = _live(service)
+
+        k8s_service.deploy_project("demo", "autodeployhub/demo:abc1234")
+        k8s_service.deploy_project("demo", "autodeployhub/demo:abc1234")
+        k8s_service.update_image("demo", "autodeployhub/demo:abc1234")
+
+        mock_client.ApiClient.assert_called_once()
+        mock_client.AppsV1Api.assert_called_once_with(mock_client.ApiClient.return_value)
+        mock_client.CoreV1Api.assert_called_once()
+
+def test_update_image_sends_one_image_only_patch():
+    with patch("app.services.k8s.client") as mock_client:
+        apps = mock_client.AppsV1Api.return_value
+
+        assert k8s_service.update_image("demo", "registry/autodeployhub/demo@sha256:abc") is True
+
+        apps.read_namespaced_deployment.assert_not_called()
+        apps.patch_namespaced_deployment.assert_called_once_with(
+            name="demo", namespace="default",
+            body={"spec": {"template": {"spec": {"containers": [
+                {"name": "demo", "image": "registry/autodeployhub/demo@sha256:abc"}
+            ]}}}},
+            _content_type="application/strategic-merge-patch+json"
+        )
@@ -0,0 +1,101 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.session import Base
+from app.models.project import Project
+from app.models.deployment import Deployment
+from app.services.known_good import KnownGoodImages, Release, release_images
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def _release(n):
+    return Release(n, f"c{n}", {"demo": f"autodeployhub/demo:c{n}"})
+
+def test_keeps_the_last_releases_and_walks_back_on_repeated_rollbacks():
+    releases = KnownGoodImages(size=3)
+    for n in (1, 2, 3, 4):
+        releases.record(1, _release(n))
+
+    assert [release.deployment_id for release in releases.releases(1)] == [4, 3, 2]
+    assert releases.get(1, 1) is None
+    assert releases.current(1).deployment_id == 4
+
+    assert releases.previous(1).deployment_id == 3
+    releases.set_current(1, 3)
+    assert releases.previous(1).deployment_id == 2
+    releases.set_current(1, 2)
+    assert releases.previous(1) is None
+    assert releases.previous(2) is None
+
+def test_release_images_of_legacy_and_multi_target_deployments():
+    project = Project(name="Demo")
+    legacy = Deployment(image_name="autodeployhub/Demo:abc1234")
+    assert release_images(project, legacy) == {"demo": "autodeployhub/Demo:abc1234"}
+
+    multi = Deployment(target_results=[
+        {"name": "api", "image_name": "autodeployhub/Demo-api:abc1234", "image_ref": "reg/autodeployhub/Demo-api@sha256:1"},
+        {"name": "web", "image_name": "autodeployhub/Demo-web:abc1234"},
+    ])
+    assert release_images(project, multi) == {
+        "demo-api": "reg/autodeployhub/Demo-api@sha256:1", "demo-web": "autodeployhub/Demo-web:abc1234"
+    }
+
+def test_warm_loads_recent_successes_and_follows_the_last_rollback(db):
+    db.add(Project(id=1, name="demo", github_url="https://github.com/test/demo"))
+    for n, status in ((1, "success"), (2, "success"), (3, "failed"), (4, "success")):
+        db.add(Deployment(id=n, project_id=1, commit_hash=f"c{n}", status=status,
+                          image_name=f"autodeployhub/demo:c{n}"))
+    db.add(Deployment(id=5, project_id=1, commit_hash="ROLLBACK-c2", status="success",
+                      image_name="autodeployhub/demo:c2"))
+    db.commit()
+
+    releases = KnownGoodImages(size=5)
+    releases.warm(db)
+
+    assert [release.deployment_id for release in releases.releases(1)] == [4, 2, 1]
+    assert releases.current(1) == Release(2, "c2", {"demo": "autodeployhub/demo:c2"})
+    assert releases.previous(1).deployment_id == 1
+
+def test_sync_picks_up_deployments_finished_in_another_process(db):
+    db.add(Project(id=1, name="demo", github_url="https://github.com/test/demo"))
+    db.add(Deployment(id=1, project_id=1, commit_hash="c1", status="success", image_name="autodeployhub/demo:c1"))
+    db.commit()
+    project = db.get(Project, 1)
+
+    releases = KnownGoodImages(size=5)
+    releases.warm(db)
+    assert releases.current(1).deployment_id == 1
+
+    # Finished by a deployment worker process; only the database knows
+    db.add(Deployment(id=2, project_id=1, commit_hash="c2", status="success", image_name="autodeployhub/demo:c2"))
+    db.commit()
+    releases.sync(db, project)
+    assert releases.current(1).deployment_id == 2
+    assert releases.previous(1).deployment_id == 1
+
+    # Then rolled back by another API server
+    db.add(Deployment(id=3, project_id=1, commit_hash="ROLLBACK-c1", status="success",
+                      image_name="autodeployhub/demo:c1"))
+    db.commit()
+    releases.sync(db, project)
+    assert releases.current(1).deployment_id == 1
+    assert releases.previous(1) is None
+
+def test_sync_skips_the_reload_when_nothing_changed(db):
+    db.add(Project(id=1, name="demo", github_url="https://github.com/test/demo"))
+    db.add(Deployment(id=1, project_id=1, commit_hash="c1", status="success", image_name="autodeployhub/demo:c1"))
+    db.commit()
+
+    releases = KnownGoodImages(size=5)
+    releases.record(1, _release(1))
+    with patch.object(releases, "_load") as load:
+        releases.sync(db, db.get(Project, 1))
+    load.assert_not_called()
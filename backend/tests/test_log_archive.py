@@ -0,0 +1,100 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.session import Base
+from app.models.project import Project
+from app.models.deployment import Deployment
+from app.services.log_archive import LogArchive
+from app.services.logs import LogStore
+
+LOG = "Step 1/3 : FROM python:3.12\n" * 200 + "héllo\n"
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def _deployment(db, project_id=1, finished_days_ago=1, logs=LOG):
+    if db.get(Project, project_id) is None:
+        db.add(Project(id=project_id, name=f"p{project_id}", github_url=f"https://github.com/test/p{project_id}"))
+    deployment = Deployment(project_id=project_id, commit_hash="abc", status="success", logs=logs,
+                            finished_at=datetime.now(timezone.utc) - timedelta(days=finished_days_ago))
+    db.add(deployment)
+    db.commit()
+    return deployment
+
+@pytest.mark.parametrize("codec", ["gzip", "zstd"])
+def test_store_compresses_in_row_and_loads_lazily(db, codec):
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    archive = LogArchive(codec=codec, storage="database")
+    deployment = _deployment(db)
+
+    archive.store(deployment, LOG)
+    db.commit()
+
+    assert deployment.logs is None and deployment.logs_codec == codec
+    assert len(deployment.logs_archive) < len(LOG) / 10
+    assert deployment.logs_size == len(LOG.encode())
+    assert archive.load(deployment) == LOG
+
+def test_file_tier_keeps_pointer_in_row(db, tmp_path):
+    archive = LogArchive(codec="gzip", storage="file", storage_dir=str(tmp_path))
+    deployment = _deployment(db)
+
+    archive.store(deployment, LOG)
+    db.commit()
+
+    assert deployment.logs_archive is None
+    assert deployment.logs_location == str(tmp_path / "1" / f"{deployment.id}.log.gz")
+    assert archive.load(deployment) == LOG
+
+    archive.expire(deployment)
+    assert not (tmp_path / "1" / f"{deployment.id}.log.gz").exists()
+    assert archive.load(deployment) == ""
+
+def test_reader_serves_offsets_from_archived_log(db):
+    store = LogStore(sessionmaker(bind=db.get_bind()), archive=LogArchive(codec="gzip", storage="database"))
+    deployment = _deployment(db, logs="")
+
+    store.consolidate(db, deployment, "first line\nsecond line\n")
+
+    text, next_offset, complete = store.read(db, deployment.id, len("first line\n"))
+    assert text == "second line\n" and complete
+    assert next_offset == len("first line\nsecond line\n")
+
+def test_backfill_archives_in_batches(db):
+    archive = LogArchive(codec="gzip", storage="database")
+    ids = [_deployment(db).id for _ in range(5)]
+    running = Deployment(project_id=1, commit_hash="abc", status="building", logs="partial")
+    db.add(running)
+    db.commit()
+    running_id = running.id
+
+    batches = []
+    assert archive.backfill(db, batch_size=2, on_batch=lambda done, last_id: batches.append(done)) == 5
+    assert batches == [2, 4, 5]
+
+    for deployment_id in ids:
+        assert archive.load(db.get(Deployment, deployment_id)) == LOG
+    assert db.get(Deployment, running_id).logs == "partial"
+
+def test_retention_uses_project_override(db, monkeypatch):
+    monkeypatch.setattr("app.services.log_archive.settings.LOG_RETENTION_DAYS", 30)
+    archive = LogArchive(codec="gzip", storage="database")
+    old = _deployment(db, project_id=1, finished_days_ago=40).id
+    recent = _deployment(db, project_id=1, finished_days_ago=5).id
+    db.get(Project, 1).log_retention_days = None
+    kept_longer = _deployment(db, project_id=2, finished_days_ago=40).id
+    db.get(Project, 2).log_retention_days = 90
+    db.commit()
+
+    assert archive.apply_retention(db) == 1
+    assert db.get(Deployment, old).logs_codec == "expired"
+    assert db.get(Deployment, recent).logs == LOG
+    assert db.get(Deployment, kept_longer).logs == LOG
@@ -0,0 +1,59 @@
+import asyncio
+import json
+import threading
+from unittest.mock import MagicMock, patch
+from app.api import deployments
+from app.services.log_broker import LogBroker
+
+def parse_events(chunks):
+    events = []
+    for chunk in chunks:
+        if chunk.startswith("event: complete"):
+            events.append("complete")
+        elif chunk.startswith("id: "):
+            events.append(json.loads(chunk.split("data: ", 1)[1]))
+    return events
+
+def test_stream_replays_then_follows_live_events():
+    broker = LogBroker()
+    request = MagicMock()
+
+    async def run():
+        broker.bind_loop(asyncio.get_running_loop())
+        stream = deployments._log_events(request, 42, 0)
+        chunks = [await stream.__anext__()]
+
+        def publish():
+            broker.publish(42, 0, 7, "héllo\n")  # already replayed
+            broker.publish(42, 7, 13, "world\n")
+            broker.finish(42)
+
+        threading.Thread(target=publish).start()
+        async for chunk in stream:
+            chunks.append(chunk)
+        return chunks
+
+    with patch.object(deployments, "log_broker", broker), \
+         patch.object(deployments, "_read_logs", side_effect=lambda deployment_id, offset: ("héllo\n", 7, False)):
+        chunks = asyncio.run(run())
+
+    assert parse_events(chunks) == [
+        {"offset": 7, "text": "héllo\n"},
+        {"offset": 13, "text": "world\n"},
+        "complete",
+    ]
+    assert not broker.has_subscribers(42)
+
+def test_stream_resumes_finished_deployment_from_offset():
+    broker = LogBroker()
+
+    async def run():
+        broker.bind_loop(asyncio.get_running_loop())
+        return [chunk async for chunk in deployments._log_events(MagicMock(), 7, 5)]
+
+    with patch.object(deployments, "log_broker", broker), \
+         patch.object(deployments, "_read_logs", return_value=("tail\n", 10, True)) as read_logs:
+        chunks = asyncio.run(run())
+
+    read_logs.assert_called_once_with(7, 5)
+    assert parse_events(chunks) == [{"offset": 10, "text": "tail\n"}, "complete"]
@@ -0,0 +1,66 @@
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.session import Base
+from app.models.project import Project
+from app.models.deployment import Deployment, DeploymentLogChunk
+from app.services.logs import LogStore, DeploymentLogWriter
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+@pytest.fixture
+def deployment(session_factory):
+    db = session_factory()
+    project = Project(name="demo", github_url="https://github.com/test/demo", branch="main")
+    db.add(project)
+    db.commit()
+    deployment = Deployment(project_id=project.id, commit_hash="abc", status="building", logs="")
+    db.add(deployment)
+    db.commit()
+    deployment_id = deployment.id
+    db.close()
+    return deployment_id
+
+def test_writer_batches_chunks_and_reader_resumes_from_offset(session_factory, deployment):
+    store = LogStore(session_factory)
+    writer = DeploymentLogWriter(deployment, store=store, flush_bytes=16, flush_interval=60)
+    writer.write("héllo\n")
+    writer.write("build step one\n")
+    writer.write("tail\n")
+    writer.flush()
+
+    db = session_factory()
+    assert db.query(DeploymentLogChunk).count() == 2
+
+    text, next_offset, complete = store.read(db, deployment, 0)
+    assert text == "héllo\nbuild step one\ntail\n"
+    assert next_offset == len(text.encode()) and not complete
+
+    middle = len("héllo\n".encode())
+    text, _, _ = store.read(db, deployment, middle)
+    assert text == "build step one\ntail\n"
+
+    text, offset, complete = store.read(db, deployment, next_offset)
+    assert text == "" and offset == next_offset and not complete
+
+def test_consolidate_keeps_offsets_stable(session_factory, deployment):
+    store = LogStore(session_factory)
+    writer = DeploymentLogWriter(deployment, store=store, flush_bytes=1, flush_interval=60)
+    writer.write("first line\n")
+    writer.write("second line\n")
+
+    db = session_factory()
+    row = db.query(Deployment).filter(Deployment.id == deployment).first()
+    row.finished_at = datetime.now(timezone.utc)
+    store.consolidate(db, row, writer.close())
+
+    assert db.query(DeploymentLogChunk).count() == 0
+    text, next_offset, complete = store.read(db, deployment, len("first line\n"))
+    assert text == "second line\n"
+    assert complete and next_offset == len("first line\nsecond line\n")
@@ -0,0 +1,31 @@
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from app.main import app
+from app.services.metrics import StageTimer
+
+def test_stage_timer_records_consecutive_stages():
+    before = REGISTRY.get_sample_value("autodeployhub_deploy_stage_seconds_count", {"stage": "clone"}) or 0
+    stages = StageTimer()
+    stages.start("clone")
+    stages.start("build")
+    stages.stop()
+    stages.stop()
+
+    assert list(stages.timings) == ["clone", "build"]
+    assert REGISTRY.get_sample_value("autodeployhub_deploy_stage_seconds_count", {"stage": "clone"}) == before + 1
+
+def test_metrics_endpoint_reports_route_latency_and_queue_depth():
+    client = TestClient(app)
+    client.get("/health")
+    client.get("/deployments/1/logs")
+    client.get("/admin/images/gc")
+    client.get("/no/such/page")
+
+    body = client.get("/metrics").text
+    assert 'autodeployhub_http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+    # Routes are labelled by template, not by the concrete path
+    assert 'route="/deployments/{deployment_id}/logs",status="401"' in body
+    assert 'route="/admin/images/gc",status="401"' in body
+    assert 'route="unmatched",status="404"' in body
+    assert "autodeployhub_deploy_queue_depth" in body
+    assert "autodeployhub_db_pool_connections" in body
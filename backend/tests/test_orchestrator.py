@@ -1,14 +1,64 @@
+import threading
 import pytest
 from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.session import Base
 from app.services.orchestrator import orchestrator
 from app.models.project import Project
 from app.models.deployment import Deployment
+from app.services.rollout import RolloutResult
+from app.services.known_good import KnownGoodImages, Release
+
+@pytest.fixture(autouse=True)
+def mock_log_store():
+    with patch("app.services.orchestrator.log_store") as store:
+        def consolidate(db, deployment, text=None):
+            deployment.logs = text
+            db.commit()
+        store.consolidate.side_effect = consolidate
+        yield store
+
+@pytest.fixture(autouse=True)
+def mock_rollout_tracker():
+    with patch("app.services.orchestrator.rollout_tracker") as tracker:
+        tracker.wait_for_rollouts.side_effect = lambda rollouts, **kwargs: [
+            RolloutResult(name, True, 0.5) for name, _ in rollouts
+        ]
+        tracker.wait_for_rollout.side_effect = lambda name, image=None, **kwargs: RolloutResult(name, True, 0.5)
+        yield tracker
+
+@pytest.fixture(autouse=True)
+def known_good():
+    with patch("app.services.orchestrator.known_good", KnownGoodImages(size=5)) as releases:
+        yield releases
 
 @pytest.fixture
 def mock_db():
     db = MagicMock()
     return db
 
+@pytest.fixture
+def rollback_db():
+    # Rollbacks are finished by a background thread with its own session
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    session = factory()
+    session.add(Project(id=1, name="test-project", github_url="https://github.com/test/repo", branch="main"))
+    session.commit()
+    with patch("app.services.orchestrator.SessionLocal", factory):
+        yield session
+    session.close()
+
+def _finished(db, deployment):
+    for thread in threading.enumerate():
+        if thread.name == f"rollback-{deployment.id}":
+            thread.join(5)
+    db.expire_all()
+    return db.get(Deployment, deployment.id)
+
 @pytest.fixture
 def mock_project():
     project = Project(
@@ -22,24 +72,73 @@ def mock_project():
 def test_trigger_deployment_success(mock_db, mock_project):
     with patch("app.services.orchestrator.git_service") as mock_git, \
          patch("app.services.orchestrator.docker_service") as mock_docker, \
-         patch("app.services.orchestrator.k8s_service") as mock_k8s:
+         patch("app.services.orchestrator.k8s_service") as mock_k8s, \
+         patch("app.services.orchestrator.build_cache") as mock_cache:
         
         mock_git.clone_repo.return_value = "/tmp/test-project"
+        mock_cache.lookup.return_value = None
         mock_docker.build_image.return_value = ("test-image:latest", "Build logs...")
         mock_k8s.deploy_project.return_value = True
         
         deployment = orchestrator.trigger_deployment(mock_db, mock_project, "abc12345")
         
         assert deployment.status == "success"
-        assert "Cloning repository" in deployment.logs
+        assert "Checking out repository" in deployment.logs
         assert "--- DOCKER BUILD LOGS ---" in deployment.logs
         assert "Kubernetes deployment/update applied successfully" in deployment.logs
         
+        assert set(deployment.stage_timings) == {"clone", "build", "apply", "ready", "total"}
+
         # Verify calls
         mock_git.clone_repo.assert_called_once()
         mock_docker.build_image.assert_called_once()
         mock_k8s.deploy_project.assert_called_once()
 
+def test_trigger_deployment_pushes_and_deploys_by_digest(mock_db, mock_project, mock_rollout_tracker):
+    digest_ref = "localhost:5000/autodeployhub/test-project@sha256:" + "a" * 64
+    with patch("app.services.orchestrator.git_service") as mock_git, \
+         patch("app.services.orchestrator.docker_service") as mock_docker, \
+         patch("app.services.orchestrator.k8s_service") as mock_k8s, \
+         patch("app.services.orchestrator.build_cache") as mock_cache, \
+         patch("app.services.orchestrator.registry_service") as mock_registry:
+
+        mock_git.clone_repo.return_value = "/tmp/test-project"
+        mock_cache.lookup.return_value = None
+        mock_docker.build_image.return_value = ("autodeployhub/test-project:abc1234", "Build logs...")
+        mock_k8s.deploy_project.return_value = True
+        mock_registry.enabled = True
+        mock_registry.push.return_value = digest_ref
+
+        deployment = orchestrator.trigger_deployment(mock_db, mock_project, "abc12345")
+
+        assert deployment.status == "success"
+        assert deployment.image_digest == digest_ref
+        assert deployment.target_results[0]["image_ref"] == digest_ref
+        assert "push" in deployment.stage_timings
+        mock_registry.push.assert_called_once()
+        assert mock_registry.push.call_args.args[0] == "autodeployhub/test-project:abc1234"
+        mock_k8s.deploy_project.assert_called_once_with("test-project", digest_ref, container_port=8000)
+        assert mock_rollout_tracker.wait_for_rollouts.call_args.args[0] == [("test-project", digest_ref)]
+
+def test_trigger_deployment_reports_cached_and_rebuilt_steps(mock_db, mock_project):
+    output = "#5 [2/3] RUN pip install -r requirements.txt\n#5 CACHED\n#6 [3/3] COPY . .\n#6 DONE 0.1s\n"
+    with patch("app.services.orchestrator.git_service") as mock_git, \
+         patch("app.services.orchestrator.docker_service") as mock_docker, \
+         patch("app.services.orchestrator.k8s_service") as mock_k8s, \
+         patch("app.services.orchestrator.build_cache") as mock_cache:
+
+        mock_git.clone_repo.return_value = "/tmp/test-project"
+        mock_cache.lookup.return_value = None
+        mock_docker.build_image.return_value = ("autodeployhub/test-project:abc1234", output)
+        mock_k8s.deploy_project.return_value = True
+
+        deployment = orchestrator.trigger_deployment(mock_db, mock_project, "abc12345")
+
+        assert "Build steps: 1 cached, 1 rebuilt." in deployment.logs
+        assert "rebuilt: COPY . ." in deployment.logs
+        assert deployment.target_results[0]["steps_cached"] == 1
+        assert deployment.target_results[0]["steps_rebuilt"] == 1
+
 def test_trigger_deployment_failure(mock_db, mock_project):
     with patch("app.services.orchestrator.git_service") as mock_git:
         mock_git.clone_repo.side_effect = Exception("Clone failed")
@@ -49,7 +148,7 @@ def test_trigger_deployment_failure(mock_db, mock_project):
         assert deployment.status == "failed"
         assert "FATAL ERROR: Clone failed" in deployment.logs
 
-def test_rollback_success(mock_db, mock_project):
+def test_rollback_success(rollback_db, mock_project):
     mock_target_deployment = Deployment(
         id=10,
         project_id=1,
@@ -60,9 +159,235 @@ def test_rollback_success(mock_db, mock_project):
     with patch("app.services.orchestrator.k8s_service") as mock_k8s:
         mock_k8s.update_image.return_value = True
         
-        deployment = orchestrator.rollback(mock_db, mock_project, mock_target_deployment)
+        deployment = _finished(rollback_db, orchestrator.rollback(rollback_db, mock_project, mock_target_deployment))
         
         assert deployment.status == "success"
         assert "ROLLBACK-targetc" in deployment.commit_hash
         assert "Successfully patched Kubernetes deployment" in deployment.logs
         mock_k8s.update_image.assert_called_once_with("test-project", "autodeployhub/test-project:targetc")
+
+def test_rollback_returns_before_the_rollout_is_ready(rollback_db, mock_project, mock_rollout_tracker, known_good):
+    known_good.record(1, Release(5, "aaa1111", {"test-project": "autodeployhub/test-project:aaa1111"}))
+    ready = threading.Event()
+
+    def wait_for_rollouts(rollouts, **kwargs):
+        ready.wait(5)
+        return [RolloutResult(name, False, 5.0, "progress deadline exceeded") for name, _ in rollouts]
+    mock_rollout_tracker.wait_for_rollouts.side_effect = wait_for_rollouts
+
+    with patch("app.services.orchestrator.k8s_service") as mock_k8s:
+        mock_k8s.update_image.return_value = True
+        deployment = orchestrator.rollback_to_release(rollback_db, mock_project, known_good.get(1, 5))
+
+        assert deployment.status == "deploying" and deployment.heartbeat_at is not None
+        ready.set()
+        deployment = _finished(rollback_db, deployment)
+
+    assert deployment.status == "failed" and deployment.finished_at is not None
+    assert deployment.target_results[0]["status"] == "not_ready"
+    assert "did not become ready: progress deadline exceeded" in deployment.logs
+    assert known_good.current(1).deployment_id == 5
+
+def test_rollback_patches_recorded_digests_of_every_target(rollback_db, mock_project, mock_rollout_tracker):
+    digest = "localhost:5000/autodeployhub/test-project-api@sha256:" + "b" * 64
+    target = Deployment(id=11, project_id=1, commit_hash="abc1234ffff", status="success", target_results=[
+        {"name": "api", "k8s_name": "test-project-api", "image_name": "autodeployhub/test-project-api:abc1234",
+         "image_ref": digest},
+        {"name": "web", "k8s_name": "test-project-web", "image_name": "autodeployhub/test-project-web:abc1234"},
+    ])
+
+    with patch("app.services.orchestrator.k8s_service") as mock_k8s:
+        mock_k8s.update_image.return_value = True
+
+        deployment = _finished(rollback_db, orchestrator.rollback(rollback_db, mock_project, target))
+
+    assert deployment.status == "success"
+    assert [c.args for c in mock_k8s.update_image.call_args_list] == [
+        ("test-project-api", digest), ("test-project-web", "autodeployhub/test-project-web:abc1234")
+    ]
+    assert mock_rollout_tracker.wait_for_rollouts.call_args.args[0] == [
+        ("test-project-api", digest), ("test-project-web", "autodeployhub/test-project-web:abc1234")
+    ]
+    assert deployment.image_digest == digest
+    assert [result["status"] for result in deployment.target_results] == ["ready", "ready"]
+
+def test_rollback_uses_known_good_release_and_moves_current(rollback_db, mock_project, known_good):
+    known_good.record(1, Release(5, "aaa1111", {"test-project": "autodeployhub/test-project:manual-5"}))
+    known_good.record(1, Release(8, "bbb2222", {"test-project": "autodeployhub/test-project:bbb2222"}))
+    target = Deployment(id=5, project_id=1, commit_hash="aaa1111", status="success")
+
+    with patch("app.services.orchestrator.k8s_service") as mock_k8s:
+        mock_k8s.update_image.return_value = True
+        deployment = _finished(rollback_db, orchestrator.rollback(rollback_db, mock_project, target))
+
+    assert deployment.status == "success"
+    mock_k8s.update_image.assert_called_once_with("test-project", "autodeployhub/test-project:manual-5")
+    assert known_good.current(1).deployment_id == 5
+
+def test_successful_deployment_becomes_known_good(mock_db, mock_project, known_good):
+    with patch("app.services.orchestrator.git_service") as mock_git, \
+         patch("app.services.orchestrator.docker_service") as mock_docker, \
+         patch("app.services.orchestrator.k8s_service") as mock_k8s, \
+         patch("app.services.orchestrator.build_cache") as mock_cache:
+        mock_git.clone_repo.return_value = "/tmp/test-project"
+        mock_cache.lookup.return_value = None
+        mock_docker.build_image.return_value = ("autodeployhub/test-project:abc1234", "")
+        mock_k8s.deploy_project.return_value = True
+
+        deployment = Deployment(id=21, project_id=1, commit_hash="abc12345", status="pending")
+        orchestrator.run_deployment(mock_db, mock_project, deployment)
+
+    assert known_good.current(1) == Release(21, "abc12345", {"test-project": "autodeployhub/test-project:abc1234"})
+    assert deployment.target_results[0]["k8s_name"] == "test-project"
+
+def test_run_deployment_cancelled_after_clone(mock_db, mock_project):
+    cancel_event = threading.Event()
+    cancel_event.set()
+    deployment = Deployment(id=2, project_id=1, commit_hash="abc12345", status="pending", logs="")
+
+    with patch("app.services.orchestrator.git_service"), \
+         patch("app.services.orchestrator.docker_service") as mock_docker:
+        deployment = orchestrator.run_deployment(mock_db, mock_project, deployment, cancel_event=cancel_event)
+
+        assert deployment.status == "cancelled"
+        assert "superseded by a newer push" in deployment.logs
+        mock_docker.build_image.assert_not_called()
+
+def test_trigger_deployment_build_cache_hit(mock_db, mock_project):
+    with patch("app.services.orchestrator.git_service") as mock_git, \
+         patch("app.services.orchestrator.docker_service") as mock_docker, \
+         patch("app.services.orchestrator.k8s_service") as mock_k8s, \
+         patch("app.services.orchestrator.build_cache") as mock_cache:
+
+        mock_cache.hash_context.return_value = "f" * 64
+        mock_cache.lookup.return_value = MagicMock(image_id="sha256:" + "a" * 64)
+        mock_docker.tag_image.return_value = True
+        mock_k8s.deploy_project.return_value = True
+
+        deployment = orchestrator.trigger_deployment(mock_db, mock_project, "abc12345")
+
+        assert deployment.status == "success"
+        assert "Build cache HIT" in deployment.logs
+        mock_docker.build_image.assert_not_called()
+        mock_docker.tag_image.assert_called_once_with("sha256:" + "a" * 64, "autodeployhub/test-project:abc1234")
+        mock_k8s.deploy_project.assert_called_once_with("test-project", "autodeployhub/test-project:abc1234", container_port=8000)
+
+def test_trigger_deployment_streams_build_output(mock_db, mock_project, mock_log_store):
+    def build_image(project_path, image_name, tag, on_output=None, **kwargs):
+        on_output("Step 1/2 : FROM python\n")
+        on_output("Step 2/2 : COPY . .\n")
+        return f"{image_name}:{tag}", ""
+
+    with patch("app.services.orchestrator.git_service"), \
+         patch("app.services.orchestrator.docker_service") as mock_docker, \
+         patch("app.services.orchestrator.k8s_service") as mock_k8s, \
+         patch("app.services.orchestrator.build_cache") as mock_cache:
+        mock_cache.lookup.return_value = None
+        mock_docker.build_image.side_effect = build_image
+        mock_k8s.deploy_project.return_value = True
+
+        deployment = orchestrator.trigger_deployment(mock_db, mock_project, "abc12345")
+
+    chunks = [call.args for call in mock_log_store.append.call_args_list]
+    streamed = "".join(content for _, _, _, content in chunks)
+    assert "Step 2/2 : COPY . .\n" in streamed
+    assert streamed == deployment.logs
+    # Offsets are contiguous byte positions and sequence numbers increase by one
+    offset = 0
+    for seq, (_, chunk_seq, start_offset, content) in enumerate(chunks):
+        assert chunk_seq == seq and start_offset == offset
+        offset += len(content.encode())
+
+def _multi_target_project():
+    return Project(
+        id=3,
+        name="shop",
+        github_url="https://github.com/test/shop",
+        branch="main",
+        build_targets=[
+            {"name": "api", "context": "services/api", "port": 8080},
+            {"name": "web", "context": "services/web", "dockerfile": "Dockerfile.prod"}
+        ]
+    )
+
+def test_multi_target_builds_run_concurrently(mock_db, tmp_path):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def build_image(project_path, image_name, tag, on_output=None, **kwargs):
+        # Both builds must be in flight at the same time to get past the barrier
+        barrier.wait()
+        on_output("Step 1/1 : FROM python\n")
+        return f"{image_name}:{tag}", ""
+
+    with patch("app.services.orchestrator.git_service") as mock_git, \
+         patch("app.services.orchestrator.docker_service") as mock_docker, \
+         patch("app.services.orchestrator.k8s_service") as mock_k8s, \
+         patch("app.services.orchestrator.build_cache") as mock_cache:
+        mock_git.clone_repo.return_value = tmp_path
+        mock_cache.lookup.return_value = None
+        mock_docker.build_image.side_effect = build_image
+        mock_docker.get_image_id.side_effect = lambda name: f"sha256:{name}"
+        mock_k8s.deploy_project.return_value = True
+
+        deployment = orchestrator.trigger_deployment(mock_db, _multi_target_project(), "abc12345")
+
+        assert deployment.status == "success"
+        assert mock_git.clone_repo.call_args.kwargs["sparse_paths"] == ["services/api", "services/web"]
+        assert "[web] Step 1/1 : FROM python" in deployment.logs
+        web_build = [c for c in mock_docker.build_image.call_args_list if c.args[1] == "autodeployhub/shop-web"][0]
+        assert web_build.kwargs["dockerfile"] == "Dockerfile.prod"
+        mock_k8s.deploy_project.assert_any_call("shop-api", "autodeployhub/shop-api:abc1234", container_port=8080)
+        mock_k8s.deploy_project.assert_any_call("shop-web", "autodeployhub/shop-web:abc1234", container_port=8000)
+        assert [r["status"] for r in deployment.target_results] == ["ready", "ready"]
+        assert deployment.image_name == "autodeployhub/shop-api:abc1234"
+
+def test_multi_target_failure_stops_other_builds(mock_db, tmp_path):
+    api_started = threading.Event()
+
+    def build_image(project_path, image_name, tag, on_output=None, **kwargs):
+        if image_name.endswith("-api"):
+            api_started.set()
+            while True:
+                on_output("still building\n")
+        api_started.wait(5)
+        raise Exception("web: npm install failed")
+
+    with patch("app.services.orchestrator.git_service") as mock_git, \
+         patch("app.services.orchestrator.docker_service") as mock_docker, \
+         patch("app.services.orchestrator.k8s_service") as mock_k8s, \
+         patch("app.services.orchestrator.build_cache") as mock_cache:
+        mock_git.clone_repo.return_value = tmp_path
+        mock_cache.lookup.return_value = None
+        mock_docker.build_image.side_effect = build_image
+
+        deployment = orchestrator.trigger_deployment(mock_db, _multi_target_project(), "abc12345")
+
+        assert deployment.status == "failed"
+        assert "FATAL ERROR: web: npm install failed" in deployment.logs
+        assert {r["name"]: r["status"] for r in deployment.target_results} == {"api": "aborted", "web": "failed"}
+        mock_k8s.deploy_project.assert_not_called()
+
+def test_deployment_fails_when_rollout_not_ready(mock_db, mock_project, mock_rollout_tracker):
+    mock_rollout_tracker.wait_for_rollouts.side_effect = lambda rollouts, **kwargs: [
+        RolloutResult(name, False, 300.0, "not ready after 300s") for name, _ in rollouts
+    ]
+    previous = Deployment(id=7, project_id=1, commit_hash="old0000", status="success",
+                          image_name="autodeployhub/test-project:old0000")
+    mock_db.query.return_value.filter.return_value.order_by.return_value.first.return_value = previous
+
+    with patch("app.services.orchestrator.git_service"), \
+         patch("app.services.orchestrator.docker_service") as mock_docker, \
+         patch("app.services.orchestrator.k8s_service") as mock_k8s, \
+         patch("app.services.orchestrator.build_cache") as mock_cache, \
+         patch("app.services.orchestrator.settings.ROLLOUT_AUTO_ROLLBACK", True):
+        mock_cache.lookup.return_value = None
+        mock_docker.build_image.return_value = ("autodeployhub/test-project:abc1234", "")
+        mock_k8s.deploy_project.return_value = True
+        mock_k8s.update_image.return_value = True
+
+        deployment = orchestrator.trigger_deployment(mock_db, mock_project, "abc12345")
+
+        assert deployment.status == "failed"
+        assert "did not become ready: not ready after 300s" in deployment.logs
+        assert deployment.target_results[0]["status"] == "not_ready"
+        mock_k8s.update_image.assert_called_once_with("test-project", "autodeployhub/test-project:old0000")
@@ -0,0 +1,46 @@
+import asyncio
+import sys
+import time
+import pytest
+from app.services.process import run_command, CommandError, CommandTimeout
+
+def test_run_command_collects_output():
+    result = asyncio.run(run_command([sys.executable, "-c", "print('out'); import sys; print('err', file=sys.stderr)"]))
+    assert result.returncode == 0
+    assert result.stdout == "out\n"
+    assert result.stderr == "err\n"
+
+def test_run_command_streams_lines_to_callback():
+    lines = []
+
+    async def on_output(line):
+        lines.append(line)
+
+    script = "import sys\nfor i in range(3): print(i, flush=True)\nprint('done', file=sys.stderr)"
+    result = asyncio.run(run_command([sys.executable, "-c", script], on_output=on_output))
+    assert lines == ["0\n", "1\n", "2\n", "done\n"]
+    assert result.stdout == "".join(lines)
+
+def test_run_command_raises_on_failure():
+    with pytest.raises(CommandError) as exc:
+        asyncio.run(run_command([sys.executable, "-c", "import sys; sys.exit('boom')"]))
+    assert exc.value.returncode == 1
+    assert "boom" in exc.value.output
+
+def test_run_command_kills_process_on_timeout():
+    started = time.monotonic()
+    with pytest.raises(CommandTimeout):
+        asyncio.run(run_command([sys.executable, "-c", "import time; time.sleep(30)"], timeout=0.2))
+    assert time.monotonic() - started < 5
+
+def test_run_command_kills_process_on_cancel():
+    async def run():
+        task = asyncio.create_task(run_command([sys.executable, "-c", "import time; time.sleep(30)"]))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    started = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - started < 5
@@ -0,0 +1,172 @@
+import threading
+from datetime import datetime, timedelta, timezone
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.session import Base
+from app.models.deployment import Deployment, DeploymentLogChunk
+from app.models.project import Project
+from app.services.logs import log_store
+from app.services.queue import DeploymentQueue, run_deployment_job
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_queue_runs_jobs_in_order():
+    done = []
+    queue = DeploymentQueue(runner=lambda deployment_id, cancel_event=None: done.append(deployment_id),
+                            max_workers=1, per_project_limit=1)
+    queue.start()
+    try:
+        for deployment_id in (1, 2, 3):
+            queue.enqueue(deployment_id, project_id=1)
+        assert wait_until(lambda: len(done) == 3)
+        assert done == [1, 2, 3]
+    finally:
+        queue.shutdown()
+
+def test_queue_respects_per_project_limit():
+    lock = threading.Lock()
+    running = {}
+    peak = {}
+    release = threading.Event()
+    project_of = {1: 1, 2: 1, 3: 2, 4: 2}
+
+    def runner(deployment_id, cancel_event=None):
+        project_id = project_of[deployment_id]
+        with lock:
+            running[project_id] = running.get(project_id, 0) + 1
+            peak[project_id] = max(peak.get(project_id, 0), running[project_id])
+        release.wait(timeout=5)
+        with lock:
+            running[project_id] -= 1
+
+    queue = DeploymentQueue(runner=runner, max_workers=4, per_project_limit=1)
+    queue.start()
+    try:
+        for deployment_id, project_id in project_of.items():
+            queue.enqueue(deployment_id, project_id)
+        # One job per project runs, the other two stay queued
+        assert wait_until(lambda: queue.depth() == 2)
+        release.set()
+        assert wait_until(lambda: queue.depth() == 0 and not any(running.values()))
+        assert peak == {1: 1, 2: 1}
+    finally:
+        queue.shutdown()
+
+def test_run_deployment_job_skips_non_pending():
+    db = MagicMock()
+    deployment = MagicMock(status="success")
+    db.query.return_value.filter.return_value.first.return_value = deployment
+
+    with patch("app.services.queue.SessionLocal", return_value=db), \
+         patch("app.services.orchestrator.orchestrator") as mock_orchestrator:
+        assert run_deployment_job(5) is None
+        mock_orchestrator.run_deployment.assert_not_called()
+        db.close.assert_called_once()
+
+def test_queue_coalesces_pushes_within_debounce_window():
+    done = []
+    queue = DeploymentQueue(runner=lambda deployment_id, cancel_event=None: done.append(deployment_id),
+                            max_workers=1, debounce_seconds=0.2)
+    with patch.object(queue, "_mark_superseded") as mark_superseded:
+        queue.start()
+        try:
+            queue.enqueue(1, project_id=1, coalesce=True)
+            queue.enqueue(2, project_id=1, coalesce=True)
+            queue.enqueue(3, project_id=1, coalesce=True)
+            # Manual deploys are never superseded
+            queue.enqueue(4, project_id=1)
+            assert wait_until(lambda: len(done) == 2)
+            time.sleep(0.1)
+            assert sorted(done) == [3, 4]
+            assert mark_superseded.call_args_list[0].args == ([1], 2)
+            assert mark_superseded.call_args_list[1].args == ([2], 3)
+        finally:
+            queue.shutdown()
+
+def test_queue_cancels_in_flight_push_when_enabled():
+    started = threading.Event()
+    cancelled = []
+
+    def runner(deployment_id, cancel_event=None):
+        if deployment_id == 1:
+            started.set()
+            cancelled.append(cancel_event.wait(timeout=5))
+
+    queue = DeploymentQueue(runner=runner, max_workers=2, debounce_seconds=0, cancel_in_flight=True)
+    queue.start()
+    try:
+        queue.enqueue(1, project_id=1, coalesce=True)
+        assert started.wait(timeout=5)
+        queue.enqueue(2, project_id=1, coalesce=True)
+        assert wait_until(lambda: cancelled == [True])
+    finally:
+        queue.shutdown()
+
+def test_superseded_deployments_are_logged_through_the_store_and_reported():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add(Project(id=1, name="demo", github_url="https://github.com/test/demo"))
+    db.add(Deployment(id=1, project_id=1, commit_hash="a" * 40, status="pending", logs=""))
+    db.add(DeploymentLogChunk(deployment_id=1, seq=0, start_offset=0, end_offset=7, content="queued\n"))
+    db.commit()
+    db.close()
+
+    with patch("app.services.queue.SessionLocal", session_factory), \
+         patch("app.services.queue.commit_status") as commit_status:
+        DeploymentQueue(max_workers=1)._mark_superseded([1], superseded_by=2)
+
+    db = session_factory()
+    deployment = db.get(Deployment, 1)
+    assert deployment.status == "superseded" and deployment.finished_at is not None
+    assert log_store.text(db, deployment) == "queued\nSuperseded by deployment #2.\n"
+    assert db.query(DeploymentLogChunk).count() == 0
+    reported = commit_status.report.call_args.args[1]
+    assert reported.id == 1 and reported.status == "superseded"
+    db.close()
+
+def test_recover_leaves_deployments_other_live_processes_run(monkeypatch):
+    monkeypatch.setattr("app.services.queue.settings.DEPLOY_STALE_SECONDS", 60)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    now = datetime.now(timezone.utc)
+    db.add(Project(id=1, name="demo", github_url="https://github.com/test/demo"))
+    db.add(Deployment(id=1, project_id=1, commit_hash="manual", status="building", heartbeat_at=now))
+    db.add(Deployment(id=2, project_id=1, commit_hash="manual", status="deploying",
+                      heartbeat_at=now - timedelta(minutes=5)))
+    db.add(Deployment(id=3, project_id=1, commit_hash="manual", status="building"))
+    db.commit()
+
+    DeploymentQueue(max_workers=1).recover(db)
+    assert [db.get(Deployment, n).status for n in (1, 2, 3)] == ["building", "failed", "failed"]
+    assert "interrupted by a server restart" in log_store.text(db, db.get(Deployment, 2))
+    db.close()
+
+def test_run_deployment_job_claims_a_deployment_once():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add(Project(id=1, name="demo", github_url="https://github.com/test/demo"))
+    db.add(Deployment(id=1, project_id=1, commit_hash="manual", status="pending"))
+    db.commit()
+    db.close()
+
+    # Queued by two server processes; the second finds it claimed
+    with patch("app.services.queue.SessionLocal", session_factory), \
+         patch("app.services.orchestrator.orchestrator") as mock_orchestrator:
+        run_deployment_job(1)
+        assert run_deployment_job(1) is None
+    mock_orchestrator.run_deployment.assert_called_once()
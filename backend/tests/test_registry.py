@@ -0,0 +1,111 @@
+import os
+import shutil
+import subprocess
+import uuid
+import httpx
+import pytest
+from unittest.mock import patch
+from app.services.registry import RegistryService
+
+DIGEST = "sha256:" + "a" * 64
+
+def _registry(handler, **kwargs):
+    registry = RegistryService(url="localhost:5000", insecure=True, **kwargs)
+    registry._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return registry
+
+def test_manifest_digest_uses_head_and_content_digest_header():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, headers={"Docker-Content-Digest": DIGEST})
+
+    registry = _registry(handler)
+    assert registry.manifest_digest("localhost:5000/autodeployhub/demo", "abc1234") == DIGEST
+    assert requests[0].method == "HEAD"
+    assert str(requests[0].url) == "http://localhost:5000/v2/autodeployhub/demo/manifests/abc1234"
+    assert "application/vnd.oci.image.index.v1+json" in requests[0].headers["Accept"]
+
+def test_manifest_digest_missing():
+    registry = _registry(lambda request: httpx.Response(404))
+    assert registry.manifest_digest("localhost:5000/autodeployhub/demo", DIGEST) is None
+
+def test_manifest_digest_follows_bearer_challenge():
+    def handler(request):
+        if request.url.path == "/token":
+            assert request.url.params["scope"] == "repository:autodeployhub/demo:pull"
+            return httpx.Response(200, json={"token": "t0k"})
+        if request.headers.get("Authorization") == "Bearer t0k":
+            return httpx.Response(200, headers={"Docker-Content-Digest": DIGEST})
+        return httpx.Response(401, headers={"WWW-Authenticate": (
+            'Bearer realm="http://localhost:5000/token",service="registry",scope="repository:autodeployhub/demo:pull"'
+        )})
+
+    registry = _registry(handler, username="ci", password="secret")
+    assert registry.manifest_digest("localhost:5000/autodeployhub/demo", "latest") == DIGEST
+
+def test_push_skipped_when_registry_has_the_manifest():
+    registry = _registry(lambda request: httpx.Response(200, headers={"Docker-Content-Digest": DIGEST}))
+    lines = []
+    with patch("app.services.registry.docker_service") as docker:
+        docker.tag_image.return_value = True
+        docker.get_repo_digests.return_value = [
+            f"other.registry/autodeployhub/demo@sha256:{'b' * 64}",
+            f"localhost:5000/autodeployhub/demo@{DIGEST}"
+        ]
+        ref = registry.push("autodeployhub/demo:abc1234", on_output=lines.append)
+
+    assert ref == f"localhost:5000/autodeployhub/demo@{DIGEST}"
+    docker.tag_image.assert_called_once_with("autodeployhub/demo:abc1234", "localhost:5000/autodeployhub/demo:abc1234")
+    docker.push_image.assert_not_called()
+    assert "push skipped" in lines[0]
+
+def test_push_returns_digest_from_push_output():
+    registry = _registry(lambda request: httpx.Response(404))
+    with patch("app.services.registry.docker_service") as docker:
+        docker.tag_image.return_value = True
+        docker.get_repo_digests.return_value = []
+        docker.push_image.return_value = f"5f70bf18a086: Pushed\nabc1234: digest: {DIGEST} size: 1234\n"
+        ref = registry.push("autodeployhub/demo:abc1234")
+
+    assert ref == f"localhost:5000/autodeployhub/demo@{DIGEST}"
+    docker.push_image.assert_called_once_with("localhost:5000/autodeployhub/demo:abc1234", on_output=None)
+
+def test_push_logs_docker_in_with_registry_credentials():
+    registry = RegistryService(url="ghcr.io/acme", username="acme-bot", password="s3cret")
+    registry._client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(404)))
+    with patch("app.services.registry.docker_service") as docker:
+        docker.tag_image.return_value = True
+        docker.get_repo_digests.return_value = []
+        docker.push_image.return_value = f"abc1234: digest: {DIGEST} size: 1234\n"
+        registry.push("autodeployhub/demo:abc1234")
+
+    docker.login.assert_called_once_with("ghcr.io", "acme-bot", "s3cret")
+    docker.push_image.assert_called_once()
+
+def test_push_missing_local_image():
+    registry = _registry(lambda request: httpx.Response(404))
+    with patch("app.services.registry.docker_service") as docker:
+        docker.tag_image.return_value = False
+        with pytest.raises(Exception, match="not found"):
+            registry.push("autodeployhub/demo:abc1234")
+
+@pytest.mark.skipif(not os.environ.get("REGISTRY_TEST_URL") or shutil.which("docker") is None,
+                    reason="needs docker and a registry, e.g. docker run -d -p 5000:5000 registry:2 "
+                           "with REGISTRY_TEST_URL=localhost:5000")
+def test_push_to_local_registry():
+    registry = RegistryService(url=os.environ["REGISTRY_TEST_URL"], insecure=True)
+    image = f"autodeployhub/registry-test:{uuid.uuid4().hex[:7]}"
+    subprocess.run(["docker", "pull", "busybox:latest"], check=True, capture_output=True)
+    subprocess.run(["docker", "tag", "busybox:latest", image], check=True)
+
+    ref = registry.push(image)
+    repository, digest = ref.split("@")
+    assert repository == f"{registry.url}/autodeployhub/registry-test"
+    assert registry.manifest_digest(repository, digest) == digest
+
+    # Second push of the same image is answered from the registry without uploading
+    lines = []
+    assert registry.push(image, on_output=lines.append) == ref
+    assert any("push skipped" in line for line in lines)
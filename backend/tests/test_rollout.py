@@ -0,0 +1,96 @@
+import json
+import queue
+import threading
+from unittest.mock import MagicMock
+from app.services.rollout import RolloutTracker, rollout_status
+
+def _deployment(name, image, generation=2, observed=2, replicas=2, updated=2, available=2, total=None, rv="1"):
+    return {
+        "metadata": {"name": name, "generation": generation, "resourceVersion": rv},
+        "spec": {"replicas": replicas, "template": {"spec": {"containers": [{"name": name, "image": image}]}}},
+        "status": {
+            "observedGeneration": observed, "replicas": updated if total is None else total,
+            "updatedReplicas": updated, "availableReplicas": available
+        }
+    }
+
+class FakeWatch:
+    """Stands in for kubernetes.watch.Watch, fed events through a queue."""
+    def __init__(self, events: queue.Queue, streams: list):
+        self.events = events
+        self.streams = streams
+        self._stopped = False
+
+    def stream(self, func, **kwargs):
+        self.streams.append(kwargs)
+        while not self._stopped:
+            try:
+                event = self.events.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            yield event
+
+    def stop(self):
+        self._stopped = True
+
+def _tracker(initial: list[dict]):
+    events: queue.Queue = queue.Queue()
+    streams: list = []
+    api = MagicMock()
+    api.list_namespaced_deployment.return_value.data = json.dumps(
+        {"metadata": {"resourceVersion": "10"}, "items": initial}
+    ).encode()
+    tracker = RolloutTracker(api_factory=lambda: api, watch_factory=lambda: FakeWatch(events, streams))
+    return tracker, events, streams
+
+def test_rollout_status():
+    assert rollout_status(_deployment("a", "img:2"), "img:2") == (True, None)
+    assert rollout_status(_deployment("a", "img:1"), "img:2") == (False, None)
+    assert rollout_status(_deployment("a", "img:2", observed=1), "img:2") == (False, None)
+    assert rollout_status(_deployment("a", "img:2", available=1), "img:2") == (False, None)
+    assert rollout_status(_deployment("a", "img:2", total=3), "img:2") == (False, None)
+    stuck = _deployment("a", "img:2", available=0)
+    stuck["status"]["conditions"] = [{"type": "Progressing", "reason": "ProgressDeadlineExceeded", "message": "timed out"}]
+    assert rollout_status(stuck, "img:2") == (False, "timed out")
+
+def test_waits_for_watch_events_until_ready():
+    tracker, events, streams = _tracker([_deployment("api", "img:1")])
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(tracker.wait_for_rollout("api", "img:2", timeout=5)))
+    waiter.start()
+
+    events.put({"type": "MODIFIED", "raw_object": _deployment("api", "img:2", generation=3, observed=3, updated=1, available=0, total=3, rv="11")})
+    events.put({"type": "MODIFIED", "raw_object": _deployment("api", "img:2", generation=3, observed=3, rv="12")})
+    waiter.join(5)
+
+    assert results and results[0].ready
+    assert streams[0]["resource_version"] == "10"
+
+def test_one_watch_shared_by_concurrent_waiters():
+    tracker, events, streams = _tracker([])
+    results = []
+
+    def wait():
+        results.append(tracker.wait_for_rollouts([("api", "img:2"), ("web", "img:2")], timeout=5))
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    events.put({"type": "ADDED", "raw_object": _deployment("web", "img:2")})
+    events.put({"type": "ADDED", "raw_object": _deployment("api", "img:2")})
+    waiter.join(5)
+
+    assert [r.ready for r in results[0]] == [True, True]
+    assert len(streams) == 1
+
+def test_already_ready_deployment_returns_immediately():
+    tracker, _, _ = _tracker([_deployment("api", "img:2")])
+    # Seed the namespace cache the way a previous rollout would have
+    tracker.wait_for_rollout("api", "img:2", timeout=5)
+
+    result = tracker.wait_for_rollout("api", "img:2", timeout=5)
+    assert result.ready
+
+def test_times_out_when_never_ready():
+    tracker, _, _ = _tracker([_deployment("api", "img:2", available=0)])
+    result = tracker.wait_for_rollout("api", "img:2", timeout=0.2)
+    assert not result.ready and "not ready after" in result.reason
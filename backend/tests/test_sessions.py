@@ -0,0 +1,102 @@
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from jose import jwt, ExpiredSignatureError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.config import settings
+from app.db.session import Base, get_db
+from app.main import app
+from app.models.revoked_token import RevokedToken
+from app.services.sessions import SessionTokens, token_hash
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+def _token(sub="alice", expires_in=3600):
+    claims = {"sub": sub}
+    if expires_in is not None:
+        claims["exp"] = int(time.time()) + expires_in
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def test_verified_tokens_are_cached(session_factory):
+    tokens = SessionTokens(size=10, session_factory=session_factory)
+    token = _token()
+    assert tokens.verify(token) == "alice"
+    with patch("app.services.sessions.jwt.decode") as decode:
+        assert tokens.verify(token) == "alice"
+        decode.assert_not_called()
+
+def test_invalid_tokens_are_rejected_and_not_cached(session_factory):
+    tokens = SessionTokens(size=10, session_factory=session_factory)
+    forged = jwt.encode({"sub": "mallory"}, "another-key", algorithm=settings.ALGORITHM)
+    assert tokens.verify(forged) is None
+    assert tokens.verify(_token(expires_in=-10)) is None
+    assert tokens.verify(_token(sub=None)) is None
+    assert len(tokens._verified) == 0
+
+def test_cached_token_expires_with_its_exp(session_factory):
+    tokens = SessionTokens(size=10, session_factory=session_factory)
+    token = _token(expires_in=60)
+    assert tokens.verify(token) == "alice"
+    # Past exp the cached entry is dropped and the token verified (and refused) again
+    with patch("app.services.sessions.time.time", return_value=time.time() + 120), \
+         patch("app.services.sessions.jwt.decode", side_effect=ExpiredSignatureError("expired")) as decode:
+        assert tokens.verify(token) is None
+        decode.assert_called_once()
+
+def test_cache_is_bounded_lru(session_factory):
+    tokens = SessionTokens(size=2, session_factory=session_factory)
+    first, second, third = _token("a"), _token("b"), _token("c")
+    tokens.verify(first)
+    tokens.verify(second)
+    tokens.verify(first)
+    tokens.verify(third)
+    assert list(tokens._verified) == [token_hash(first), token_hash(third)]
+
+def test_revoked_token_is_rejected_here_and_in_other_processes(session_factory):
+    here = SessionTokens(size=10, session_factory=session_factory)
+    elsewhere = SessionTokens(size=10, revocation_ttl=60, session_factory=session_factory)
+    token = _token()
+    assert here.verify(token) == "alice" and elsewhere.verify(token) == "alice"
+
+    db = session_factory()
+    here.revoke(db, token)
+    assert here.verify(token) is None
+    assert db.get(RevokedToken, token_hash(token)) is not None
+    db.close()
+
+    # Still cached until the other process reloads its revocation list
+    assert elsewhere.verify(token) == "alice"
+    elsewhere._revoked_expires_at = 0.0
+    assert elsewhere.verify(token) is None
+
+def test_logout_revokes_the_session_token(session_factory):
+    tokens = SessionTokens(size=10, session_factory=session_factory)
+
+    def override():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    token = _token()
+    app.dependency_overrides[get_db] = override
+    try:
+        with patch("app.api.auth.session_tokens", tokens):
+            client = TestClient(app, cookies={"access_token": f"Bearer {token}"})
+            assert client.get("/admin/images/gc").status_code == 200
+            response = client.get("/auth/logout", follow_redirects=False)
+            assert response.status_code == 307
+
+            # A copy of the cookie no longer works
+            copied = TestClient(app, cookies={"access_token": f"Bearer {token}"})
+            assert copied.get("/admin/images/gc").status_code == 401
+    finally:
+        app.dependency_overrides.clear()
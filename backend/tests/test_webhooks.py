@@ -0,0 +1,127 @@
+import asyncio
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.session import Base, get_async_db
+from app.main import app
+from app.models.project import Project
+from app.models.deployment import Deployment
+from app.models.webhook_delivery import WebhookDelivery
+from app.core.repo import normalize_repo_url
+from app.services.project_index import RecentDeliveries, project_index, recent_deliveries
+
+@pytest.fixture
+def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with session_factory() as db:
+            db.add(Project(name="demo", github_url="https://github.com/test/demo", branch="main"))
+            await db.commit()
+
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    asyncio.run(setup())
+    yield session_factory
+    asyncio.run(engine.dispose())
+
+@pytest.fixture
+def client(session_factory):
+    async def override():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override
+    # Each test has its own database; don't serve projects cached from another one
+    project_index.invalidate()
+    with patch("app.api.webhooks.settings.GITHUB_WEBHOOK_SECRET", None):
+        yield TestClient(app)
+    app.dependency_overrides.clear()
+
+def _push(client, clone_url, ref="refs/heads/main", delivery_id=None):
+    payload = {"ref": ref, "after": "abc1234def", "repository": {"clone_url": clone_url}}
+    headers = {"X-GitHub-Event": "push"}
+    if delivery_id:
+        headers["X-GitHub-Delivery"] = delivery_id
+    return client.post("/webhooks/github", content=json.dumps(payload), headers=headers)
+
+def test_push_queues_deployment(client, session_factory):
+    with patch("app.api.webhooks.deployment_queue") as mock_queue:
+        response = _push(client, "https://github.com/test/demo.git")
+
+    assert response.status_code == 202
+    deployment_id = response.json()["deployment_id"]
+    mock_queue.enqueue.assert_called_once_with(deployment_id, 1, coalesce=True)
+
+    async def load():
+        async with session_factory() as db:
+            return (await db.execute(select(Deployment))).scalars().one()
+    deployment = asyncio.run(load())
+    assert deployment.id == deployment_id and deployment.status == "pending"
+
+def test_push_to_unknown_repo_or_branch(client):
+    with patch("app.api.webhooks.deployment_queue") as mock_queue:
+        assert _push(client, "https://github.com/test/other.git").json()["message"] == "Project not registered"
+        assert _push(client, "https://github.com/test/demo.git", ref="refs/heads/dev").json()["branch"] == "dev"
+    mock_queue.enqueue.assert_not_called()
+
+def test_normalize_repo_url():
+    expected = "github.com/test/demo"
+    for url in ["https://github.com/Test/Demo.git", "https://github.com/test/demo/", "http://www.github.com/test/demo",
+                "git@github.com:test/demo.git", "ssh://git@github.com/test/demo.git", "git://github.com/test/demo"]:
+        assert normalize_repo_url(url) == expected, url
+
+def test_ssh_clone_url_resolves_project(client):
+    with patch("app.api.webhooks.deployment_queue") as mock_queue:
+        response = _push(client, "git@github.com:Test/demo.git")
+    assert response.status_code == 202
+    mock_queue.enqueue.assert_called_once()
+
+def test_redelivery_does_not_queue_twice(client, session_factory):
+    with patch("app.api.webhooks.deployment_queue") as mock_queue:
+        assert _push(client, "https://github.com/test/demo.git", delivery_id="d-1").status_code == 202
+        assert _push(client, "https://github.com/test/demo.git", delivery_id="d-1").json()["message"] == "Duplicate delivery"
+
+        # Another process already handled it: only the database knows
+        recent_deliveries._ids.clear()
+        assert _push(client, "https://github.com/test/demo.git", delivery_id="d-1").json()["message"] == "Duplicate delivery"
+    mock_queue.enqueue.assert_called_once()
+
+    async def count():
+        async with session_factory() as db:
+            return len((await db.execute(select(Deployment))).scalars().all())
+    assert asyncio.run(count()) == 1
+
+def test_integrity_error_without_stored_delivery_is_not_a_duplicate(client):
+    error = IntegrityError("INSERT INTO deployments", {}, Exception("FOREIGN KEY constraint failed"))
+    with patch("app.api.webhooks.deployment_queue") as mock_queue, \
+         patch("app.api.webhooks.orchestrator.create_deployment_async", side_effect=error):
+        with pytest.raises(IntegrityError):
+            _push(client, "https://github.com/test/demo.git")
+        # The delivery row was rolled back with the deployment, so it isn't a redelivery either
+        with pytest.raises(IntegrityError):
+            _push(client, "https://github.com/test/demo.git", delivery_id="d-2")
+    assert not recent_deliveries.seen("d-2")
+    mock_queue.enqueue.assert_not_called()
+
+def test_prune_deliveries_keeps_the_redelivery_window(monkeypatch):
+    monkeypatch.setattr("app.services.project_index.settings.WEBHOOK_DELIVERY_RETENTION_HOURS", 72)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    now = datetime.now(timezone.utc)
+    db.add(WebhookDelivery(delivery_id="old", received_at=now - timedelta(hours=80)))
+    db.add(WebhookDelivery(delivery_id="recent", received_at=now - timedelta(hours=1)))
+    db.commit()
+
+    assert RecentDeliveries().prune(db, now=now) == 1
+    assert [delivery.delivery_id for delivery in db.query(WebhookDelivery).all()] == ["recent"]
+    db.close()